@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from datetime import datetime
 import json
-from typing import List
+from typing import List, Optional
 
-from app.db.database import get_db
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+from app.db.bulk import insert_returning
+from app.db.database import get_db, run_db
+from app.db.pagination import keyset_page, projection
 from app.db.models import Hypothesis, Assumption
-from app.services.gemini_client import reason
+from app.services.dedup import schedule_dedupe
+from app.services.gemini_client import areason
 
 router = APIRouter()
 
@@ -36,24 +42,63 @@ Return JSON only in this format:
 # =========================
 class AssumptionRequest(BaseModel):
     hypothesis_id: int
+    use_cache: bool = True  # False re-runs the LLM call
+
+
+# =========================
+# Response Schemas
+# =========================
+class AssumptionOut(BaseModel):
+    id: int
+    created_at: datetime
+    assumption: Optional[str] = None
+    canonical_id: Optional[int] = None  # near-duplicate cluster
+
+
+class AssumptionPage(BaseModel):
+    hypothesis_id: int
+    assumptions: List[AssumptionOut]
+    next_cursor: Optional[str] = None
+
+
+# =========================
+# Persistence
+# =========================
+def _save_assumptions(db, hypothesis_id: int, texts):
+    """
+    One batched INSERT ... RETURNING instead of a refresh per row,
+    then commit
+    """
+    saved = insert_returning(
+        db,
+        Assumption,
+        [
+            {"hypothesis_id": hypothesis_id, "assumption": text}
+            for text in texts
+        ],
+        Assumption.id,
+        Assumption.assumption,
+        Assumption.created_at
+    )
+    db.commit()
+    return saved
 
 
 # =========================
 # Generate Assumptions
 # =========================
 @router.post("/generate")
-def generate_assumptions(
+async def generate_assumptions(
     request: AssumptionRequest,
     db: Session = Depends(get_db)
 ):
-    hypothesis = db.query(Hypothesis).filter(
-        Hypothesis.id == request.hypothesis_id
-    ).first()
+    hypothesis = await run_db(db, db.get, Hypothesis, request.hypothesis_id)
 
     if not hypothesis:
         raise HTTPException(status_code=404, detail="Hypothesis not found")
 
-    result = reason(PROMPT, hypothesis.hypothesis)
+    hypothesis_id, hypothesis_text = hypothesis.id, hypothesis.hypothesis
+    result = await areason(PROMPT, hypothesis_text, use_cache=request.use_cache)
 
     try:
         parsed = json.loads(result)
@@ -64,23 +109,11 @@ def generate_assumptions(
     if not assumptions_list:
         raise HTTPException(status_code=500, detail="Failed to generate assumptions")
 
-    saved = []
-
-    for text in assumptions_list:
-        a = Assumption(
-            hypothesis_id=hypothesis.id,
-            assumption=text
-        )
-        db.add(a)
-        saved.append(a)
-
-    db.commit()
-
-    for a in saved:
-        db.refresh(a)
+    saved = await run_db(db, _save_assumptions, db, hypothesis_id, assumptions_list)
+    schedule_dedupe()
 
     return {
-        "hypothesis_id": hypothesis.id,
+        "hypothesis_id": hypothesis_id,
         "assumptions": [
             {
                 "id": a.id,
@@ -95,23 +128,37 @@ def generate_assumptions(
 # =========================
 # Get Assumptions by Hypothesis
 # =========================
-@router.get("/by-hypothesis/{hypothesis_id}")
+@router.get(
+    "/by-hypothesis/{hypothesis_id}",
+    response_model=AssumptionPage,
+    response_model_exclude_unset=True
+)
 def get_assumptions_by_hypothesis(
     hypothesis_id: int,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    assumptions = db.query(Assumption).filter(
-        Assumption.hypothesis_id == hypothesis_id
-    ).all()
-
-    return {
-        "hypothesis_id": hypothesis_id,
-        "assumptions": [
-            {
-                "id": a.id,
-                "assumption": a.assumption,
-                "created_at": a.created_at
-            }
-            for a in assumptions
-        ]
-    }
+    """
+    Oldest first, keyset-paginated on (created_at, id)
+    """
+    try:
+        columns = projection(
+            Assumption, fields, ("assumption", "canonical_id"), ("assumption", "canonical_id")
+        )
+        rows, next_cursor = keyset_page(
+            db.query(*columns).filter(Assumption.hypothesis_id == hypothesis_id),
+            Assumption,
+            cursor,
+            limit,
+            descending=False
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return AssumptionPage(
+        hypothesis_id=hypothesis_id,
+        assumptions=[AssumptionOut(**row._asdict()) for row in rows],
+        next_cursor=next_cursor
+    )
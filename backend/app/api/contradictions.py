@@ -0,0 +1,162 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+from app.db.database import get_db
+from app.db.pagination import keyset_page
+from app.db.models import Contradiction, Hypothesis
+from app.services.contradictions import engine
+
+router = APIRouter()
+
+STATUSES = ("candidate", "contradiction", "consistent", "unclear")
+
+
+# =========================
+# Request Schema
+# =========================
+class ScanRequest(BaseModel):
+    limit: Optional[int] = None  # hypotheses / pairs per step (default: all pending)
+    use_cache: bool = True       # False re-runs the LLM calls
+
+
+# =========================
+# Response Schemas
+# =========================
+class ContradictionOut(BaseModel):
+    id: int
+    created_at: datetime
+    hypothesis_a_id: int
+    hypothesis_b_id: int
+    similarity: float
+    status: str
+    explanation: Optional[str] = None
+
+
+class ContradictionPage(BaseModel):
+    items: List[ContradictionOut]
+    next_cursor: Optional[str] = None
+
+
+COLUMNS = (
+    Contradiction.id,
+    Contradiction.created_at,
+    Contradiction.hypothesis_a_id,
+    Contradiction.hypothesis_b_id,
+    Contradiction.similarity,
+    Contradiction.status,
+    Contradiction.explanation,
+)
+
+
+# =========================
+# Scan (candidates + adjudication)
+# =========================
+@router.post("/scan")
+async def scan_contradictions(
+    request: ScanRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Pair pending hypotheses with their near neighbours and adjudicate
+    the open candidates now (normally done in the background)
+    """
+    return await engine.run(db, request.limit, request.use_cache)
+
+
+# =========================
+# List
+# =========================
+@router.get("", response_model=ContradictionPage)
+def list_contradictions(
+    status: Optional[str] = Query("contradiction"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Newest first, keyset-paginated; `status` defaults to confirmed
+    contradictions
+    """
+    if status not in STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown status '{status}', expected one of {STATUSES}"
+        )
+
+    try:
+        rows, next_cursor = keyset_page(
+            db.query(*COLUMNS).filter(Contradiction.status == status),
+            Contradiction,
+            cursor,
+            limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ContradictionPage(
+        items=[ContradictionOut(**row._asdict()) for row in rows],
+        next_cursor=next_cursor
+    )
+
+
+# =========================
+# Pairs of One Hypothesis
+# =========================
+@router.get("/hypothesis/{hypothesis_id}")
+def get_contradictions_for_hypothesis(
+    hypothesis_id: int,
+    include_consistent: bool = False,
+    db: Session = Depends(get_db)
+):
+    hypothesis = (
+        db.query(Hypothesis.id, Hypothesis.contradictions_checked_at)
+        .filter(Hypothesis.id == hypothesis_id)
+        .first()
+    )
+
+    if not hypothesis:
+        raise HTTPException(status_code=404, detail="Hypothesis not found")
+
+    query = db.query(*COLUMNS).filter(
+        or_(
+            Contradiction.hypothesis_a_id == hypothesis_id,
+            Contradiction.hypothesis_b_id == hypothesis_id
+        )
+    )
+    if not include_consistent:
+        query = query.filter(Contradiction.status != "consistent")
+
+    pairs = query.order_by(Contradiction.similarity.desc()).all()
+
+    others = {
+        p.hypothesis_b_id if p.hypothesis_a_id == hypothesis_id else p.hypothesis_a_id
+        for p in pairs
+    }
+    texts = dict(
+        db.query(Hypothesis.id, Hypothesis.hypothesis)
+        .filter(Hypothesis.id.in_(others))
+        .all()
+    ) if others else {}
+
+    return {
+        "hypothesis_id": hypothesis_id,
+        "checked_at": hypothesis.contradictions_checked_at,
+        "pairs": [
+            {
+                "id": p.id,
+                "other_hypothesis_id": other,
+                "other_hypothesis": texts.get(other),
+                "similarity": p.similarity,
+                "status": p.status,
+                "explanation": p.explanation,
+            }
+            for p in pairs
+            for other in [p.hypothesis_b_id if p.hypothesis_a_id == hypothesis_id else p.hypothesis_a_id]
+        ],
+    }
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from datetime import datetime
 import json
-from typing import List
+from typing import List, Optional
 
-from app.db.database import get_db
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+from app.db.bulk import insert_returning
+from app.db.database import get_db, run_db
+from app.db.pagination import keyset_page, projection
 from app.db.models import Hypothesis, FailureMode
-from app.services.gemini_client import reason
+from app.services.dedup import schedule_dedupe
+from app.services.gemini_client import areason
 
 router = APIRouter()
 
@@ -36,24 +42,63 @@ Return JSON only in this format:
 # =========================
 class FailureRequest(BaseModel):
     hypothesis_id: int
+    use_cache: bool = True  # False re-runs the LLM call
+
+
+# =========================
+# Response Schemas
+# =========================
+class FailureModeOut(BaseModel):
+    id: int
+    created_at: datetime
+    failure: Optional[str] = None
+    canonical_id: Optional[int] = None  # near-duplicate cluster
+
+
+class FailureModePage(BaseModel):
+    hypothesis_id: int
+    failure_modes: List[FailureModeOut]
+    next_cursor: Optional[str] = None
+
+
+# =========================
+# Persistence
+# =========================
+def _save_failures(db, hypothesis_id: int, texts):
+    """
+    One batched INSERT ... RETURNING instead of a refresh per row,
+    then commit
+    """
+    saved = insert_returning(
+        db,
+        FailureMode,
+        [
+            {"hypothesis_id": hypothesis_id, "failure": text}
+            for text in texts
+        ],
+        FailureMode.id,
+        FailureMode.failure,
+        FailureMode.created_at
+    )
+    db.commit()
+    return saved
 
 
 # =========================
 # Generate Failure Modes
 # =========================
 @router.post("/generate")
-def generate_failure_modes(
+async def generate_failure_modes(
     request: FailureRequest,
     db: Session = Depends(get_db)
 ):
-    hypothesis = db.query(Hypothesis).filter(
-        Hypothesis.id == request.hypothesis_id
-    ).first()
+    hypothesis = await run_db(db, db.get, Hypothesis, request.hypothesis_id)
 
     if not hypothesis:
         raise HTTPException(status_code=404, detail="Hypothesis not found")
 
-    result = reason(PROMPT, hypothesis.hypothesis)
+    hypothesis_id, hypothesis_text = hypothesis.id, hypothesis.hypothesis
+    result = await areason(PROMPT, hypothesis_text, use_cache=request.use_cache)
 
     try:
         parsed = json.loads(result)
@@ -72,23 +117,11 @@ def generate_failure_modes(
     if not failure_list:
         raise HTTPException(status_code=500, detail="Failed to generate failure modes")
 
-    saved = []
-
-    for text in failure_list:
-        f = FailureMode(
-            hypothesis_id=hypothesis.id,
-            failure=text
-        )
-        db.add(f)
-        saved.append(f)
-
-    db.commit()
-
-    for f in saved:
-        db.refresh(f)
+    saved = await run_db(db, _save_failures, db, hypothesis_id, failure_list)
+    schedule_dedupe()
 
     return {
-        "hypothesis_id": hypothesis.id,
+        "hypothesis_id": hypothesis_id,
         "failure_modes": [
             {
                 "id": f.id,
@@ -103,23 +136,37 @@ def generate_failure_modes(
 # =========================
 # Get Failure Modes by Hypothesis
 # =========================
-@router.get("/by-hypothesis/{hypothesis_id}")
+@router.get(
+    "/by-hypothesis/{hypothesis_id}",
+    response_model=FailureModePage,
+    response_model_exclude_unset=True
+)
 def get_failure_modes_by_hypothesis(
     hypothesis_id: int,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    failures = db.query(FailureMode).filter(
-        FailureMode.hypothesis_id == hypothesis_id
-    ).all()
-
-    return {
-        "hypothesis_id": hypothesis_id,
-        "failure_modes": [
-            {
-                "id": f.id,
-                "failure": f.failure,
-                "created_at": f.created_at
-            }
-            for f in failures
-        ]
-    }
+    """
+    Oldest first, keyset-paginated on (created_at, id)
+    """
+    try:
+        columns = projection(
+            FailureMode, fields, ("failure", "canonical_id"), ("failure", "canonical_id")
+        )
+        rows, next_cursor = keyset_page(
+            db.query(*columns).filter(FailureMode.hypothesis_id == hypothesis_id),
+            FailureMode,
+            cursor,
+            limit,
+            descending=False
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return FailureModePage(
+        hypothesis_id=hypothesis_id,
+        failure_modes=[FailureModeOut(**row._asdict()) for row in rows],
+        next_cursor=next_cursor
+    )
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.config import GRAPH_MAX_HOPS
+from app.db.database import get_db
+from app.services.knowledge_graph import NODE_TYPES, graph
+
+router = APIRouter()
+
+
+# =========================
+# HELPERS
+# =========================
+def _node(node_type: str, row_id: int):
+    if node_type not in NODE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown node type '{node_type}', expected one of {NODE_TYPES}"
+        )
+
+    node = graph.node(node_type, row_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"No {node_type} node for id {row_id}")
+
+    return node
+
+
+# =========================
+# GRAPH STATS
+# =========================
+@router.get("/stats")
+def get_graph_stats(db: Session = Depends(get_db)):
+    with graph.lock:
+        graph.sync(db)
+        return graph.stats()
+
+
+# =========================
+# HYPOTHESES SHARING ASSUMPTIONS / FAILURE MODES
+# =========================
+@router.get("/hypotheses/{hypothesis_id}/shared")
+def get_hypotheses_sharing(
+    hypothesis_id: int,
+    via: str = Query("assumption", pattern="^(assumption|failure_mode)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Other hypotheses with at least one assumption (or failure mode)
+    of the same text, most shared first
+    """
+    # Held across sync + lookup + query: a drift rebuild renumbers nodes
+    with graph.lock:
+        graph.sync(db)
+        node = _node("hypothesis", hypothesis_id)
+
+        return {
+            "hypothesis_id": hypothesis_id,
+            "via": via,
+            "hypotheses": [
+                {**graph.describe(other), "shared": shared}
+                for other, shared in graph.sharing(node, via)[:limit]
+            ],
+        }
+
+
+# =========================
+# MULTI-HOP REACHABILITY
+# =========================
+@router.get("/{node_type}/{row_id}/reachable")
+def get_reachable(
+    node_type: str,
+    row_id: int,
+    hops: int = Query(2, ge=1, le=GRAPH_MAX_HOPS),
+    target: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """
+    Nodes within `hops` edges of a row, e.g. the papers two hops from
+    a failure mode: /graph/failure_mode/{id}/reachable?hops=2&target=paper
+    """
+    if target is not None and target not in NODE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown node type '{target}', expected one of {NODE_TYPES}"
+        )
+
+    with graph.lock:
+        graph.sync(db)
+        node = _node(node_type, row_id)
+
+        return {
+            "source": graph.describe(node),
+            "hops": hops,
+            "nodes": [
+                {**graph.describe(other), "hops": distance}
+                for other, distance in graph.reachable(node, hops, target)[:limit]
+            ],
+        }
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
 import json
 
-from app.db.database import get_db
-from app.db.models import Hypothesis, IngestChunk
-from app.services.gemini_client import reason
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+from app.db.bulk import insert_returning
+from app.db.database import get_db, run_db
+from app.db.pagination import keyset_page, projection
+from app.db.models import Hypothesis
+from app.services.context_builder import build_context
+from app.services.contradictions import schedule_contradictions
+from app.services.gemini_client import areason
 
 router = APIRouter()
 
@@ -32,21 +40,78 @@ Return JSON only in this format:
 # =========================
 class ManualHypothesisRequest(BaseModel):
     context: str
+    use_cache: bool = True  # False re-runs the LLM call
 
 
 class IngestHypothesisRequest(BaseModel):
     ingest_id: int
+    use_cache: bool = True  # False re-runs the LLM call
+    objective: Optional[str] = None  # what context chunks are ranked against
+
+
+# =========================
+# RESPONSE SCHEMAS
+# =========================
+HYPOTHESIS_FIELDS = ("context", "hypothesis", "rationale", "falsification")
+HISTORY_DEFAULT_FIELDS = ("hypothesis", "rationale", "falsification")
+
+
+class HypothesisOut(BaseModel):
+    id: int
+    created_at: datetime
+    context: Optional[str] = None
+    hypothesis: Optional[str] = None
+    rationale: Optional[str] = None
+    falsification: Optional[str] = None
+
+
+class HypothesisPage(BaseModel):
+    items: List[HypothesisOut]
+    next_cursor: Optional[str] = None
+
+
+def _save_hypothesis(
+    db,
+    context: str,
+    hypothesis_text: str,
+    rationale: str,
+    falsification: str,
+    ingest_id: int = None
+):
+    """
+    INSERT ... RETURNING the full row (no refresh round-trip), then
+    commit
+    """
+    row = insert_returning(
+        db,
+        Hypothesis,
+        [{
+            "context": context,
+            "ingest_id": ingest_id,
+            "hypothesis": hypothesis_text,
+            "rationale": rationale,
+            "falsification": falsification,
+        }],
+        Hypothesis.id,
+        Hypothesis.context,
+        Hypothesis.hypothesis,
+        Hypothesis.rationale,
+        Hypothesis.falsification,
+        Hypothesis.created_at
+    )[0]._asdict()
+    db.commit()
+    return row
 
 
 # =========================
 # 1️⃣ MANUAL CONTEXT → HYPOTHESIS
 # =========================
 @router.post("/generate")
-def generate_hypothesis_manual(
+async def generate_hypothesis_manual(
     request: ManualHypothesisRequest,
     db: Session = Depends(get_db)
 ):
-    result = reason(HYPOTHESIS_PROMPT, request.context)
+    result = await areason(HYPOTHESIS_PROMPT, request.context, use_cache=request.use_cache)
 
     try:
         parsed = json.loads(result)
@@ -59,16 +124,10 @@ def generate_hypothesis_manual(
             detail="Failed to generate hypothesis"
         )
 
-    hypothesis = Hypothesis(
-        context=request.context,
-        hypothesis=hypothesis_text,
-        rationale=rationale,
-        falsification=falsification
+    hypothesis = await run_db(
+        db, _save_hypothesis, db, request.context, hypothesis_text, rationale, falsification
     )
-
-    db.add(hypothesis)
-    db.commit()
-    db.refresh(hypothesis)
+    schedule_contradictions()
 
     return hypothesis
 
@@ -77,27 +136,14 @@ def generate_hypothesis_manual(
 # 2️⃣ INGEST → HYPOTHESIS
 # =========================
 @router.post("/from-ingest")
-def generate_hypothesis_from_ingest(
+async def generate_hypothesis_from_ingest(
     request: IngestHypothesisRequest,
     db: Session = Depends(get_db)
 ):
-    chunks = (
-        db.query(IngestChunk)
-        .filter(IngestChunk.ingest_id == request.ingest_id)
-        .order_by(IngestChunk.chunk_index)
-        .all()
-    )
-
-    if not chunks:
-        raise HTTPException(
-            status_code=404,
-            detail="No chunks found for this ingest_id"
-        )
-
-    context_text = "\n".join(chunk.content for chunk in chunks)
-    context_text = context_text[:8000]  # safety limit
+    # Best chunks for the objective, within the token budget
+    context_text = await build_context(db, request.ingest_id, request.objective)
 
-    result = reason(HYPOTHESIS_PROMPT, context_text)
+    result = await areason(HYPOTHESIS_PROMPT, context_text, use_cache=request.use_cache)
 
     try:
         parsed = json.loads(result)
@@ -110,16 +156,17 @@ def generate_hypothesis_from_ingest(
             detail="Failed to generate hypothesis from ingest"
         )
 
-    hypothesis = Hypothesis(
-        context=f"Ingest #{request.ingest_id}",
-        hypothesis=hypothesis_text,
-        rationale=rationale,
-        falsification=falsification
+    hypothesis = await run_db(
+        db,
+        _save_hypothesis,
+        db,
+        f"Ingest #{request.ingest_id}",
+        hypothesis_text,
+        rationale,
+        falsification,
+        request.ingest_id
     )
-
-    db.add(hypothesis)
-    db.commit()
-    db.refresh(hypothesis)
+    schedule_contradictions()
 
     return hypothesis
 
@@ -127,12 +174,31 @@ def generate_hypothesis_from_ingest(
 # =========================
 # 3️⃣ RETRIEVAL ENDPOINTS
 # =========================
-@router.get("/history")
-def get_hypothesis_history(db: Session = Depends(get_db)):
-    return (
-        db.query(Hypothesis)
-        .order_by(Hypothesis.created_at.desc())
-        .all()
+@router.get(
+    "/history",
+    response_model=HypothesisPage,
+    response_model_exclude_unset=True
+)
+def get_hypothesis_history(
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Newest first, one page per call; pass `next_cursor` back as
+    `cursor` for the next page. `fields` picks columns (default: all
+    but the large `context`).
+    """
+    try:
+        columns = projection(Hypothesis, fields, HYPOTHESIS_FIELDS, HISTORY_DEFAULT_FIELDS)
+        rows, next_cursor = keyset_page(db.query(*columns), Hypothesis, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return HypothesisPage(
+        items=[HypothesisOut(**row._asdict()) for row in rows],
+        next_cursor=next_cursor
     )
 
 
@@ -1,18 +1,31 @@
+import asyncio
+import itertools
+import os
+
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
 
-from app.db.database import get_db
-from app.db.models import Ingest, IngestChunk
+from app.config import INGEST_BATCH_SIZE
+
+from app.db.bulk import insert_returning
+from app.db.database import get_db, run_db
+from app.db.models import Hypothesis, Ingest, IngestChunk, PipelineJob
 
-from app.services.parser import parse_pdf
-from app.services.chunker import chunk_text
-from app.services.embedding_service import embed_chunks
-from app.services.vector_store import store_vectors
+from app.services.parser import iter_pdf_pages, spool_upload
+from app.services.bulk_ingest import discard_paper, ingest_files
+from app.services.chunker import chunk_spans, chunk_stream
+from app.services.embedding_service import aembed_chunks
+from app.services.vector_store import remove_vectors, store_vectors
 
 router = APIRouter()
 
+# Rows per IN (...) when moving or deleting chunks by id
+ID_BATCH = 500
+
 
 # =========================
 # Request / Response Schemas
@@ -27,6 +40,129 @@ class IngestResponse(BaseModel):
     chunks_created: int
 
 
+# =========================
+# Helpers
+# =========================
+def _get_ingest(db, ingest_id: int):
+    ingest = db.query(Ingest.id).filter(Ingest.id == ingest_id).first()
+
+    if not ingest:
+        raise HTTPException(status_code=404, detail="Ingest not found")
+
+    return ingest
+
+
+def _drop_chunks(db, ingest_id: int) -> int:
+    """
+    Remove an ingest's vectors, then delete its chunk rows (not
+    committed). Vectors go first: a chunk row left without one is
+    re-embedded on demand, a vector left without a row is stale.
+    """
+    chunk_ids = [
+        row.id for row in
+        db.query(IngestChunk.id).filter(IngestChunk.ingest_id == ingest_id)
+    ]
+
+    remove_vectors(chunk_ids, ingest_id)
+    db.execute(delete(IngestChunk).where(IngestChunk.ingest_id == ingest_id))
+
+    return len(chunk_ids)
+
+
+def _insert_spans(db, ingest_id: int, spans):
+    db.execute(
+        insert(IngestChunk),
+        [
+            {
+                "ingest_id": ingest_id,
+                "start_offset": start,
+                "end_offset": end,
+                "chunk_index": idx,
+            }
+            for idx, (start, end) in enumerate(spans)
+        ]
+    )
+
+
+def _open_paper(db, title: str) -> int:
+    """
+    Create an ingest row with an empty body (committed)
+    """
+    ingest_id = insert_returning(
+        db,
+        Ingest,
+        [{"title": title, "body": ""}],
+        Ingest.id
+    )[0].id
+    db.commit()
+
+    return ingest_id
+
+
+def _insert_batch(db, ingest_id, batch, first_index: int) -> List[int]:
+    """
+    Persist one batch of chunk offsets (committed), returning their ids.
+    `ingest_id` None keeps them out of every ingest until swapped in.
+    """
+    rows = insert_returning(
+        db,
+        IngestChunk,
+        [
+            {
+                "ingest_id": ingest_id,
+                "start_offset": start,
+                "end_offset": end,
+                "chunk_index": first_index + idx,
+            }
+            for idx, (start, end, _) in enumerate(batch)
+        ],
+        IngestChunk.id
+    )
+    db.commit()
+
+    return [row.id for row in rows]
+
+
+def _finish_paper(db, ingest_id: int, title: str, body: str, new_ids: List[int] = None):
+    """
+    Write the body; when replacing, also drop the old chunks and
+    vectors and move the `new_ids` chunks into the ingest, all in one
+    commit
+    """
+    if new_ids is not None:
+        _drop_chunks(db, ingest_id)
+        for i in range(0, len(new_ids), ID_BATCH):
+            db.execute(
+                update(IngestChunk)
+                .where(IngestChunk.id.in_(new_ids[i:i + ID_BATCH]))
+                .values(ingest_id=ingest_id)
+            )
+
+    db.execute(
+        update(Ingest)
+        .where(Ingest.id == ingest_id)
+        .values(title=title, body=body)
+    )
+    db.commit()
+
+
+def _undo_paper(db, ingest_id: int, new_ids: List[int] = None):
+    """
+    Remove a new ingest again, or just the `new_ids` chunks (and
+    vectors) of a failed replacement
+    """
+    db.rollback()
+
+    if new_ids is None:
+        discard_paper(db, ingest_id)
+        return
+
+    remove_vectors(new_ids, ingest_id)
+    for i in range(0, len(new_ids), ID_BATCH):
+        db.execute(delete(IngestChunk).where(IngestChunk.id.in_(new_ids[i:i + ID_BATCH])))
+    db.commit()
+
+
 # =========================
 # INGEST TEXT (Stage 1)
 # =========================
@@ -38,33 +174,29 @@ def ingest_text(
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
 
-    # 1. Create ingest record
-    ingest = Ingest(title=request.title)
-    db.add(ingest)
-    db.commit()
-    db.refresh(ingest)
+    # 1. Create ingest record (the body is stored once)
+    ingest_id = insert_returning(
+        db,
+        Ingest,
+        [{"title": request.title, "body": request.text}],
+        Ingest.id
+    )[0].id
 
-    # 2. Chunk text
-    chunks: List[str] = chunk_text(request.text)
+    # 2. Chunk text into offsets
+    spans = chunk_spans(request.text)
 
-    if not chunks:
+    if not spans:
+        db.rollback()
         raise HTTPException(status_code=500, detail="Chunking failed")
 
-    # 3. Persist chunks
-    for idx, chunk in enumerate(chunks):
-        db.add(
-            IngestChunk(
-                ingest_id=ingest.id,
-                content=chunk,
-                chunk_index=idx
-            )
-        )
+    # 3. Persist chunks (one batched INSERT)
+    _insert_spans(db, ingest_id, spans)
 
     db.commit()
 
     return {
-        "ingest_id": ingest.id,
-        "chunks_created": len(chunks)
+        "ingest_id": ingest_id,
+        "chunks_created": len(spans)
     }
 
 
@@ -77,51 +209,235 @@ async def ingest_paper(
     db: Session = Depends(get_db)
 ):
     """
-    Ingest a research paper PDF:
-    - Parse PDF
-    - Chunk text
-    - Store chunks in DB
-    - Embed chunks
-    - Store vectors
+    Ingest a research paper PDF as a stream:
+    - Parse PDF page by page
+    - Chunk incrementally across page boundaries
+    - Per batch of chunks: store in DB, embed, store vectors
+
+    The next batch is parsed while the current one is embedded, so
+    peak memory stays flat and the first vectors land early.
     """
+    return await _stream_paper(db, file)
 
-    # 1. Parse PDF
-    raw_text = parse_pdf(file)
 
-    if not raw_text.strip():
-        raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
+async def _stream_paper(db, file: UploadFile, ingest_id: int = None):
+    """
+    Streaming PDF ingestion into a new ingest, or into `ingest_id`
+    (replacing its chunks).
 
-    # 2. Create ingest record
-    ingest = Ingest(title=file.filename)
-    db.add(ingest)
-    db.commit()
-    db.refresh(ingest)
+    The body is written once, after the last batch: chunks hold offsets
+    into it, and appending to a growing TEXT column per batch would
+    rewrite it every time. A replacement's chunks are stored outside
+    the ingest (ingest_id NULL) and swapped in for the old ones with
+    the new body, so readers see the old paper until then. If a batch
+    fails, a new ingest is removed again; a replaced one keeps its old
+    chunks and body and only the new chunks are removed.
+    """
 
-    # 3. Chunk text
-    chunks: List[str] = chunk_text(raw_text)
+    # 1. Parse + chunk lazily; pages read so far are kept in `pages`
+    # until their text is moved to `body_parts`
+    pages: List[str] = []
+    body_parts: List[str] = []
 
-    if not chunks:
-        raise HTTPException(status_code=500, detail="Chunking failed")
+    def read_pages():
+        for page in iter_pdf_pages(file):
+            pages.append(page)
+            yield page
+
+    chunks = chunk_stream(read_pages())
+    next_batch = None
+    storing = None
+    replacing = ingest_id is not None
+    stored = False
+    new_ids = [] if replacing else None
+
+    def take():
+        batch = list(itertools.islice(chunks, INGEST_BATCH_SIZE))
+        body_parts.extend(pages)
+        pages.clear()
+        return batch
+
+    try:
+        batch = await run_in_threadpool(take)
+
+        if not any(text.strip() for _, _, text in batch):
+            raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
+
+        # 2. Create the ingest record (a replaced one is left as is)
+        if not replacing:
+            ingest_id = await run_db(db, _open_paper, db, file.filename)
+        stored = True
 
-    # 4. Persist chunks
-    for idx, chunk in enumerate(chunks):
-        db.add(
-            IngestChunk(
-                ingest_id=ingest.id,
-                content=chunk,
-                chunk_index=idx
+        chunks_created = 0
+        embedding_dim = 0
+
+        while batch:
+            next_batch = asyncio.ensure_future(run_in_threadpool(take))
+
+            # 3. Persist chunk offsets
+            chunk_ids = await run_db(
+                db,
+                _insert_batch,
+                db,
+                None if replacing else ingest_id,
+                batch,
+                chunks_created
+            )
+            if replacing:
+                new_ids.extend(chunk_ids)
+
+            # 4. Embed + store vectors, keyed by IngestChunk.id
+            vectors = await aembed_chunks([text for _, _, text in batch])
+            storing = asyncio.ensure_future(
+                run_in_threadpool(store_vectors, chunk_ids, vectors, ingest_id)
             )
+            await asyncio.shield(storing)
+
+            chunks_created += len(batch)
+            embedding_dim = embedding_dim or vectors.shape[1]
+
+            batch = await next_batch
+
+        # 5. The whole body (including pages read after the last chunk),
+        # swapping a replacement's chunks in
+        await run_db(
+            db,
+            _finish_paper,
+            db,
+            ingest_id,
+            file.filename,
+            "".join(body_parts),
+            new_ids
         )
+    except (Exception, asyncio.CancelledError):
+        if stored:
+            # A cancelled store still lands: let it, then remove it too
+            if storing is not None and not storing.done():
+                await asyncio.wait([storing])
+            await run_db(db, _undo_paper, db, ingest_id, new_ids)
+        raise
+    finally:
+        # The generator can't be closed while a worker is advancing it
+        if next_batch is not None and not next_batch.done():
+            await asyncio.wait([next_batch])
+        chunks.close()
+
+    return {
+        "message": "Paper ingested successfully",
+        "ingest_id": ingest_id,
+        "chunks_created": chunks_created,
+        "embedding_dim": embedding_dim
+    }
+
+
+# =========================
+# REPLACE / DELETE
+# =========================
+@router.put("/{ingest_id}/text", response_model=IngestResponse)
+def replace_text(
+    ingest_id: int,
+    request: IngestTextRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Re-ingest under the same id: old chunks and their vectors are
+    dropped, the new text is chunked
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+
+    _get_ingest(db, ingest_id)
+
+    spans = chunk_spans(request.text)
+    if not spans:
+        raise HTTPException(status_code=500, detail="Chunking failed")
+
+    _drop_chunks(db, ingest_id)
+    db.execute(
+        update(Ingest)
+        .where(Ingest.id == ingest_id)
+        .values(title=request.title, body=request.text)
+    )
+    _insert_spans(db, ingest_id, spans)
 
     db.commit()
 
-    # 5. Embed + store vectors (existing pipeline)
-    vectors = embed_chunks(chunks)
-    store_vectors(chunks, vectors)
+    return {
+        "ingest_id": ingest_id,
+        "chunks_created": len(spans)
+    }
+
+
+@router.put("/{ingest_id}/paper")
+async def replace_paper(
+    ingest_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-ingest a PDF under the same id (streamed like /paper). The old
+    chunks stay until the new ones are all stored; a failed re-ingest
+    leaves the paper as it was.
+    """
+    await run_db(db, _get_ingest, db, ingest_id)
+    return await _stream_paper(db, file, ingest_id)
+
+
+@router.delete("/{ingest_id}")
+def delete_ingest(
+    ingest_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Delete an ingest, its chunks, their vectors and its finished
+    pipeline jobs. Hypotheses generated from it are kept, unlinked.
+    """
+    _get_ingest(db, ingest_id)
+
+    active = (
+        db.query(PipelineJob.id)
+        .filter(
+            PipelineJob.ingest_id == ingest_id,
+            PipelineJob.status.in_(("queued", "running"))
+        )
+        .first()
+    )
+    if active:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Pipeline job {active.id} is still running on this ingest"
+        )
+
+    chunks_deleted = _drop_chunks(db, ingest_id)
+    db.execute(delete(PipelineJob).where(PipelineJob.ingest_id == ingest_id))
+    db.execute(
+        update(Hypothesis).where(Hypothesis.ingest_id == ingest_id).values(ingest_id=None)
+    )
+    db.execute(delete(Ingest).where(Ingest.id == ingest_id))
+
+    db.commit()
 
     return {
-        "message": "Paper ingested successfully",
-        "ingest_id": ingest.id,
-        "chunks_created": len(chunks),
-        "embedding_dim": len(vectors[0]) if vectors else 0
+        "ingest_id": ingest_id,
+        "chunks_deleted": chunks_deleted
     }
+
+
+# =========================
+# INGEST MANY PAPERS (PDF)
+# =========================
+@router.post("/papers")
+def ingest_papers(files: List[UploadFile] = File(...)):
+    """
+    Bulk-ingest many PDFs: parsing fans out across a process pool.
+    Reports per-file success/failure and overall throughput.
+    """
+    paths = [spool_upload(file) for file in files]
+
+    try:
+        return ingest_files(
+            [(path, file.filename) for path, file in zip(paths, files)]
+        )
+    finally:
+        for path in paths:
+            os.unlink(path)
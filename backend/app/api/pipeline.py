@@ -1,211 +1,202 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
 import json
-from typing import List
-
-from app.db.database import get_db
-from app.db.models import (
-    Hypothesis,
-    Assumption,
-    FailureMode,
-    IngestChunk,
+
+from app.config import PIPELINE_JOB_POLL_SECONDS
+from app.db.database import get_db, run_db, SessionLocal
+from app.db.models import Ingest, PipelineJob
+from app.services.pipeline_runner import (
+    STAGES,
+    PIPELINE_MODES,
+    run_pipeline,
+    run_batch,
+    job_queue,
 )
-from app.services.gemini_client import reason
 
 router = APIRouter()
 
 
-# =========================
-# PROMPTS
-# =========================
-HYPOTHESIS_PROMPT = """
-You are a scientific reasoning assistant.
-
-Given the following research context extracted from a paper,
-generate ONE clear, testable scientific hypothesis.
-
-Return JSON only in this format:
-{
-  "hypothesis": "...",
-  "rationale": "...",
-  "falsification": "..."
-}
-"""
-
-ASSUMPTION_PROMPT = """
-You are a scientific reasoning assistant.
-
-Given a hypothesis, list 3–5 key assumptions that must be true
-for the hypothesis to hold.
-
-Return JSON only in this format:
-{
-  "assumptions": [
-    "assumption 1",
-    "assumption 2",
-    "assumption 3"
-  ]
-}
-"""
-
-FAILURE_PROMPT = """
-You are a scientific reasoning assistant.
-
-Given a hypothesis, list 3–5 possible failure modes or reasons
-why the hypothesis may not hold true.
-
-Return JSON only in this format:
-{
-  "failure_modes": [
-    "failure mode 1",
-    "failure mode 2",
-    "failure mode 3"
-  ]
-}
-"""
-
-
 # =========================
 # REQUEST SCHEMA
 # =========================
 class PipelineRequest(BaseModel):
     ingest_id: int
+    use_cache: bool = True  # False re-runs the LLM call
+    mode: str = "parallel"  # sequential | parallel | fused
+    objective: Optional[str] = None  # what context chunks are ranked against
+
+
+class BatchPipelineRequest(BaseModel):
+    ingest_ids: Optional[List[int]] = None
+    # ...or an inclusive id range
+    start_id: Optional[int] = None
+    end_id: Optional[int] = None
+    use_cache: bool = True
+    mode: str = "parallel"
+    objective: Optional[str] = None
 
 
 # =========================
 # AUTO PIPELINE ENDPOINT
 # =========================
 @router.post("/from-ingest")
-def run_auto_pipeline(
+async def run_auto_pipeline(
     request: PipelineRequest,
     db: Session = Depends(get_db)
 ):
-    # -------------------------
-    # 1. Fetch ingest chunks
-    # -------------------------
-    chunks: List[IngestChunk] = (
-        db.query(IngestChunk)
-        .filter(IngestChunk.ingest_id == request.ingest_id)
-        .order_by(IngestChunk.chunk_index)
-        .all()
+    return await run_pipeline(
+        db,
+        request.ingest_id,
+        request.use_cache,
+        mode=request.mode,
+        objective=request.objective
     )
 
-    if not chunks:
+
+# =========================
+# BATCH PIPELINE ENDPOINT
+# =========================
+def _ingest_ids_between(db, start_id: int, end_id: int):
+    return [
+        ingest_id
+        for (ingest_id,) in db.query(Ingest.id)
+        .filter(Ingest.id.between(start_id, end_id))
+        .order_by(Ingest.id)
+    ]
+
+
+@router.post("/batch")
+async def run_batch_pipeline(
+    request: BatchPipelineRequest,
+    db: Session = Depends(get_db)
+):
+    if request.ingest_ids is not None:
+        ingest_ids = list(dict.fromkeys(request.ingest_ids))
+    elif request.start_id is not None and request.end_id is not None:
+        ingest_ids = await run_db(db, _ingest_ids_between, db, request.start_id, request.end_id)
+    else:
         raise HTTPException(
-            status_code=404,
-            detail="No chunks found for this ingest_id"
+            status_code=400,
+            detail="Provide ingest_ids or start_id + end_id"
         )
 
-    context_text = "\n".join(chunk.content for chunk in chunks)
-    context_text = context_text[:8000]  # LLM safety
+    return await run_batch(
+        db,
+        ingest_ids,
+        request.use_cache,
+        request.mode,
+        objective=request.objective
+    )
 
-    # -------------------------
-    # 2. Generate hypothesis
-    # -------------------------
-    result = reason(HYPOTHESIS_PROMPT, context_text)
 
+# =========================
+# BACKGROUND JOBS
+# =========================
+def _job_out(job: PipelineJob):
+    stages = json.loads(job.stages) if job.stages else {
+        name: {"status": "pending"} for name in STAGES
+    }
+    return {
+        "job_id": job.id,
+        "ingest_id": job.ingest_id,
+        "status": job.status,
+        "mode": job.mode,
+        "objective": job.objective,
+        "stages": stages,
+        "hypothesis_id": job.hypothesis_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def _load_job(job_id: int):
+    """
+    _job_out() of a job in a session of its own, or None
+    """
+    db = SessionLocal()
     try:
-        parsed = json.loads(result)
-        hypothesis_text = parsed["hypothesis"]
-        rationale = parsed["rationale"]
-        falsification = parsed["falsification"]
-    except Exception:
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to generate hypothesis"
-        )
+        row = db.get(PipelineJob, job_id)
+        return _job_out(row) if row else None
+    finally:
+        db.close()
 
-    hypothesis = Hypothesis(
-        context=f"Ingest #{request.ingest_id}",
-        hypothesis=hypothesis_text,
-        rationale=rationale,
-        falsification=falsification
+
+@router.post("/jobs", status_code=202)
+def submit_pipeline_job(
+    request: PipelineRequest,
+    db: Session = Depends(get_db)
+):
+    if not db.get(Ingest, request.ingest_id):
+        raise HTTPException(status_code=404, detail="Ingest not found")
+
+    if request.mode not in PIPELINE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown pipeline mode '{request.mode}'")
+
+    job = PipelineJob(
+        ingest_id=request.ingest_id,
+        use_cache=request.use_cache,
+        mode=request.mode,
+        objective=request.objective
     )
-    db.add(hypothesis)
+    db.add(job)
     db.commit()
-    db.refresh(hypothesis)
 
-    # -------------------------
-    # 3. Generate assumptions
-    # -------------------------
-    result = reason(ASSUMPTION_PROMPT, hypothesis.hypothesis)
+    job_queue.enqueue(job.id)
 
-    try:
-        parsed = json.loads(result)
-        assumptions_list = parsed.get("assumptions", [])
-    except Exception:
-        assumptions_list = []
+    return {"job_id": job.id, "status": job.status}
 
-    assumptions_saved: List[Assumption] = []
 
-    for text in assumptions_list:
-        a = Assumption(
-            hypothesis_id=hypothesis.id,
-            assumption=text
-        )
-        db.add(a)
-        assumptions_saved.append(a)
+@router.get("/jobs/{job_id}")
+def get_pipeline_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    job = db.get(PipelineJob, job_id)
 
-    db.commit()
-    for a in assumptions_saved:
-        db.refresh(a)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    # -------------------------
-    # 4. Generate failure modes
-    # -------------------------
-    result = reason(FAILURE_PROMPT, hypothesis.hypothesis)
+    return _job_out(job)
 
-    try:
-        parsed = json.loads(result)
-        failure_list = (
-            parsed.get("failure_modes")
-            or parsed.get("failures")
-            or []
-        )
-    except Exception:
-        failure_list = []
 
-    failures_saved: List[FailureMode] = []
+@router.get("/jobs/{job_id}/events")
+async def stream_pipeline_job(job_id: int):
+    """
+    Server-Sent Events: one `stage` event per stage status change,
+    then a final `done` event with the whole job (or an `error` event
+    if the job is deleted meanwhile)
+    """
+    if await run_in_threadpool(_load_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    for text in failure_list:
-        f = FailureMode(
-            hypothesis_id=hypothesis.id,
-            failure=text
-        )
-        db.add(f)
-        failures_saved.append(f)
+    async def events():
+        sent = {}
 
-    db.commit()
-    for f in failures_saved:
-        db.refresh(f)
+        while True:
+            job = await run_in_threadpool(_load_job, job_id)
 
-    # -------------------------
-    # 5. Unified response
-    # -------------------------
-    return {
-        "ingest_id": request.ingest_id,
-        "hypothesis": {
-            "id": hypothesis.id,
-            "hypothesis": hypothesis.hypothesis,
-            "rationale": hypothesis.rationale,
-            "falsification": hypothesis.falsification,
-            "created_at": hypothesis.created_at,
-        },
-        "assumptions": [
-            {
-                "id": a.id,
-                "assumption": a.assumption,
-                "created_at": a.created_at,
-            }
-            for a in assumptions_saved
-        ],
-        "failure_modes": [
-            {
-                "id": f.id,
-                "failure": f.failure,
-                "created_at": f.created_at,
-            }
-            for f in failures_saved
-        ],
-    }
+            # Deleted (with its ingest) while the stream was open
+            if job is None:
+                payload = json.dumps({"job_id": job_id, "detail": "Job not found"})
+                yield f"event: error\ndata: {payload}\n\n"
+                return
+
+            for name, stage in job["stages"].items():
+                if sent.get(name) != stage["status"]:
+                    sent[name] = stage["status"]
+                    payload = json.dumps({"stage": name, **stage}, default=str)
+                    yield f"event: stage\ndata: {payload}\n\n"
+
+            if job["status"] in ("succeeded", "failed"):
+                yield f"event: done\ndata: {json.dumps(job, default=str)}\n\n"
+                return
+
+            await asyncio.sleep(PIPELINE_JOB_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+from app.config import SEARCH_MAX_QUERIES, SEARCH_MAX_TOP_K
+from app.db.database import get_db, run_db
+from app.db.models import Ingest, IngestChunk
+from app.services.context_builder import load_chunk_texts
+from app.services.embedding_service import aembed_chunks
+from app.services.vector_store import search_vectors_batch
+
+router = APIRouter()
+
+# Rows per IN (...) when loading hit metadata
+LOAD_BATCH = 500
+
+
+# =========================
+# REQUEST SCHEMA
+# =========================
+class SearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    # Filters (combined with AND)
+    ingest_ids: Optional[List[int]] = None
+    created_after: Optional[datetime] = None   # ingest created_at >= ...
+    created_before: Optional[datetime] = None  # ingest created_at < ...
+    include_text: bool = False
+
+
+# =========================
+# HELPERS
+# =========================
+def _allowed_ranges(db: Session, request: SearchRequest):
+    """
+    [start, end) chunk id ranges passing the filters, or None when
+    there are none. Chunks are inserted in per-ingest batches, so the
+    matching ids form few contiguous runs: the database collapses them
+    (consecutive ids share id - row_number) instead of listing them all.
+    """
+    if (
+        request.ingest_ids is None
+        and request.created_after is None
+        and request.created_before is None
+    ):
+        return None
+
+    query = db.query(
+        IngestChunk.id.label("id"),
+        (IngestChunk.id - func.row_number().over(order_by=IngestChunk.id)).label("run")
+    )
+
+    if request.ingest_ids is not None:
+        query = query.filter(IngestChunk.ingest_id.in_(request.ingest_ids))
+
+    if request.created_after is not None or request.created_before is not None:
+        query = query.join(Ingest, Ingest.id == IngestChunk.ingest_id)
+        if request.created_after is not None:
+            query = query.filter(Ingest.created_at >= request.created_after)
+        if request.created_before is not None:
+            query = query.filter(Ingest.created_at < request.created_before)
+
+    matching = query.subquery()
+    runs = (
+        db.query(func.min(matching.c.id), func.max(matching.c.id) + 1)
+        .group_by(matching.c.run)
+        .order_by(func.min(matching.c.id))
+    )
+
+    return [(start, end) for start, end in runs]
+
+
+def _chunk_meta(db: Session, chunk_ids: List[int]):
+    meta = {}
+
+    for i in range(0, len(chunk_ids), LOAD_BATCH):
+        rows = (
+            db.query(
+                IngestChunk.id,
+                IngestChunk.ingest_id,
+                IngestChunk.chunk_index,
+                Ingest.title
+            )
+            .join(Ingest, Ingest.id == IngestChunk.ingest_id)
+            .filter(IngestChunk.id.in_(chunk_ids[i:i + LOAD_BATCH]))
+        )
+        meta.update({row.id: row for row in rows})
+
+    return meta
+
+
+# =========================
+# SEMANTIC SEARCH
+# =========================
+@router.post("")
+async def search(
+    request: SearchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Embed all queries in one pass, run one batched FAISS search and
+    return the best chunks per query with their ingest titles.
+
+    `distance` is squared L2; `score` is the cosine similarity it
+    implies for the (unit-length) MiniLM embeddings.
+    """
+    if not request.queries or len(request.queries) > SEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Provide 1 to {SEARCH_MAX_QUERIES} queries"
+        )
+
+    if not 1 <= request.top_k <= SEARCH_MAX_TOP_K:
+        raise HTTPException(
+            status_code=400,
+            detail=f"top_k must be between 1 and {SEARCH_MAX_TOP_K}"
+        )
+
+    allowed_ranges = await run_db(db, _allowed_ranges, db, request)
+
+    query_vectors = await aembed_chunks(request.queries)
+    hits = await run_in_threadpool(
+        search_vectors_batch,
+        query_vectors,
+        request.top_k,
+        ingest_ids=request.ingest_ids,
+        allowed_ranges=allowed_ranges
+    )
+
+    hit_ids = list(dict.fromkeys(chunk_id for row in hits for chunk_id, _ in row))
+    meta = await run_db(db, _chunk_meta, db, hit_ids)
+    texts = await run_db(db, load_chunk_texts, db, hit_ids) if request.include_text else {}
+
+    results = []
+
+    for query, row in zip(request.queries, hits):
+        matches = []
+
+        for chunk_id, distance in row:
+            # Vectors can outlive their chunk rows
+            if chunk_id not in meta:
+                continue
+
+            chunk = meta[chunk_id]
+            match = {
+                "chunk_id": chunk_id,
+                "ingest_id": chunk.ingest_id,
+                "title": chunk.title,
+                "chunk_index": chunk.chunk_index,
+                "score": round(1 - distance / 2, 6),
+                "distance": round(distance, 6),
+            }
+            if request.include_text:
+                match["text"] = texts.get(chunk_id)
+            matches.append(match)
+
+        results.append({"query": query, "matches": matches})
+
+    return {"results": results}
@@ -0,0 +1,38 @@
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def insert_returning(db, model, rows, *columns):
+    """
+    INSERT many rows as one batched statement and return the requested
+    columns (e.g. id, created_at) in the same order as `rows`.
+
+    Replaces add() + commit() + refresh() per row, which costs one
+    SELECT per saved object.
+    """
+    if not rows:
+        return []
+
+    return db.execute(
+        insert(model).returning(*columns, sort_by_parameter_order=True),
+        rows
+    ).all()
+
+
+def insert_ignore(db, model, rows):
+    """
+    INSERT many rows, skipping any that hit a unique constraint (rows
+    another process inserted first) instead of failing the batch
+    """
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(model).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = sqlite.insert(model).on_conflict_do_nothing()
+    else:
+        statement = insert(model).prefix_with("IGNORE")  # MySQL / MariaDB
+
+    db.execute(statement, rows)
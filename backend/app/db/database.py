@@ -1,15 +1,73 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
 
-# SQLite database URL
-DATABASE_URL = "sqlite:///./scientific_reasoning.db"
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, declarative_base
 
-# Create database engine
-engine = create_engine(
+from app.config import (
     DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
 )
 
+
+# =========================
+# SQLite Tuning
+# =========================
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run alongside the single writer; NORMAL sync is
+    still crash-safe in WAL mode (only the last commits can be lost
+    on power failure, never corrupted)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+# =========================
+# Engine Factory
+# =========================
+def create_db_engine(url: str = DATABASE_URL, tune: bool = True):
+    """
+    Engine for any SQLAlchemy URL: SQLite gets WAL + pragmas,
+    server databases get a sized, pre-pinged connection pool
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,  # Needed for SQLite
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            }
+        )
+        if tune:
+            event.listen(engine, "connect", _sqlite_pragmas)
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+
+# Create database engine
+engine = create_db_engine()
+
 # Create session factory
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -28,3 +86,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs), blocking Session work, in a worker
+    thread so a lock wait never stalls the event loop. Calls on one
+    session run one at a time (coroutines may share it), and a
+    cancelled caller still waits for its call to finish before the
+    session is reused.
+    """
+    lock = db.info.get("run_db_lock")
+    if lock is None:
+        lock = db.info["run_db_lock"] = asyncio.Lock()
+
+    async with lock:
+        call = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            await asyncio.wait([call])
+            raise
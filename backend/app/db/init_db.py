@@ -1,5 +1,6 @@
 from app.db.database import engine, Base
 from app.db import models  # noqa: F401  (IMPORTANT: registers all models)
+from app.db.migrations import migrate
 
 
 def init_db():
@@ -7,6 +8,9 @@ def init_db():
     print("Using database engine:", engine.url)
     Base.metadata.create_all(bind=engine)
     print("Database tables created successfully.")
+    print("Applying migrations...")
+    migrate(engine)
+    print("Database schema up to date.")
 
 
 if __name__ == "__main__":
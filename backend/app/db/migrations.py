@@ -0,0 +1,161 @@
+import re
+
+from sqlalchemy import inspect, text
+
+from app.db.database import Base
+
+
+# =========================
+# Helpers
+# =========================
+def _columns(conn, table: str):
+    return {c["name"]: c for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table: str, column: str, ddl_type: str):
+    if column not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+# =========================
+# Migrations
+# =========================
+def chunk_offsets(conn):
+    """
+    Offset-based chunks: ingests.body, ingest_chunks.start/end_offset,
+    and ingest_chunks.content becomes nullable
+    """
+    _add_column(conn, "ingests", "body", "TEXT")
+    _add_column(conn, "ingest_chunks", "start_offset", "INTEGER")
+    _add_column(conn, "ingest_chunks", "end_offset", "INTEGER")
+
+    if _columns(conn, "ingest_chunks")["content"]["nullable"]:
+        return
+
+    if conn.dialect.name != "sqlite":
+        conn.execute(text("ALTER TABLE ingest_chunks ALTER COLUMN content DROP NOT NULL"))
+        return
+
+    # SQLite can't drop NOT NULL in place: rebuild the table
+    table = Base.metadata.tables["ingest_chunks"]
+    names = ", ".join(c.name for c in table.columns)
+
+    for index in inspect(conn).get_indexes("ingest_chunks"):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+
+    conn.execute(text("ALTER TABLE ingest_chunks RENAME TO ingest_chunks_old"))
+    table.create(conn)
+    conn.execute(text(
+        f"INSERT INTO ingest_chunks ({names}) SELECT {names} FROM ingest_chunks_old"
+    ))
+    conn.execute(text("DROP TABLE ingest_chunks_old"))
+
+
+def pipeline_job_mode(conn):
+    """
+    pipeline_jobs.mode (sequential | parallel | fused)
+    """
+    _add_column(conn, "pipeline_jobs", "mode", "VARCHAR NOT NULL DEFAULT 'parallel'")
+
+
+def canonical_links(conn):
+    """
+    assumptions / failure_modes.canonical_id (near-duplicate clusters)
+    """
+    for table in ("assumptions", "failure_modes"):
+        _add_column(conn, table, "canonical_id", f"INTEGER REFERENCES {table}(id)")
+
+
+def contradiction_checks(conn):
+    """
+    hypotheses.contradictions_checked_at (the contradictions table
+    itself is new, so create_all makes it)
+    """
+    _add_column(conn, "hypotheses", "contradictions_checked_at", "TIMESTAMP")
+
+
+def hypothesis_ingests(conn):
+    """
+    hypotheses.ingest_id, backfilled from the "Ingest #N" context that
+    ingest-generated hypotheses used to be recognized by
+    """
+    if "ingest_id" in _columns(conn, "hypotheses"):
+        return
+
+    _add_column(conn, "hypotheses", "ingest_id", "INTEGER REFERENCES ingests(id)")
+
+    existing = {row.id for row in conn.execute(text("SELECT id FROM ingests"))}
+    links = []
+    for row in conn.execute(text("SELECT id, context FROM hypotheses WHERE context LIKE 'Ingest #%'")):
+        match = re.fullmatch(r"Ingest #(\d+)", row.context)
+        if match and int(match.group(1)) in existing:
+            links.append({"id": row.id, "ingest_id": int(match.group(1))})
+
+    if links:
+        conn.execute(text("UPDATE hypotheses SET ingest_id = :ingest_id WHERE id = :id"), links)
+
+
+def change_timestamps(conn):
+    """
+    hypotheses / assumptions / failure_modes.updated_at (the knowledge
+    graph's sync watermark), backfilled from created_at
+    """
+    for table in ("hypotheses", "assumptions", "failure_modes"):
+        if "updated_at" in _columns(conn, table):
+            continue
+        _add_column(conn, table, "updated_at", "TIMESTAMP")
+        conn.execute(text(f"UPDATE {table} SET updated_at = created_at"))
+
+
+def pipeline_job_objective(conn):
+    """
+    pipeline_jobs.objective (what context chunks are ranked against)
+    """
+    _add_column(conn, "pipeline_jobs", "objective", "TEXT")
+
+
+def hot_path_indexes(conn):
+    """
+    Indexes declared on the models after their tables were created,
+    e.g. ingest_chunks(ingest_id, chunk_index), the keyset indexes and
+    *.canonical_id
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def keyset_indexes(conn):
+    """
+    Drop single-column indexes now covered by the (…, created_at, id)
+    keyset-pagination indexes created by hot_path_indexes
+    """
+    for index in (
+        "ix_hypotheses_created_at",
+        "ix_assumptions_hypothesis_id",
+        "ix_failure_modes_hypothesis_id",
+    ):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+
+# Applied in order; every step is idempotent
+MIGRATIONS = [
+    chunk_offsets,
+    pipeline_job_mode,
+    canonical_links,
+    contradiction_checks,
+    hypothesis_ingests,
+    change_timestamps,
+    pipeline_job_objective,
+    hot_path_indexes,  # after every column step: creates any missing model index
+    keyset_indexes,
+]
+
+
+def migrate(engine):
+    """
+    Bring an existing database up to the current models
+    """
+    for step in MIGRATIONS:
+        with engine.begin() as conn:
+            step(conn)
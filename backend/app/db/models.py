@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, String, Boolean, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -16,7 +16,20 @@ class Hypothesis(Base):
     hypothesis = Column(Text, nullable=False)
     rationale = Column(Text, nullable=False)
     falsification = Column(Text, nullable=False)
+    # Paper it was generated from (NULL: manual context, or deleted since)
+    ingest_id = Column(Integer, ForeignKey("ingests.id"), nullable=True)
+    # When contradiction candidates were generated for it; NULL = pending
+    contradictions_checked_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Knowledge-graph sync watermark
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # /history keyset order
+        Index("ix_hypotheses_created_at_id", "created_at", "id"),
+        Index("ix_hypotheses_ingest_id", "ingest_id"),
+        Index("ix_hypotheses_updated_at", "updated_at"),
+    )
 
 
 # =========================
@@ -28,7 +41,19 @@ class Assumption(Base):
     id = Column(Integer, primary_key=True, index=True)
     hypothesis_id = Column(Integer, ForeignKey("hypotheses.id"))
     assumption = Column(Text, nullable=False)
+    # Near-duplicate cluster: id of the canonical row (its own id if it
+    # is canonical); NULL until deduplicated
+    canonical_id = Column(Integer, ForeignKey("assumptions.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Knowledge-graph sync watermark
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # by-hypothesis filter + keyset order
+        Index("ix_assumptions_hypothesis_id_created_at", "hypothesis_id", "created_at", "id"),
+        Index("ix_assumptions_canonical_id", "canonical_id"),
+        Index("ix_assumptions_updated_at", "updated_at"),
+    )
 
 
 # =========================
@@ -40,7 +65,19 @@ class FailureMode(Base):
     id = Column(Integer, primary_key=True, index=True)
     hypothesis_id = Column(Integer, ForeignKey("hypotheses.id"))
     failure = Column(Text, nullable=False)
+    # Near-duplicate cluster: id of the canonical row (its own id if it
+    # is canonical); NULL until deduplicated
+    canonical_id = Column(Integer, ForeignKey("failure_modes.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Knowledge-graph sync watermark
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # by-hypothesis filter + keyset order
+        Index("ix_failure_modes_hypothesis_id_created_at", "hypothesis_id", "created_at", "id"),
+        Index("ix_failure_modes_canonical_id", "canonical_id"),
+        Index("ix_failure_modes_updated_at", "updated_at"),
+    )
 
 
 # =========================
@@ -51,6 +88,7 @@ class Ingest(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
+    body = Column(Text, nullable=True)  # full text; chunks hold offsets into it
     created_at = Column(DateTime, default=datetime.utcnow)
 
     chunks = relationship(
@@ -65,11 +103,67 @@ class Ingest(Base):
 # =========================
 class IngestChunk(Base):
     __tablename__ = "ingest_chunks"
+    __table_args__ = (
+        # Chunks of one ingest, already in reading order
+        Index("ix_ingest_chunks_ingest_id_chunk_index", "ingest_id", "chunk_index"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     ingest_id = Column(Integer, ForeignKey("ingests.id"))
-    content = Column(Text, nullable=False)
+    content = Column(Text, nullable=True)  # legacy rows; new rows use offsets
+    start_offset = Column(Integer, nullable=True)
+    end_offset = Column(Integer, nullable=True)
     chunk_index = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     ingest = relationship("Ingest", back_populates="chunks")
+
+    @property
+    def text(self) -> str:
+        """
+        Chunk text, sliced from the ingest body for offset-based rows
+        """
+        if self.content is not None:
+            return self.content
+        return self.ingest.body[self.start_offset:self.end_offset]
+
+
+# =========================
+# Pipeline Job (background auto pipeline)
+# =========================
+class PipelineJob(Base):
+    __tablename__ = "pipeline_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ingest_id = Column(Integer, ForeignKey("ingests.id"), nullable=False)
+    use_cache = Column(Boolean, nullable=False, default=True)
+    mode = Column(String, nullable=False, default="parallel")  # sequential | parallel | fused
+    objective = Column(Text, nullable=True)  # what context chunks are ranked against
+    status = Column(String, nullable=False, default="queued")  # queued | running | succeeded | failed
+    stages = Column(Text, nullable=True)  # JSON: stage -> {status, result}
+    hypothesis_id = Column(Integer, ForeignKey("hypotheses.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# =========================
+# Contradiction (pair of hypotheses)
+# =========================
+class Contradiction(Base):
+    __tablename__ = "contradictions"
+    __table_args__ = (
+        # One row per pair, stored with hypothesis_a_id < hypothesis_b_id
+        UniqueConstraint("hypothesis_a_id", "hypothesis_b_id", name="uq_contradictions_pair"),
+        Index("ix_contradictions_hypothesis_b_id", "hypothesis_b_id"),
+        Index("ix_contradictions_status_created_at", "status", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    hypothesis_a_id = Column(Integer, ForeignKey("hypotheses.id"), nullable=False)
+    hypothesis_b_id = Column(Integer, ForeignKey("hypotheses.id"), nullable=False)
+    similarity = Column(Float, nullable=False)  # cosine of hypothesis + rationale embeddings
+    status = Column(String, nullable=False, default="candidate")  # candidate | contradiction | consistent | unclear
+    explanation = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
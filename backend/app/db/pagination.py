@@ -0,0 +1,91 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+# =========================
+# Cursor
+# =========================
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Opaque cursor for the last row of a page
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """
+    (created_at, id) from a cursor; ValueError if it is malformed
+    """
+    try:
+        created_at, row_id = (
+            base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        )
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# =========================
+# Projection
+# =========================
+def projection(model, fields: str, allowed, default):
+    """
+    Columns to load for a comma-separated `fields` list.
+
+    `id` and `created_at` are always loaded (they form the cursor);
+    anything else must be in `allowed`. ValueError on unknown fields.
+    """
+    names = default if not fields else [
+        name.strip() for name in fields.split(",") if name.strip()
+    ]
+
+    unknown = [name for name in names if name not in allowed and name not in ("id", "created_at")]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields {unknown}, expected any of {sorted(allowed)}"
+        )
+
+    extra = [name for name in dict.fromkeys(names) if name in allowed]
+    return [model.id, model.created_at] + [getattr(model, name) for name in extra]
+
+
+# =========================
+# Keyset Page
+# =========================
+def keyset_page(query, model, cursor: str, limit: int, descending: bool = True):
+    """
+    One page of `query` ordered by (created_at, id).
+
+    Rows after the cursor are selected with a range predicate on the
+    sort key, so every page costs the same however deep it is (no
+    OFFSET). Returns (rows, next_cursor); next_cursor is None on the
+    last page.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > row_id)
+            ))
+
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at, model.id)
+
+    rows = query.limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
@@ -1,6 +1,21 @@
+import asyncio
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 
-from app.api import ingest, hypothesis, assumptions, failure, pipeline
+from app.api import ingest, hypothesis, assumptions, failure, pipeline, search, graph, contradictions
+from app.config import WARMUP_ON_STARTUP
+from app.services import embedding_service, gemini_client
+from app.services.vector_store import load_index
+from app.services.pipeline_runner import job_queue
+from app.services.knowledge_graph import watch_drift
+
+# Time spent importing the app (tracked by benchmarks/bench_startup.py)
+IMPORT_MS = (time.perf_counter() - _import_started) * 1000
+startup_ms = None
+_graph_watch = None
 
 app = FastAPI(
     title="Scientific Reasoning OS",
@@ -8,6 +23,38 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# =========================
+# Startup
+# =========================
+@app.on_event("startup")
+async def on_startup():
+    global startup_ms, _graph_watch
+    started = time.perf_counter()
+
+    # Reopen the persisted FAISS snapshot + replay its append-log
+    load_index()
+
+    # Heavy resources otherwise load lazily on first use
+    if WARMUP_ON_STARTUP:
+        embedding_service.warm_up()
+        gemini_client.get_client()
+
+    # Background pipeline job workers
+    await job_queue.start()
+
+    # Knowledge-graph vs. table drift check, off the request path
+    _graph_watch = asyncio.create_task(watch_drift())
+
+    startup_ms = (time.perf_counter() - started) * 1000
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if _graph_watch is not None:
+        _graph_watch.cancel()
+    await job_queue.stop()
+
+
 # =========================
 # Register API Routers
 # =========================
@@ -42,6 +89,24 @@ app.include_router(
     tags=["Auto Pipeline"]
 )
 
+app.include_router(
+    search.router,
+    prefix="/search",
+    tags=["Search"]
+)
+
+app.include_router(
+    graph.router,
+    prefix="/graph",
+    tags=["Knowledge Graph"]
+)
+
+app.include_router(
+    contradictions.router,
+    prefix="/contradictions",
+    tags=["Contradictions"]
+)
+
 
 # =========================
 # Health Check
@@ -52,3 +117,19 @@ def root():
         "status": "Backend running successfully",
         "service": "Scientific Reasoning OS"
     }
+
+
+# =========================
+# Metrics
+# =========================
+@app.get("/metrics")
+def metrics():
+    return {
+        "startup": {
+            "import_ms": round(IMPORT_MS, 1),
+            "startup_ms": round(startup_ms, 1) if startup_ms is not None else None,
+        },
+        "embedding_cache": embedding_service.cache.stats(),
+        "llm": gemini_client.stats.snapshot(),
+        "llm_cache": gemini_client.response_cache.stats(),
+    }
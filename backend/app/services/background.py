@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingTask:
+    """
+    Runs an async pass in the background, off the request path.
+
+    `trigger()` during a run schedules exactly one more pass after it,
+    so rows inserted mid-run are still picked up. Errors are logged and
+    end the run: passes work from pending rows in the database, so the
+    next trigger retries whatever was left.
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self._task = None
+        self._rerun = False
+
+    def trigger(self):
+        if self._task is not None and not self._task.done():
+            self._rerun = True
+            return
+
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            self._rerun = False
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Background pass %s failed", self.run.__qualname__)
+                return
+            if not self._rerun:
+                return
@@ -0,0 +1,218 @@
+"""
+Bulk ingestion of many PDFs.
+
+PyMuPDF parsing and chunking fan out across a process pool; the
+parent process persists chunks, embeds them (through the shared
+micro-batching engine + cache) and stores vectors as each paper
+finishes parsing. Only a few papers per worker are in flight at a
+time, so parent memory does not grow with the corpus.
+
+CLI (from backend/):
+    python -m app.services.bulk_ingest papers/ extra.pdf --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+from sqlalchemy import delete
+
+from app.config import BULK_INGEST_WORKERS, INGEST_BATCH_SIZE
+from app.db.bulk import insert_returning
+from app.db.database import SessionLocal
+from app.db.models import Ingest, IngestChunk
+from app.services.chunker import chunk_spans
+from app.services.embedding_service import embed_chunks
+from app.services.parser import iter_pdf_file_pages
+from app.services.vector_store import remove_vectors, store_vectors
+
+# Papers submitted to the pool per worker; parsed bodies wait in the
+# parent until stored, so this bounds its memory
+IN_FLIGHT_PER_WORKER = 2
+
+
+def collect_pdfs(paths):
+    """
+    Expand directories into the PDFs they contain (recursively)
+    """
+    found = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.lower().endswith(".pdf")
+                )
+        else:
+            found.append(path)
+
+    return found
+
+
+def parse_and_chunk(path: str):
+    """
+    Worker-process task: PDF path -> (body text, chunk offsets)
+    """
+    body = "".join(iter_pdf_file_pages(path))
+    return body, chunk_spans(body)
+
+
+def discard_paper(db, ingest_id: int):
+    """
+    Remove a partly stored paper: its vectors, chunks and ingest row
+    """
+    chunk_ids = [
+        row.id for row in
+        db.query(IngestChunk.id).filter(IngestChunk.ingest_id == ingest_id)
+    ]
+
+    remove_vectors(chunk_ids, ingest_id)
+    db.execute(delete(IngestChunk).where(IngestChunk.ingest_id == ingest_id))
+    db.execute(delete(Ingest).where(Ingest.id == ingest_id))
+    db.commit()
+
+
+def store_paper(db, title: str, body: str, spans):
+    """
+    Persist one parsed paper, then embed + store its vectors in batches.
+    If a batch fails, what was already stored of the paper is removed.
+    """
+    ingest_id = insert_returning(
+        db,
+        Ingest,
+        [{"title": title, "body": body}],
+        Ingest.id
+    )[0].id
+
+    try:
+        for start in range(0, len(spans), INGEST_BATCH_SIZE):
+            batch = spans[start:start + INGEST_BATCH_SIZE]
+
+            rows = insert_returning(
+                db,
+                IngestChunk,
+                [
+                    {
+                        "ingest_id": ingest_id,
+                        "start_offset": s,
+                        "end_offset": e,
+                        "chunk_index": start + idx,
+                    }
+                    for idx, (s, e) in enumerate(batch)
+                ],
+                IngestChunk.id
+            )
+            chunk_ids = [row.id for row in rows]
+
+            db.commit()
+
+            store_vectors(chunk_ids, embed_chunks([body[s:e] for s, e in batch]), ingest_id)
+    except Exception:
+        db.rollback()
+        discard_paper(db, ingest_id)
+        raise
+
+    return ingest_id
+
+
+def ingest_files(files, workers: int = BULK_INGEST_WORKERS):
+    """
+    Ingest many PDFs given as (path, title) pairs.
+
+    Returns a per-file report plus overall throughput.
+    """
+    started = time.perf_counter()
+    results = []
+    total_chunks = 0
+
+    db = SessionLocal()
+
+    try:
+        # spawn: forking the multithreaded API process can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            queued = iter(files)
+            futures = {}
+
+            def submit_next():
+                for path, title in queued:
+                    futures[pool.submit(parse_and_chunk, path)] = title
+                    return
+
+            for _ in range(workers * IN_FLIGHT_PER_WORKER):
+                submit_next()
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    # Drop the future (and its parsed body) once consumed
+                    title = futures.pop(future)
+                    submit_next()
+
+                    try:
+                        body, spans = future.result()
+
+                        if not spans:
+                            raise ValueError("Failed to extract text from PDF")
+
+                        ingest_id = store_paper(db, title, body, spans)
+                    except Exception as exc:
+                        db.rollback()
+                        results.append({
+                            "file": title,
+                            "status": "failed",
+                            "error": str(exc),
+                        })
+                        continue
+
+                    total_chunks += len(spans)
+                    results.append({
+                        "file": title,
+                        "status": "ok",
+                        "ingest_id": ingest_id,
+                        "chunks_created": len(spans),
+                    })
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+
+    return {
+        "files": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "chunks_created": total_chunks,
+        "seconds": round(elapsed, 2),
+        "papers_per_min": round(succeeded / elapsed * 60, 1) if elapsed else None,
+        "chunks_per_sec": round(total_chunks / elapsed, 1) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-ingest PDF papers")
+    parser.add_argument("paths", nargs="+", help="PDF files and/or directories")
+    parser.add_argument("--workers", type=int, default=BULK_INGEST_WORKERS)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    print(f"Ingesting {len(pdfs)} PDFs with {args.workers} parser processes...")
+
+    report = ingest_files(
+        [(path, os.path.basename(path)) for path in pdfs],
+        workers=args.workers
+    )
+
+    for r in report["files"]:
+        if r["status"] == "ok":
+            print(f"  ok      {r['file']}  ingest #{r['ingest_id']}, {r['chunks_created']} chunks")
+        else:
+            print(f"  FAILED  {r['file']}  {r['error']}")
+
+    print(
+        f"{report['succeeded']} ingested, {report['failed']} failed in {report['seconds']}s "
+        f"({report['papers_per_min']} papers/min, {report['chunks_per_sec']} chunks/sec)"
+    )
@@ -1,12 +1,167 @@
-def chunk_text(text: str, size: int = 800, overlap: int = 200):
+import re
+
+from app.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_SENTENCES
+
+# Sentence ends: terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or a blank line between paragraphs
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+|\n\s*\n")
+
+# Rough WordPiece granularity: long words split into ~6-char pieces
+TOKEN = re.compile(r"\w{1,6}|[^\w\s]")
+
+# Re-chunk the streaming buffer after this many new characters
+STREAM_WINDOW = 16384
+
+
+def count_tokens(text: str, start: int = 0, end: int = None) -> int:
+    """
+    Approximate MiniLM token count of text[start:end] (no copy)
+    """
+    end = len(text) if end is None else end
+    return sum(1 for _ in TOKEN.finditer(text, start, end))
+
+
+def _trim(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def sentence_spans(text: str, start: int = 0, end: int = None):
     """
-    Break long text into overlapping chunks
+    Yield (start, end) offsets of the sentences in text[start:end]
+    """
+    end = len(text) if end is None else end
+    pos = start
+
+    for match in SENTENCE_END.finditer(text, start, end):
+        span = _trim(text, pos, match.end())
+        if span[0] < span[1]:
+            yield span
+        pos = match.end()
+
+    span = _trim(text, pos, end)
+    if span[0] < span[1]:
+        yield span
+
+
+def _split_long(text: str, start: int, end: int, max_tokens: int):
+    """
+    Cut an over-long sentence at token boundaries
+    """
+    tokens = [m.span() for m in TOKEN.finditer(text, start, end)]
+
+    for i in range(0, len(tokens), max_tokens):
+        piece = tokens[i:i + max_tokens]
+        yield piece[0][0], piece[-1][1]
+
+
+def chunk_spans(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+    start: int = 0,
+    end: int = None
+):
+    """
+    Break text into (start, end) chunk offsets without copying it.
+
+    Whole sentences are packed greedily up to `max_tokens`; a sentence
+    longer than the budget is split at token boundaries, and its last
+    piece may share a chunk with the sentences after it. Neighbouring
+    chunks share `overlap_sentences` sentences (none by default).
     """
-    chunks = []
-    start = 0
+    spans = []
+    current = []  # (start, end, tokens) of the sentences in the open chunk
+    current_tokens = 0
+
+    def flush():
+        if current:
+            spans.append((current[0][0], current[-1][1]))
+
+    for s, e in sentence_spans(text, start, end):
+        n = count_tokens(text, s, e)
+
+        if n > max_tokens:
+            flush()
+            pieces = list(_split_long(text, s, e, max_tokens))
+            spans.extend(pieces[:-1])
+
+            # The tail piece stays open, so following sentences can join it
+            s, e = pieces[-1]
+            current, current_tokens = [], 0
+            n = count_tokens(text, s, e)
+
+        if current and current_tokens + n > max_tokens:
+            flush()
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            current_tokens = sum(t for _, _, t in current)
+
+            while current and current_tokens + n > max_tokens:
+                current_tokens -= current.pop(0)[2]
+
+        current.append((s, e, n))
+        current_tokens += n
+
+    flush()
+    return spans
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES
+):
+    """
+    Break long text into sentence-aligned chunks
+    """
+    return [
+        text[s:e]
+        for s, e in chunk_spans(text, max_tokens, overlap_sentences)
+    ]
+
+
+def chunk_stream(
+    pieces,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES
+):
+    """
+    Chunk an iterable of text pieces (e.g. PDF pages) incrementally.
+
+    Yields (start, end, text) with offsets into the concatenation of
+    all pieces, the same spans as chunk_spans() over the whole text.
+    Only the still-open tail is buffered: every chunk except the last
+    one in the buffer is final, because later text can only change the
+    chunk it lands in. With overlap, the last chunk may still be only
+    the sentences carried over from the one before it (which the next
+    sentence can push out), so both are held back and re-chunked.
+    """
+    held = 2 if overlap_sentences else 1
+
+    buffer = ""
+    base = 0       # offset of buffer[0] in the full text
+    scanned = 0    # buffer length at the last re-chunk
+
+    for piece in pieces:
+        buffer += piece
+
+        if len(buffer) - scanned < STREAM_WINDOW:
+            continue
+
+        spans = chunk_spans(buffer, max_tokens, overlap_sentences)
+
+        for s, e in spans[:-held]:
+            yield base + s, base + e, buffer[s:e]
+
+        if len(spans) >= held:
+            keep = spans[-held][0]
+            buffer = buffer[keep:]
+            base += keep
 
-    while start < len(text):
-        chunks.append(text[start:start + size])
-        start += size - overlap
+        scanned = len(buffer)
 
-    return chunks
+    for s, e in chunk_spans(buffer, max_tokens, overlap_sentences):
+        yield base + s, base + e, buffer[s:e]
@@ -0,0 +1,216 @@
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from app.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MMR_LAMBDA,
+    CONTEXT_DEFAULT_OBJECTIVE,
+)
+from app.db.database import run_db
+from app.db.models import Ingest, IngestChunk
+from app.services.chunker import count_tokens
+from app.services.embedding_service import aembed_chunks
+from app.services.vector_store import fetch_vectors, store_vectors
+
+# Token estimate from a chunk's length, before its text is loaded
+CHARS_PER_TOKEN = 4
+
+# Rows per IN (...) when loading chunk text
+LOAD_BATCH = 500
+
+# Serializes the lazy embedding of chunks that were never indexed
+_index_lock = asyncio.Lock()
+
+
+# =========================
+# Chunk Loading
+# =========================
+def load_chunk_texts(db, chunk_ids: List[int]):
+    """
+    {chunk_id: text} for just these chunks; offset-based rows are
+    sliced from the ingest body inside the database (SUBSTR), so the
+    full body never leaves it
+    """
+    texts = {}
+
+    for i in range(0, len(chunk_ids), LOAD_BATCH):
+        rows = (
+            db.query(
+                IngestChunk.id,
+                func.coalesce(
+                    IngestChunk.content,
+                    func.substr(
+                        Ingest.body,
+                        IngestChunk.start_offset + 1,
+                        IngestChunk.end_offset - IngestChunk.start_offset
+                    )
+                )
+            )
+            .join(Ingest, Ingest.id == IngestChunk.ingest_id)
+            .filter(IngestChunk.id.in_(chunk_ids[i:i + LOAD_BATCH]))
+        )
+        texts.update(dict(rows.all()))
+
+    return texts
+
+
+def _chunk_spans(db, ingest_id: int):
+    """
+    Id, position and length of every chunk of an ingest, in order
+    """
+    return (
+        db.query(
+            IngestChunk.id,
+            IngestChunk.chunk_index,
+            IngestChunk.start_offset,
+            IngestChunk.end_offset,
+            func.length(IngestChunk.content).label("content_length")
+        )
+        .filter(IngestChunk.ingest_id == ingest_id)
+        .order_by(IngestChunk.chunk_index)
+        .all()
+    )
+
+
+async def _chunk_vectors(db, ingest_id: int, chunk_ids: List[int]):
+    """
+    Vectors for the chunks, embedding (and indexing) any that were
+    ingested without them, e.g. via /ingest/text
+    """
+    found, vectors = await asyncio.to_thread(fetch_vectors, chunk_ids, ingest_id)
+
+    if len(found) < len(chunk_ids):
+        async with _index_lock:
+            found, vectors = await asyncio.to_thread(fetch_vectors, chunk_ids, ingest_id)
+            missing = sorted(set(chunk_ids) - set(found))
+
+            if missing:
+                texts = await run_db(db, load_chunk_texts, db, missing)
+                new_vectors = await aembed_chunks([texts[i] for i in missing])
+                await asyncio.to_thread(store_vectors, missing, new_vectors, ingest_id)
+
+                found = found + missing
+                vectors = np.vstack([vectors, new_vectors])
+
+    position = {chunk_id: row for row, chunk_id in enumerate(found)}
+    return vectors[[position[chunk_id] for chunk_id in chunk_ids]]
+
+
+# =========================
+# MMR Selection
+# =========================
+def mmr_select(
+    query_vector,
+    vectors,
+    costs,
+    budget: int,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA
+):
+    """
+    Maximal Marginal Relevance under a budget: repeatedly pick the
+    chunk that is most similar to the query and least similar to what
+    is already picked, skipping chunks that no longer fit.
+    Returns row indices in pick order.
+    """
+    def unit(x):
+        x = np.asarray(x, dtype="float32")
+        return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+    vectors = unit(vectors)
+    relevance = vectors @ unit(query_vector)
+    redundancy = np.zeros(len(vectors), dtype="float32")
+    costs = np.asarray(costs)
+    available = costs <= budget
+
+    picked = []
+    remaining = budget
+
+    while available.any():
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+
+        picked.append(best)
+        remaining -= costs[best]
+        available[best] = False
+        available &= costs <= remaining
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+    return picked
+
+
+# =========================
+# Context Builder
+# =========================
+async def build_context(
+    db,
+    ingest_id: int,
+    objective: Optional[str] = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+) -> str:
+    """
+    LLM context for an ingest: its chunks are ranked against
+    `objective` with the vector index, diversified with MMR, packed
+    into `token_budget` tokens and returned in document order, with
+    overlapping text between neighbouring chunks kept once.
+
+    Only chunk offsets are read up front; text is loaded for the
+    selected chunks alone. Database and vector-store reads run in
+    worker threads.
+    """
+    chunks = await run_db(db, _chunk_spans, db, ingest_id)
+
+    if not chunks:
+        raise HTTPException(
+            status_code=404,
+            detail="No chunks found for this ingest_id"
+        )
+
+    chunk_ids = [c.id for c in chunks]
+    estimated = [
+        max(1, (c.content_length or (c.end_offset - c.start_offset)) // CHARS_PER_TOKEN)
+        for c in chunks
+    ]
+
+    # 1. Rank: relevance to the objective, diversified
+    vectors = await _chunk_vectors(db, ingest_id, chunk_ids)
+    query_vector = (await aembed_chunks([objective or CONTEXT_DEFAULT_OBJECTIVE]))[0]
+    picked = mmr_select(query_vector, vectors, estimated, token_budget)
+
+    # 2. Pack by exact token count, in pick order
+    texts = await run_db(db, load_chunk_texts, db, [chunk_ids[i] for i in picked])
+    selected = []
+    used = 0
+
+    for i in picked:
+        n = count_tokens(texts[chunk_ids[i]])
+        if used + n <= token_budget:
+            selected.append(i)
+            used += n
+
+    # A single chunk over budget still beats an empty context
+    if not selected and picked:
+        selected = picked[:1]
+
+    # 3. Emit in document order; overlapping offsets are kept once
+    parts = []
+    covered = -1  # end offset of the text emitted so far
+
+    for i in sorted(selected):
+        chunk = chunks[i]
+        text = texts[chunk.id]
+
+        if chunk.start_offset is not None:
+            if chunk.end_offset <= covered:
+                continue
+            if chunk.start_offset < covered:
+                text = text[covered - chunk.start_offset:].lstrip()
+            covered = chunk.end_offset
+
+        parts.append(text)
+
+    return "\n\n".join(parts)
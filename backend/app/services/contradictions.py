@@ -0,0 +1,329 @@
+"""
+Contradiction detection across stored hypotheses.
+
+Comparing every pair with the LLM is quadratic, so it runs in two
+steps:
+  1. Candidates: each new hypothesis (hypothesis + rationale text) is
+     embedded and paired with its nearest stored hypotheses, using one
+     FAISS inner-product search per batch plus one similarity matrix
+     within the batch. Only pairs above CONTRADICTION_MIN_SIMILARITY
+     are kept, at most CONTRADICTION_NEIGHBORS per hypothesis.
+  2. Adjudication: candidate pairs go to the LLM several per call.
+
+New hypotheses are found by `contradictions_checked_at IS NULL`, so
+the same pass runs incrementally as they arrive and as a backfill. The
+index of checked hypotheses is re-synced with the table before every
+pass, and pairs already inserted by a concurrent pass are skipped:
+
+    python -m app.services.contradictions
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import update
+
+from app.config import (
+    CONTRADICTION_NEIGHBORS,
+    CONTRADICTION_MIN_SIMILARITY,
+    CONTRADICTION_PAIRS_PER_CALL,
+    CONTRADICTION_ON_INSERT,
+)
+from app.db.bulk import insert_ignore
+from app.db.database import SessionLocal, run_db
+from app.db.models import Contradiction, Hypothesis
+from app.services.background import CoalescingTask
+from app.services.embedding_service import aembed_chunks
+from app.services.gemini_client import areason
+from app.services.similarity_index import SimilarityIndex, unit_vectors
+
+# Hypotheses embedded per candidate step / candidates per adjudication step
+CANDIDATE_BATCH = 512
+ADJUDICATION_BATCH = 256
+
+VERDICTS = ("contradiction", "consistent", "unclear")
+
+ADJUDICATION_PROMPT = """
+You are a scientific reasoning assistant.
+
+For each numbered pair of hypotheses below, decide whether they
+contradict each other (they cannot both be true), are consistent,
+or the relationship is unclear.
+
+Return JSON only in this format:
+{
+  "results": [
+    {"pair": 1, "verdict": "contradiction | consistent | unclear", "explanation": "..."}
+  ]
+}
+"""
+
+
+def _text(hypothesis_text: str, rationale: str) -> str:
+    return f"{hypothesis_text}\n{rationale}"
+
+
+def _parse_verdicts(result: str, n_pairs: int):
+    """
+    {pair number (1-based): (verdict, explanation)}; unusable entries
+    are dropped, so those pairs stay candidates
+    """
+    try:
+        entries = json.loads(result)["results"]
+    except Exception:
+        return {}
+
+    verdicts = {}
+    for entry in entries if isinstance(entries, list) else []:
+        try:
+            pair = int(entry["pair"])
+            verdict = str(entry["verdict"]).strip().lower()
+        except Exception:
+            continue
+        if 1 <= pair <= n_pairs and verdict in VERDICTS:
+            verdicts[pair] = (verdict, entry.get("explanation"))
+    return verdicts
+
+
+# Session work, run in a worker thread via run_db
+def _unchecked(db, batch: int):
+    return (
+        db.query(Hypothesis.id, Hypothesis.hypothesis, Hypothesis.rationale)
+        .filter(Hypothesis.contradictions_checked_at.is_(None))
+        .order_by(Hypothesis.id)
+        .limit(batch)
+        .all()
+    )
+
+
+def _store_candidates(db, ids, pairs):
+    """
+    Insert the pairs and mark the hypotheses checked, in one commit
+    """
+    if pairs:
+        insert_ignore(
+            db,
+            Contradiction,
+            [
+                {"hypothesis_a_id": a, "hypothesis_b_id": b, "similarity": s}
+                for (a, b), s in pairs.items()
+            ]
+        )
+    now = datetime.utcnow()
+    db.execute(
+        update(Hypothesis),
+        [{"id": i, "contradictions_checked_at": now} for i in ids]
+    )
+    db.commit()
+
+
+def _open_pairs(db, batch: int, skipped):
+    """
+    (candidate pairs, most similar first; {hypothesis id: text})
+    """
+    pairs = (
+        db.query(Contradiction.id, Contradiction.hypothesis_a_id, Contradiction.hypothesis_b_id)
+        .filter(Contradiction.status == "candidate", Contradiction.id.notin_(skipped))
+        .order_by(Contradiction.similarity.desc(), Contradiction.id)
+        .limit(batch)
+        .all()
+    )
+    if not pairs:
+        return pairs, {}
+
+    texts = dict(
+        (r[0], r[1]) for r in db.query(Hypothesis.id, Hypothesis.hypothesis)
+        .filter(Hypothesis.id.in_({p[1] for p in pairs} | {p[2] for p in pairs}))
+    )
+    return pairs, texts
+
+
+def _save_verdicts(db, updates):
+    db.execute(update(Contradiction), updates)
+    db.commit()
+
+
+class ContradictionEngine:
+    def __init__(
+        self,
+        neighbors: int = CONTRADICTION_NEIGHBORS,
+        min_similarity: float = CONTRADICTION_MIN_SIMILARITY
+    ):
+        self.neighbors = neighbors
+        self.min_similarity = min_similarity
+        self.index = SimilarityIndex(  # checked hypotheses: id -> unit vector
+            Hypothesis.id,
+            (Hypothesis.hypothesis, Hypothesis.rationale),
+            (Hypothesis.contradictions_checked_at.isnot(None),),
+            to_text=_text,
+            batch=CANDIDATE_BATCH
+        )
+        self._lock = asyncio.Lock()
+
+    # =========================
+    # Candidates
+    # =========================
+    def candidates(self, ids, vectors):
+        """
+        {(a, b): similarity} with a < b for a batch of new hypotheses,
+        against the indexed ones and each other
+        """
+        ids = np.asarray(ids, dtype="int64")
+        pairs = {}
+
+        def keep(i, other, similarity):
+            if other != ids[i] and other >= 0 and similarity >= self.min_similarity:
+                key = (int(min(ids[i], other)), int(max(ids[i], other)))
+                pairs[key] = max(pairs.get(key, -1.0), float(similarity))
+
+        # 1. Against stored hypotheses
+        if self.index.ntotal:
+            similarity, nearest = self.index.search(vectors, self.neighbors)
+            for i, j in zip(*np.nonzero(similarity >= self.min_similarity)):
+                keep(i, nearest[i, j], similarity[i, j])
+
+        # 2. Within the batch
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        k = min(self.neighbors, len(ids) - 1)
+        if k > 0:
+            nearest = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            for i, j in zip(*np.nonzero(np.take_along_axis(similarity, nearest, axis=1) >= self.min_similarity)):
+                keep(i, ids[nearest[i, j]], similarity[i, nearest[i, j]])
+
+        return pairs
+
+    async def generate(self, db, limit: int = None) -> int:
+        """
+        Pair every unchecked hypothesis with its near neighbours;
+        returns the number of candidate pairs stored
+        """
+        stored = checked = 0
+
+        while limit is None or checked < limit:
+            batch = CANDIDATE_BATCH if limit is None else min(CANDIDATE_BATCH, limit - checked)
+            rows = await run_db(db, _unchecked, db, batch)
+            if not rows:
+                break
+
+            ids = [r[0] for r in rows]
+            vectors = unit_vectors(await aembed_chunks([_text(r[1], r[2]) for r in rows]))
+            pairs = self.candidates(ids, vectors)
+
+            # Pairs and the checked mark commit together, so a pair is
+            # never generated twice by one pass; a concurrent pass over
+            # the same hypotheses may insert it first
+            await run_db(db, _store_candidates, db, ids, pairs)
+
+            self.index.add(ids, vectors)
+            stored += len(pairs)
+            checked += len(ids)
+
+        return stored
+
+    # =========================
+    # Adjudication
+    # =========================
+    async def adjudicate(self, db, limit: int = None, use_cache: bool = True):
+        """
+        Send candidate pairs (most similar first) to the LLM, several
+        per call; returns {verdict: count}
+        """
+        counts = dict.fromkeys(VERDICTS, 0)
+        skipped = []  # no usable verdict this run; retried on the next one
+        done = 0
+
+        while limit is None or done < limit:
+            batch = ADJUDICATION_BATCH if limit is None else min(ADJUDICATION_BATCH, limit - done)
+            pairs, texts = await run_db(db, _open_pairs, db, batch, list(skipped))
+            if not pairs:
+                break
+
+            groups = [
+                pairs[i:i + CONTRADICTION_PAIRS_PER_CALL]
+                for i in range(0, len(pairs), CONTRADICTION_PAIRS_PER_CALL)
+            ]
+            results = await asyncio.gather(*(
+                areason(
+                    ADJUDICATION_PROMPT,
+                    "\n\n".join(
+                        f"Pair {n}:\nA: {texts[a]}\nB: {texts[b]}"
+                        for n, (_, a, b) in enumerate(group, start=1)
+                    ),
+                    use_cache=use_cache
+                )
+                for group in groups
+            ))
+
+            updates = []
+            for group, result in zip(groups, results):
+                verdicts = _parse_verdicts(result, len(group))
+                for n, (pair_id, _, _) in enumerate(group, start=1):
+                    if n in verdicts:
+                        verdict, explanation = verdicts[n]
+                        updates.append({"id": pair_id, "status": verdict, "explanation": explanation})
+                        counts[verdict] += 1
+                    else:
+                        skipped.append(pair_id)
+
+            if updates:
+                await run_db(db, _save_verdicts, db, updates)
+
+            done += len(pairs)
+
+        return counts
+
+    async def run(self, db, limit: int = None, use_cache: bool = True):
+        async with self._lock:
+            await self.index.sync(db)
+
+            candidates = await self.generate(db, limit)
+            verdicts = await self.adjudicate(db, limit, use_cache)
+
+        return {"candidates": candidates, "verdicts": verdicts}
+
+
+engine = ContradictionEngine()
+
+
+async def _run_pending():
+    db = SessionLocal()
+    try:
+        await engine.run(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+_background = CoalescingTask(_run_pending)
+
+
+def schedule_contradictions():
+    """
+    Find + adjudicate candidates for new hypotheses in the background
+    (no-op unless CONTRADICTION_ON_INSERT)
+    """
+    if CONTRADICTION_ON_INSERT:
+        _background.trigger()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find and adjudicate contradiction candidates across stored hypotheses"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="hypotheses / pairs per step")
+    args = parser.parse_args()
+
+    async def main():
+        db = SessionLocal()
+        try:
+            return await engine.run(db, args.limit)
+        finally:
+            db.close()
+
+    report = asyncio.run(main())
+    print(f"{report['candidates']} candidate pairs, verdicts: {report['verdicts']}")
@@ -0,0 +1,175 @@
+"""
+Near-duplicate clustering for assumptions and failure modes.
+
+Rows are embedded in batches (through the embedding cache) and
+compared as unit vectors:
+  1. against the canonical entries seen so far: one inner-product
+     FAISS search for the whole batch
+  2. among themselves: one batch x batch similarity matrix, grouped
+     greedily so the earliest row of a group becomes its canonical
+
+Each row gets `canonical_id` (its own id when it is canonical). New
+rows are picked up by `canonical_id IS NULL`, so the same code serves
+incremental runs after inserts and the bulk backfill. The canonical
+index is re-synced with the table before every run, so canonicals
+written by other API workers are matched too:
+
+    python -m app.services.dedup
+"""
+import argparse
+import asyncio
+
+import numpy as np
+from sqlalchemy import update
+
+from app.config import DEDUP_THRESHOLD, DEDUP_BATCH, DEDUP_ON_INSERT
+from app.db.database import SessionLocal, run_db
+from app.db.models import Assumption, FailureMode
+from app.services.background import CoalescingTask
+from app.services.embedding_service import aembed_chunks
+from app.services.similarity_index import SimilarityIndex, unit_vectors
+
+
+class Deduplicator:
+    def __init__(self, model, text_column, threshold: float = DEDUP_THRESHOLD):
+        self.model = model
+        self.text_column = text_column
+        self.threshold = threshold
+        self.index = SimilarityIndex(  # canonical rows: id -> unit vector
+            model.id, (text_column,), (model.canonical_id == model.id,), batch=DEDUP_BATCH
+        )
+        self._lock = asyncio.Lock()
+
+    def assign(self, ids, vectors):
+        """
+        Canonical id per row (ids ascending); new canonicals are
+        added to the index
+        """
+        ids = np.asarray(ids, dtype="int64")
+        canonical = ids.copy()
+        matched = np.zeros(len(ids), dtype=bool)
+
+        # 1. Near an existing canonical entry
+        if self.index.ntotal:
+            similarity, nearest = self.index.search(vectors, 1)
+            matched = similarity[:, 0] >= self.threshold
+            canonical[matched] = nearest[matched, 0]
+
+        # 2. Near an earlier row of this batch
+        rest = np.flatnonzero(~matched)
+        similarity = vectors[rest] @ vectors[rest].T
+        grouped = np.zeros(len(rest), dtype=bool)
+
+        for i in range(len(rest)):
+            if grouped[i]:
+                continue
+            group = ~grouped & (similarity[i] >= self.threshold)
+            group[:i] = False
+            group[i] = True
+            canonical[rest[group]] = ids[rest[i]]
+            grouped |= group
+
+        new = rest[canonical[rest] == ids[rest]]
+        self.index.add(ids[new], vectors[new])
+        return canonical
+
+    def _pending(self, db, batch: int):
+        return (
+            db.query(self.model.id, self.text_column)
+            .filter(self.model.canonical_id.is_(None))
+            .order_by(self.model.id)
+            .limit(batch)
+            .all()
+        )
+
+    def _link(self, db, ids, canonical):
+        db.execute(
+            update(self.model),
+            [
+                {"id": row_id, "canonical_id": int(c)}
+                for row_id, c in zip(ids, canonical)
+            ]
+        )
+        db.commit()
+
+    async def run(self, db, limit: int = None):
+        """
+        Link every not-yet-deduplicated row (at most `limit`).
+        Returns (rows processed, rows linked to another canonical)
+        """
+        async with self._lock:
+            await self.index.sync(db)
+
+            processed = duplicates = 0
+
+            while limit is None or processed < limit:
+                batch = DEDUP_BATCH if limit is None else min(DEDUP_BATCH, limit - processed)
+                rows = await run_db(db, self._pending, db, batch)
+                if not rows:
+                    break
+
+                ids = [row[0] for row in rows]
+                vectors = unit_vectors(await aembed_chunks([row[1] for row in rows]))
+                canonical = self.assign(ids, vectors)
+
+                await run_db(db, self._link, db, ids, canonical)
+
+                processed += len(ids)
+                duplicates += int((canonical != np.asarray(ids)).sum())
+
+            return processed, duplicates
+
+
+deduplicators = {
+    "assumption": Deduplicator(Assumption, Assumption.assumption),
+    "failure_mode": Deduplicator(FailureMode, FailureMode.failure),
+}
+
+
+async def _run_pending():
+    db = SessionLocal()
+    try:
+        for deduplicator in deduplicators.values():
+            await deduplicator.run(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+_background = CoalescingTask(_run_pending)
+
+
+def schedule_dedupe():
+    """
+    Deduplicate newly inserted rows in the background (no-op unless
+    DEDUP_ON_INSERT); rows that fail stay pending for the next run
+    """
+    if DEDUP_ON_INSERT:
+        _background.trigger()
+
+
+async def backfill(limit: int = None):
+    """
+    Deduplicate the existing tables; returns {table: (processed, duplicates)}
+    """
+    db = SessionLocal()
+    try:
+        return {
+            name: await deduplicator.run(db, limit)
+            for name, deduplicator in deduplicators.items()
+        }
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Link near-duplicate assumptions / failure modes to canonical rows"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="rows per table")
+    args = parser.parse_args()
+
+    for name, (processed, duplicates) in asyncio.run(backfill(args.limit)).items():
+        print(f"{name}: {processed} rows deduplicated, {duplicates} linked to an earlier canonical")
@@ -0,0 +1,89 @@
+import hashlib
+import time
+
+import numpy as np
+
+from app.config import EMBEDDING_CACHE_MAX_ENTRIES
+from app.services.sqlite_lru import SQLiteLRUCache
+
+# SQLite's default host-parameter limit is 999 on older builds
+LOOKUP_BATCH = 500
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """
+    Persistent, content-addressed embedding cache.
+
+    Keys are sha256(model name + chunk text); values are raw float32
+    bytes in a SQLite BLOB column. `last_used` drives LRU eviction once
+    the table grows past `max_entries`.
+    """
+
+    TABLE = "embeddings"
+    COLUMNS = "vector BLOB NOT NULL"
+
+    def __init__(self, path: str, model_name: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        super().__init__(path, max_entries)
+        self.model_name = model_name
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(
+            f"{self.model_name}\0{text}".encode("utf-8")
+        ).digest()
+
+    # =========================
+    # Read / Write
+    # =========================
+    def get_many(self, texts):
+        """
+        Return {position: vector} for every text found in the cache
+        """
+        keys = [self.key(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            conn = self._connect()
+
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+                conn.commit()
+
+            hits = {
+                i: np.frombuffer(found[k], dtype="float32")
+                for i, k in enumerate(keys)
+                if k in found
+            }
+            self.hits += len(hits)
+            self.misses += len(keys) - len(hits)
+
+        return hits
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype="float32")
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (self.key(t), v.tobytes(), now)
+                    for t, v in zip(texts, vectors)
+                ]
+            )
+            conn.commit()
+
+            self._added(conn, len(vectors), now)
@@ -1,9 +1,240 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_MAX_BATCH,
+    EMBEDDING_MAX_WAIT_MS,
+    EMBEDDING_CACHE_PATH,
+)
+from app.services.embedding_cache import EmbeddingCache
+
+# Loaded on first use: importing sentence_transformers pulls in torch
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Return the shared SentenceTransformer, loading it on first call
+    """
+    global _model
+
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    return _model
+
+
+def _encode(texts, batch_size: int):
+    return get_model().encode(texts, batch_size=batch_size)
+
+
+class EmbeddingEngine:
+    """
+    Merges embedding requests from concurrent callers into batches.
+
+    Callers enqueue their texts and get a Future back. A single worker
+    thread drains the queue, packs pending texts into batches of up to
+    `max_batch_size` (waiting at most `max_wait_ms` for a batch to
+    fill), runs one `encode` per batch and hands each caller its rows.
+    One large batch on all cores beats many small `encode` calls
+    fighting over them.
+    """
+
+    def __init__(
+        self,
+        encode,
+        max_batch_size: int = EMBEDDING_MAX_BATCH,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    # =========================
+    # Public API
+    # =========================
+    def submit(self, texts) -> Future:
+        """
+        Enqueue texts; the Future resolves to a float32 (n, dim) array
+        """
+        future = Future()
+
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype="float32"))
+            return future
+
+        self._ensure_worker()
+        self._queue.put(_Request(list(texts), future))
+        return future
+
+    def embed(self, texts) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def aembed(self, texts) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    # =========================
+    # Worker
+    # =========================
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-engine",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        pending = []  # requests with rows still to encode
+
+        while True:
+            if not pending:
+                pending.append(self._queue.get())
+
+            # Fill the batch until it is full or the deadline passes
+            deadline = time.monotonic() + self.max_wait
+            while sum(r.remaining for r in pending) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            batch, owners = [], []
+            for request in pending:
+                take = request.take(self.max_batch_size - len(batch))
+                batch.extend(take)
+                owners.append((request, len(take)))
+                if len(batch) >= self.max_batch_size:
+                    break
+
+            try:
+                vectors = np.asarray(
+                    self.encode(batch, batch_size=len(batch)),
+                    dtype="float32"
+                )
+            except Exception as exc:
+                for request, _ in owners:
+                    request.fail(exc)
+            else:
+                offset = 0
+                for request, count in owners:
+                    request.deliver(vectors[offset:offset + count])
+                    offset += count
+
+            pending = [r for r in pending if not r.done]
+
+
+class _Request:
+    """
+    One caller's texts, consumed across one or more batches
+    """
+
+    def __init__(self, texts, future: Future):
+        self.texts = texts
+        self.future = future
+        self.cursor = 0
+        self.parts = []
+        self.done = False
+
+    @property
+    def remaining(self) -> int:
+        return len(self.texts) - self.cursor
+
+    def take(self, n: int):
+        taken = self.texts[self.cursor:self.cursor + n]
+        self.cursor += len(taken)
+        return taken
+
+    def deliver(self, vectors):
+        self.parts.append(vectors)
+        if self.cursor == len(self.texts):
+            self.done = True
+            self.future.set_result(np.concatenate(self.parts))
+
+    def fail(self, exc: Exception):
+        self.done = True
+        self.future.set_exception(exc)
+
+
+engine = EmbeddingEngine(_encode)
+cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL_NAME)
+
+
+def warm_up():
+    """
+    Load the model and run one encode so the first request is fast
+    """
+    engine.embed(["warm-up"])
+
+
+def _lookup(chunks):
+    """
+    Split chunks into cached vectors and unique texts still to embed
+    """
+    cached = cache.get_many(chunks)
+    misses = list(dict.fromkeys(
+        text for i, text in enumerate(chunks) if i not in cached
+    ))
+    return cached, misses
+
+
+def _assemble(chunks, cached, misses, miss_vectors) -> np.ndarray:
+    """
+    One contiguous float32 (len(chunks), dim) array, in chunk order
+    """
+    if len(miss_vectors):
+        cache.put_many(misses, miss_vectors)
+
+    if not chunks:
+        return np.empty((0, 0), dtype="float32")
+
+    dim = miss_vectors.shape[1] if len(miss_vectors) else len(next(iter(cached.values())))
+    vectors = np.empty((len(chunks), dim), dtype="float32")
+
+    if cached:
+        vectors[list(cached)] = np.stack(list(cached.values()))
+
+    if misses:
+        fresh = {text: row for row, text in enumerate(misses)}
+        rows = [i for i in range(len(chunks)) if i not in cached]
+        vectors[rows] = miss_vectors[[fresh[chunks[i]] for i in rows]]
+
+    return vectors
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def embed_chunks(chunks):
     """
-    Convert text chunks into embedding vectors
+    Convert text chunks into a float32 (n, dim) embedding array (cache
+    misses only reach the model)
+    """
+    cached, misses = _lookup(chunks)
+    return _assemble(chunks, cached, misses, engine.embed(misses))
+
+
+async def aembed_chunks(chunks):
+    """
+    Awaitable embed_chunks; batches with other in-flight requests.
+    The cache's SQLite reads and writes run in a worker thread.
     """
-    return model.encode(chunks).tolist()
+    cached, misses = await asyncio.to_thread(_lookup, chunks)
+    miss_vectors = await engine.aembed(misses)
+    return await asyncio.to_thread(_assemble, chunks, cached, misses, miss_vectors)
@@ -1,57 +1,250 @@
 import os
 import json
-from google.genai import Client
-from google.genai.errors import ClientError
+import random
+import asyncio
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
 
+from app.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+)
+from app.services.llm_cache import LLMResponseCache
+
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_NAME = "gemini-2.0-flash"
 
-client = Client(api_key=API_KEY)
+# Latency samples kept for the p50/p99 in /metrics
+LATENCY_WINDOW = 1000
+
+# Created on first use: google.genai is slow to import and build.
+# The client keeps one pooled HTTP session for the sync path and one
+# for the async path (client.aio), shared by every request.
+_client = None
+_client_lock = threading.Lock()
+
+_sync_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_async_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+def get_client():
+    """
+    Return the shared Gemini client, creating it on first call
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google.genai import Client
+                _client = Client(api_key=API_KEY)
+
+    return _client
+
+
+# =========================
+# Call Stats
+# =========================
+class CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, started: float, retries: int, fallback: bool):
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            self.fallbacks += int(fallback)
+            self.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
 
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "latency_p50_ms": pct(0.50),
+            "latency_p99_ms": pct(0.99),
+        }
 
-def reason(system_prompt: str, user_context: str) -> str:
-    try:
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=[
+
+stats = CallStats()
+response_cache = LLMResponseCache()
+
+
+# =========================
+# Helpers
+# =========================
+def _contents(system_prompt: str, user_context: str):
+    return [
+        {
+            "role": "user",
+            "parts": [
                 {
-                    "role": "user",
-                    "parts": [
-                        {
-                            "text": system_prompt + "\n\n" + user_context
-                        }
-                    ],
+                    "text": system_prompt + "\n\n" + user_context
                 }
             ],
-        )
-        return response.text
-
-    except ClientError:
-        # 🔐 SMART FALLBACK (context-aware)
-        if "assumption" in system_prompt.lower():
-            return json.dumps({
-                "assumptions": [
-                    "Protein X expression varies across metabolic conditions",
-                    "Cancer metabolism is influenced by signaling pathways involving Protein X",
-                    "Experimental models accurately represent in-vivo cancer metabolism"
-                ]
-            })
-
-        if "failure" in system_prompt.lower():
-            return json.dumps({
-                "failures": [
-                    "Protein X may be redundant with other metabolic regulators",
-                    "Observed effects may be cell-line specific",
-                    "Metabolic conditions in experiments may not match physiological reality"
-                ]
-            })
-
-        # default (hypothesis fallback)
+        }
+    ]
+
+
+def _is_retryable(exc: Exception) -> bool:
+    from google.genai.errors import APIError
+
+    return isinstance(exc, APIError) and (exc.code == 429 or exc.code >= 500)
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: uniform over [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _fallback(system_prompt: str) -> str:
+    # 🔐 SMART FALLBACK (context-aware)
+    if "assumption" in system_prompt.lower():
+        return json.dumps({
+            "assumptions": [
+                "Protein X expression varies across metabolic conditions",
+                "Cancer metabolism is influenced by signaling pathways involving Protein X",
+                "Experimental models accurately represent in-vivo cancer metabolism"
+            ]
+        })
+
+    if "failure" in system_prompt.lower():
         return json.dumps({
-            "hypothesis": "Protein X may regulate cancer metabolism through a context-dependent pathway.",
-            "rationale": "Conflicting evidence suggests differential behavior under varying metabolic conditions.",
-            "falsification": "Test Protein X knockdown under glucose-rich vs glucose-poor conditions."
+            "failures": [
+                "Protein X may be redundant with other metabolic regulators",
+                "Observed effects may be cell-line specific",
+                "Metabolic conditions in experiments may not match physiological reality"
+            ]
         })
+
+    # default (hypothesis fallback)
+    return json.dumps({
+        "hypothesis": "Protein X may regulate cancer metabolism through a context-dependent pathway.",
+        "rationale": "Conflicting evidence suggests differential behavior under varying metabolic conditions.",
+        "falsification": "Test Protein X knockdown under glucose-rich vs glucose-poor conditions."
+    })
+
+
+# =========================
+# Calls with retry
+# =========================
+def _call(system_prompt: str, user_context: str):
+    """
+    Blocking call with retry; None when it ends in a ClientError
+    """
+    from google.genai.errors import ClientError
+
+    started = time.perf_counter()
+    attempt = 0
+
+    with _sync_slots:
+        while True:
+            try:
+                response = get_client().models.generate_content(
+                    model=MODEL_NAME,
+                    contents=_contents(system_prompt, user_context),
+                )
+                stats.record(started, attempt, fallback=False)
+                return response.text
+
+            except Exception as exc:
+                if _is_retryable(exc) and attempt < LLM_MAX_RETRIES:
+                    time.sleep(_backoff(attempt))
+                    attempt += 1
+                    continue
+                if not isinstance(exc, ClientError):
+                    raise
+                stats.record(started, attempt, fallback=True)
+                return None
+
+
+async def _acall(system_prompt: str, user_context: str):
+    """
+    Async _call on the client's pooled session, bounded by a
+    process-wide semaphore
+    """
+    from google.genai.errors import ClientError
+
+    started = time.perf_counter()
+    attempt = 0
+
+    async with _async_slots:
+        while True:
+            try:
+                response = await get_client().aio.models.generate_content(
+                    model=MODEL_NAME,
+                    contents=_contents(system_prompt, user_context),
+                )
+                stats.record(started, attempt, fallback=False)
+                return response.text
+
+            except Exception as exc:
+                if _is_retryable(exc) and attempt < LLM_MAX_RETRIES:
+                    await asyncio.sleep(_backoff(attempt))
+                    attempt += 1
+                    continue
+                if not isinstance(exc, ClientError):
+                    raise
+                stats.record(started, attempt, fallback=True)
+                return None
+
+
+# =========================
+# Reason (sync + async)
+# =========================
+# use_cache=False skips the cache lookup (the fresh answer is still
+# stored). Fallback answers are never cached.
+def reason(system_prompt: str, user_context: str, use_cache: bool = True) -> str:
+    if use_cache:
+        cached = response_cache.get(MODEL_NAME, system_prompt, user_context)
+        if cached is not None:
+            return cached
+
+    text = _call(system_prompt, user_context)
+
+    if text is None:
+        return _fallback(system_prompt)
+
+    response_cache.put(MODEL_NAME, system_prompt, user_context, text)
+    return text
+
+
+async def areason(system_prompt: str, user_context: str, use_cache: bool = True) -> str:
+    """
+    Awaitable reason(): same cache, retry and fallback policy (cache
+    reads / writes are SQLite calls, so they run off the event loop)
+    """
+    if use_cache:
+        cached = await asyncio.to_thread(
+            response_cache.get, MODEL_NAME, system_prompt, user_context
+        )
+        if cached is not None:
+            return cached
+
+    text = await _acall(system_prompt, user_context)
+
+    if text is None:
+        return _fallback(system_prompt)
+
+    await asyncio.to_thread(
+        response_cache.put, MODEL_NAME, system_prompt, user_context, text
+    )
+    return text
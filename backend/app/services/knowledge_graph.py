@@ -0,0 +1,513 @@
+"""
+In-process knowledge graph over papers, hypotheses, assumptions and
+failure modes.
+
+Nodes are integers; per-node data lives in flat numpy arrays and the
+adjacency is CSR (`indptr`, `indices`, `weights`) plus a small
+append-only delta of weighted edges (+1 added, -1 removed) since the
+last compaction. Assumption / failure-mode rows with the same
+(normalized) text share one node, which is what links hypotheses to
+each other; a row linked to a canonical near-duplicate takes the
+canonical's text.
+
+The graph follows the tables incrementally: `sync(db)` reads the rows
+changed since its `updated_at` watermarks (minus an overlap window for
+late commits) and moves each changed row's edge as a delta. Deletes
+aren't visible that way: `check_drift()` compares row counts with the
+tables off the request path and rebuilds on a mismatch.
+"""
+import asyncio
+import logging
+import threading
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+
+from app.config import GRAPH_COMPACT_RATIO, GRAPH_SYNC_OVERLAP_SECONDS, GRAPH_DRIFT_CHECK_SECONDS
+from app.db.database import SessionLocal
+from app.db.models import Assumption, FailureMode, Hypothesis, Ingest
+
+logger = logging.getLogger(__name__)
+
+NODE_TYPES = ("paper", "hypothesis", "assumption", "failure_mode")
+PAPER, HYPOTHESIS, ASSUMPTION, FAILURE_MODE = range(len(NODE_TYPES))
+
+# Never compact for fewer delta edges than this
+COMPACT_MIN_EDGES = 65536
+
+
+def normalize(text: str) -> str:
+    """
+    Key under which assumption / failure texts are merged
+    """
+    return " ".join(text.lower().split())
+
+
+class _Growable:
+    """
+    numpy array with amortized O(1) appends and writes past the end
+    (used both as a list and as a dense row id -> node map)
+    """
+
+    def __init__(self, dtype, fill=0):
+        self._data = np.full(1024, fill, dtype=dtype)
+        self.fill = fill
+        self.size = 0
+
+    def _reserve(self, n: int):
+        if n > len(self._data):
+            grown = np.full(max(n, 2 * len(self._data)), self.fill, dtype=self._data.dtype)
+            grown[:len(self._data)] = self._data
+            self._data = grown
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        self._reserve(self.size + len(values))
+        self._data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def put(self, positions, values):
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return
+        top = int(positions.max()) + 1
+        self._reserve(top)
+        self._data[positions] = values
+        self.size = max(self.size, top)
+
+    def get(self, positions):
+        """
+        Values at `positions`; `fill` where out of range
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        inside = (positions >= 0) & (positions < self.size)
+        out = np.full(len(positions), self.fill, dtype=self._data.dtype)
+        out[inside] = self._data[positions[inside]]
+        return out
+
+    @property
+    def array(self):
+        return self._data[:self.size]
+
+
+class KnowledgeGraph:
+    def __init__(self, compact_ratio: float = GRAPH_COMPACT_RATIO):
+        self.compact_ratio = compact_ratio
+        self.rebuilds = 0
+        self.synced = False
+        # Held by callers across sync() + queries, so a rebuild can't
+        # renumber nodes between looking one up and expanding it
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.node_type = _Growable(np.int8)
+        self.node_ref = _Growable(np.int64)  # row id, or label index for text nodes
+        self.labels = []                     # texts of assumption / failure nodes
+        self._text_nodes = {}                # (type, normalized text) -> node
+        self._row_nodes = {t: _Growable(np.int64, -1) for t in range(len(NODE_TYPES))}
+        # Node each hypothesis / item row's edge currently points at
+        # (its paper / hypothesis node), -1 = none
+        self._row_links = {t: _Growable(np.int64, -1) for t in range(len(NODE_TYPES))}
+        self.rows = dict.fromkeys(NODE_TYPES, 0)  # table rows in the graph
+
+        # Undirected edges, stored in both directions; weights count the
+        # rows behind an edge
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)
+        self.weights = np.empty(0, dtype=np.int32)
+        self._delta_src = _Growable(np.int64)
+        self._delta_dst = _Growable(np.int64)
+        self._delta_weight = _Growable(np.int32)
+        self._delta_removals = 0
+
+        self.watermarks = dict.fromkeys(NODE_TYPES)  # last updated_at seen
+
+    # =========================
+    # Building
+    # =========================
+    def _new_nodes(self, node_type: int, refs):
+        start = self.node_type.size
+        self.node_type.extend(np.full(len(refs), node_type))
+        self.node_ref.extend(refs)
+        return np.arange(start, start + len(refs), dtype=np.int64)
+
+    def _add_edges(self, a, b, weight: int = 1):
+        keep = (a >= 0) & (b >= 0)
+        a, b = a[keep], b[keep]
+        if not len(a):
+            return
+
+        self._delta_src.extend(np.concatenate([a, b]))
+        self._delta_dst.extend(np.concatenate([b, a]))
+        self._delta_weight.extend(np.full(2 * len(a), weight))
+        if weight < 0:
+            self._delta_removals += 2 * len(a)
+
+        if self._delta_src.size >= max(COMPACT_MIN_EDGES, self.compact_ratio * len(self.indices)):
+            self.compact()
+
+    def _relink(self, node_type: int, row_ids, nodes, links):
+        """
+        Point each row's edge at (nodes[i], links[i]); rows whose edge
+        is unchanged are left alone, so re-reading a row is a no-op
+        """
+        old_nodes = self._row_nodes[node_type].get(row_ids)
+        old_links = self._row_links[node_type].get(row_ids)
+        changed = (old_nodes != nodes) | (old_links != links)
+
+        self._add_edges(old_nodes[changed], old_links[changed], -1)
+        self._add_edges(nodes[changed], links[changed])
+
+        self.rows[NODE_TYPES[node_type]] += int((old_nodes < 0).sum())
+        self._row_nodes[node_type].put(row_ids, nodes)
+        self._row_links[node_type].put(row_ids, links)
+
+    def add_papers(self, ingest_ids):
+        with self.lock:
+            ingest_ids = np.asarray(ingest_ids, dtype=np.int64)
+            ingest_ids = np.unique(ingest_ids[self._row_nodes[PAPER].get(ingest_ids) < 0])
+            self._row_nodes[PAPER].put(ingest_ids, self._new_nodes(PAPER, ingest_ids))
+            self.rows["paper"] += len(ingest_ids)
+
+    def add_hypotheses(self, hypothesis_ids, ingest_ids):
+        """
+        Add or update hypothesis rows; `ingest_ids[i]` is the paper
+        hypothesis i came from, or -1
+        """
+        with self.lock:
+            hypothesis_ids = np.asarray(hypothesis_ids, dtype=np.int64)
+            nodes = self._row_nodes[HYPOTHESIS].get(hypothesis_ids)
+            new = nodes < 0
+            nodes[new] = self._new_nodes(HYPOTHESIS, hypothesis_ids[new])
+
+            # Edges are moved by _relink, which reads the old node: the
+            # map is written there
+            self._relink(HYPOTHESIS, hypothesis_ids, nodes, self._row_nodes[PAPER].get(ingest_ids))
+
+    def add_items(self, node_type: int, row_ids, hypothesis_ids, texts):
+        """
+        Add or update assumption / failure-mode rows: each row links
+        its hypothesis to the node for its text
+        """
+        with self.lock:
+            nodes = np.empty(len(texts), dtype=np.int64)
+            new_texts = []
+
+            for i, text in enumerate(texts):
+                key = (node_type, normalize(text))
+                node = self._text_nodes.get(key)
+                if node is None:
+                    node = self.node_type.size + len(new_texts)
+                    self._text_nodes[key] = node
+                    new_texts.append(text)
+                nodes[i] = node
+
+            self._new_nodes(
+                node_type,
+                np.arange(len(self.labels), len(self.labels) + len(new_texts))
+            )
+            self.labels.extend(new_texts)
+
+            self._relink(
+                node_type,
+                np.asarray(row_ids, dtype=np.int64),
+                nodes,
+                self._row_nodes[HYPOTHESIS].get(hypothesis_ids)
+            )
+
+    def compact(self):
+        """
+        Fold the delta into the CSR arrays (summing the weights of
+        repeated edges, dropping those no row holds any more)
+        """
+        with self.lock:
+            n = self.node_type.size
+            if n == 0:
+                return
+
+            old_src = np.repeat(
+                np.arange(len(self.indptr) - 1, dtype=np.int64),
+                np.diff(self.indptr)
+            )
+            keys, inverse = np.unique(
+                np.concatenate([
+                    old_src * n + self.indices,
+                    self._delta_src.array * n + self._delta_dst.array,
+                ]),
+                return_inverse=True
+            )
+            weights = np.bincount(
+                inverse,
+                weights=np.concatenate([self.weights, self._delta_weight.array]),
+                minlength=len(keys)
+            ).astype(np.int32)
+            live = weights > 0
+            keys, weights = keys[live], weights[live]
+            src = keys // n
+
+            self.indices = keys % n
+            self.weights = weights
+            self.indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+
+            self._delta_src = _Growable(np.int64)
+            self._delta_dst = _Growable(np.int64)
+            self._delta_weight = _Growable(np.int32)
+            self._delta_removals = 0
+
+    # =========================
+    # Following the Tables
+    # =========================
+    def _changed(self, db, name: str, query, stamp):
+        """
+        Rows of `query` stamped at or after the watermark minus the
+        overlap window (all rows on the first read), in stamp order
+        """
+        since = self.watermarks[name]
+        if since is not None:
+            query = query.filter(stamp >= since - timedelta(seconds=GRAPH_SYNC_OVERLAP_SECONDS))
+        return query.order_by(stamp).all()
+
+    def sync(self, db):
+        """
+        Apply rows added or changed since the last sync.
+
+        Children are read before their parents, so every hypothesis an
+        assumption points at is already visible when hypotheses are
+        read (and likewise for papers); rows are applied parents first.
+        Rows re-read inside the overlap window are no-ops.
+        """
+        with self.lock:
+            items = []
+
+            for node_type, name, model, text_column in (
+                (FAILURE_MODE, "failure_mode", FailureMode, FailureMode.failure),
+                (ASSUMPTION, "assumption", Assumption, Assumption.assumption),
+            ):
+                canonical = aliased(model)
+                rows = self._changed(
+                    db,
+                    name,
+                    db.query(
+                        model.id,
+                        model.hypothesis_id,
+                        func.coalesce(getattr(canonical, text_column.key), text_column),
+                        model.updated_at
+                    ).outerjoin(canonical, canonical.id == model.canonical_id),
+                    model.updated_at
+                )
+                items.insert(0, (node_type, name, rows))
+
+            hypotheses = self._changed(
+                db,
+                "hypothesis",
+                db.query(Hypothesis.id, Hypothesis.ingest_id, Hypothesis.updated_at),
+                Hypothesis.updated_at
+            )
+            papers = self._changed(
+                db, "paper", db.query(Ingest.id, Ingest.created_at), Ingest.created_at
+            )
+
+            if papers:
+                self.add_papers([row[0] for row in papers])
+                self._advance("paper", papers)
+
+            if hypotheses:
+                self.add_hypotheses(
+                    [row[0] for row in hypotheses],
+                    [row[1] if row[1] is not None else -1 for row in hypotheses]
+                )
+                self._advance("hypothesis", hypotheses)
+
+            for node_type, name, rows in items:
+                if rows:
+                    self.add_items(
+                        node_type,
+                        [row[0] for row in rows],
+                        [row[1] if row[1] is not None else -1 for row in rows],
+                        [row[2] for row in rows]
+                    )
+                    self._advance(name, rows)
+
+            self.synced = True
+
+    def _advance(self, name: str, rows):
+        stamps = [row[-1] for row in rows if row[-1] is not None]
+        if stamps:
+            self.watermarks[name] = max(stamps[-1], self.watermarks[name] or stamps[-1])
+
+    @staticmethod
+    def _counts(db):
+        return {
+            "paper": db.query(func.count(Ingest.id)).scalar(),
+            "hypothesis": db.query(func.count(Hypothesis.id)).scalar(),
+            "assumption": db.query(func.count(Assumption.id)).scalar(),
+            "failure_mode": db.query(func.count(FailureMode.id)).scalar(),
+        }
+
+    def check_drift(self, db) -> bool:
+        """
+        Compare the graph's rows with the tables (after a sync, and
+        again after a second one, so rows committed in between don't
+        count); rebuild on a remaining mismatch: deleted rows, or rows
+        committed later than the overlap window. Returns whether it
+        rebuilt.
+        """
+        for _ in range(2):
+            self.sync(db)
+            counts = self._counts(db)
+            with self.lock:
+                if counts == self.rows:
+                    return False
+
+        fresh = KnowledgeGraph(self.compact_ratio)
+        fresh.sync(db)
+        fresh.compact()
+
+        with self.lock:
+            for name, value in vars(fresh).items():
+                if name not in ("lock", "rebuilds", "compact_ratio"):
+                    setattr(self, name, value)
+            self.rebuilds += 1
+        return True
+
+    # =========================
+    # Queries
+    # =========================
+    def node(self, node_type: str, row_id: int):
+        """
+        Node of a table row, or None
+        """
+        node = int(self._row_nodes[NODE_TYPES.index(node_type)].get([row_id])[0])
+        return None if node < 0 else node
+
+    def describe(self, node: int):
+        node_type = int(self.node_type.array[node])
+        ref = int(self.node_ref.array[node])
+
+        if node_type in (PAPER, HYPOTHESIS):
+            return {"type": NODE_TYPES[node_type], "id": ref}
+        return {"type": NODE_TYPES[node_type], "text": self.labels[ref]}
+
+    def _expand(self, frontier):
+        """
+        (src, dst) for every edge leaving the frontier nodes
+        """
+        in_csr = frontier[frontier < len(self.indptr) - 1]
+        starts = self.indptr[in_csr]
+        counts = self.indptr[in_csr + 1] - starts
+
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(starts, counts) + offsets
+        src = np.repeat(in_csr, counts)
+        dst = self.indices[positions]
+
+        if self._delta_src.size:
+            hit = np.isin(self._delta_src.array, frontier)
+            src = np.concatenate([src, self._delta_src.array[hit]])
+            dst = np.concatenate([dst, self._delta_dst.array[hit]])
+
+            # Pending removals: keep only edges some row still holds
+            if self._delta_removals:
+                weights = np.concatenate([self.weights[positions], self._delta_weight.array[hit]])
+                n = self.node_type.size
+                keys, inverse = np.unique(src * n + dst, return_inverse=True)
+                live = np.bincount(inverse, weights=weights, minlength=len(keys)) > 0
+                src, dst = keys[live] // n, keys[live] % n
+
+        return src, dst
+
+    def reachable(self, node: int, hops: int, target_type: str = None):
+        """
+        [(node, hops)] for nodes 1..hops edges away (shortest distance),
+        optionally only those of `target_type`
+        """
+        with self.lock:
+            types = self.node_type.array
+            visited = np.zeros(len(types), dtype=bool)
+            visited[node] = True
+            frontier = np.array([node], dtype=np.int64)
+            found = []
+
+            for hop in range(1, hops + 1):
+                _, dst = self._expand(frontier)
+                frontier = np.unique(dst)
+                frontier = frontier[~visited[frontier]]
+                if not len(frontier):
+                    break
+                visited[frontier] = True
+                found.append((frontier, hop))
+
+            out = []
+            for nodes, hop in found:
+                if target_type is not None:
+                    nodes = nodes[types[nodes] == NODE_TYPES.index(target_type)]
+                out.extend((int(n), hop) for n in nodes)
+            return out
+
+    def sharing(self, hypothesis_node: int, via: str = "assumption"):
+        """
+        [(hypothesis node, number of shared `via` nodes)] for the other
+        hypotheses linked to any of this one's assumptions (or failure
+        modes), most shared first
+        """
+        with self.lock:
+            types = self.node_type.array
+            via_type = NODE_TYPES.index(via)
+
+            _, items = self._expand(np.array([hypothesis_node], dtype=np.int64))
+            items = np.unique(items[types[items] == via_type])
+
+            src, dst = self._expand(items)
+            pairs = np.unique(np.stack([src, dst], axis=1), axis=0)
+            others = pairs[:, 1]
+            others = others[(types[others] == HYPOTHESIS) & (others != hypothesis_node)]
+
+            nodes, counts = np.unique(others, return_counts=True)
+            order = np.lexsort((nodes, -counts))
+            return [(int(nodes[i]), int(counts[i])) for i in order]
+
+    def stats(self):
+        with self.lock:
+            counts = np.bincount(self.node_type.array, minlength=len(NODE_TYPES))
+            return {
+                "nodes": {name: int(counts[i]) for i, name in enumerate(NODE_TYPES)},
+                "edges": len(self.indices) // 2,             # compacted
+                "pending_edges": self._delta_src.size // 2,  # additions + removals
+                "adjacency_bytes": int(
+                    self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+                    + (8 + 8 + 4) * self._delta_src.size
+                ),
+                "watermarks": dict(self.watermarks),
+                "rebuilds": self.rebuilds,
+            }
+
+
+graph = KnowledgeGraph()
+
+
+def _check_drift():
+    db = SessionLocal()
+    try:
+        if graph.check_drift(db):
+            logger.info("Knowledge graph rebuilt after its rows drifted from the tables")
+    finally:
+        db.close()
+
+
+async def watch_drift(interval: float = GRAPH_DRIFT_CHECK_SECONDS):
+    """
+    Periodically check the graph against the tables (once a request
+    has built it), in a worker thread
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if not graph.synced:
+            continue
+        try:
+            await asyncio.to_thread(_check_drift)
+        except Exception:
+            logger.exception("Knowledge graph drift check failed")
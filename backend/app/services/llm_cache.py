@@ -0,0 +1,78 @@
+import hashlib
+import time
+
+from app.config import LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES
+from app.services.sqlite_lru import SQLiteLRUCache
+
+
+class LLMResponseCache(SQLiteLRUCache):
+    """
+    Persistent cache of LLM responses.
+
+    Keys are sha256(model name + prompt + context). Entries expire
+    after `ttl_seconds`; past `max_entries` the least recently used
+    are evicted.
+    """
+
+    TABLE = "responses"
+    COLUMNS = "response TEXT NOT NULL, created_at REAL NOT NULL"
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES
+    ):
+        super().__init__(path, max_entries, ttl_seconds)
+
+    @staticmethod
+    def key(model_name: str, system_prompt: str, user_context: str) -> bytes:
+        digest = hashlib.sha256()
+        for part in (model_name, system_prompt, user_context):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.digest()
+
+    # =========================
+    # Read / Write
+    # =========================
+    def get(self, model_name: str, system_prompt: str, user_context: str):
+        """
+        Cached response, or None on a miss or expired entry
+        """
+        key = self.key(model_name, system_prompt, user_context)
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                (now, key)
+            )
+            conn.commit()
+            self.hits += 1
+
+        return row[0]
+
+    def put(self, model_name: str, system_prompt: str, user_context: str, response: str):
+        key = self.key(model_name, system_prompt, user_context)
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            conn.commit()
+            self._added(conn, 1, now)
@@ -1,13 +1,48 @@
+import os
+import shutil
+import tempfile
+
 import fitz  # PyMuPDF
 
-def parse_pdf(file):
+# Copy uploads to disk in 1 MiB pieces
+COPY_BUFFER = 1024 * 1024
+
+
+def spool_upload(file) -> str:
     """
-    Extract text from a PDF file
+    Copy an uploaded file to a temp path (caller deletes it)
     """
-    doc = fitz.open(stream=file.file.read(), filetype="pdf")
-    text = ""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp, COPY_BUFFER)
+        return tmp.name
 
-    for page in doc:
-        text += page.get_text()
 
-    return text
+def iter_pdf_file_pages(path: str):
+    """
+    Yield the text of each page of a PDF on disk, one page at a time
+    """
+    with fitz.open(path, filetype="pdf") as doc:
+        for page in doc:
+            yield page.get_text()
+
+
+def iter_pdf_pages(file):
+    """
+    Yield the text of each page of an uploaded PDF, one page at a time.
+
+    The upload is spooled to a temp file so PyMuPDF can load pages
+    lazily instead of holding the whole document in memory.
+    """
+    path = spool_upload(file)
+
+    try:
+        yield from iter_pdf_file_pages(path)
+    finally:
+        os.unlink(path)
+
+
+def parse_pdf(file):
+    """
+    Extract text from a PDF file
+    """
+    return "".join(iter_pdf_pages(file))
@@ -0,0 +1,746 @@
+"""
+Hypothesis -> assumptions -> failure modes pipeline over one ingest.
+
+Shared by the synchronous /pipeline/from-ingest route and the
+background job workers behind /pipeline/jobs.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+
+from app.config import (
+    PIPELINE_JOB_WORKERS,
+    PIPELINE_JOB_STALE_SECONDS,
+    PIPELINE_BATCH_INFLIGHT,
+    PIPELINE_BATCH_FLUSH,
+)
+from app.db.bulk import insert_returning
+from app.db.database import SessionLocal, run_db
+from app.db.models import (
+    Hypothesis,
+    Assumption,
+    FailureMode,
+    PipelineJob,
+)
+from app.services.context_builder import build_context
+from app.services.contradictions import schedule_contradictions
+from app.services.dedup import schedule_dedupe
+from app.services.gemini_client import areason
+
+STAGES = ("hypothesis", "assumptions", "failure_modes")
+
+PIPELINE_MODES = ("sequential", "parallel", "fused")
+
+
+# =========================
+# PROMPTS
+# =========================
+HYPOTHESIS_PROMPT = """
+You are a scientific reasoning assistant.
+
+Given the following research context extracted from a paper,
+generate ONE clear, testable scientific hypothesis.
+
+Return JSON only in this format:
+{
+  "hypothesis": "...",
+  "rationale": "...",
+  "falsification": "..."
+}
+"""
+
+ASSUMPTION_PROMPT = """
+You are a scientific reasoning assistant.
+
+Given a hypothesis, list 3–5 key assumptions that must be true
+for the hypothesis to hold.
+
+Return JSON only in this format:
+{
+  "assumptions": [
+    "assumption 1",
+    "assumption 2",
+    "assumption 3"
+  ]
+}
+"""
+
+FAILURE_PROMPT = """
+You are a scientific reasoning assistant.
+
+Given a hypothesis, list 3–5 possible failure modes or reasons
+why the hypothesis may not hold true.
+
+Return JSON only in this format:
+{
+  "failure_modes": [
+    "failure mode 1",
+    "failure mode 2",
+    "failure mode 3"
+  ]
+}
+"""
+
+
+
+FUSED_PROMPT = """
+You are a scientific reasoning assistant.
+
+Given the following research context extracted from a paper:
+1. generate ONE clear, testable scientific hypothesis,
+2. list 3–5 key assumptions that must be true for it to hold,
+3. list 3–5 possible failure modes or reasons why it may not hold true.
+
+Return JSON only in this format:
+{
+  "hypothesis": "...",
+  "rationale": "...",
+  "falsification": "...",
+  "assumptions": [
+    "assumption 1",
+    "assumption 2",
+    "assumption 3"
+  ],
+  "failure_modes": [
+    "failure mode 1",
+    "failure mode 2",
+    "failure mode 3"
+  ]
+}
+"""
+
+
+# =========================
+# PARSING
+# =========================
+def _parse_hypothesis(result: str):
+    try:
+        parsed = json.loads(result)
+        return parsed["hypothesis"], parsed["rationale"], parsed["falsification"]
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to generate hypothesis"
+        )
+
+
+def _parse_assumptions(result) -> List[str]:
+    try:
+        parsed = json.loads(result) if isinstance(result, str) else result
+        return parsed.get("assumptions", [])
+    except Exception:
+        return []
+
+
+def _parse_failures(result) -> List[str]:
+    try:
+        parsed = json.loads(result) if isinstance(result, str) else result
+        return (
+            parsed.get("failure_modes")
+            or parsed.get("failures")
+            or []
+        )
+    except Exception:
+        return []
+
+
+# =========================
+# PERSISTENCE
+# =========================
+def _hypothesis_out(h: Hypothesis):
+    return {
+        "id": h.id,
+        "hypothesis": h.hypothesis,
+        "rationale": h.rationale,
+        "falsification": h.falsification,
+        "created_at": h.created_at,
+    }
+
+
+def _save_hypothesis(db, ingest_id: int, hypothesis_text: str, rationale: str, falsification: str):
+    """
+    INSERT ... RETURNING the hypothesis row (no refresh round-trip)
+    """
+    return insert_returning(
+        db,
+        Hypothesis,
+        [{
+            "context": f"Ingest #{ingest_id}",
+            "ingest_id": ingest_id,
+            "hypothesis": hypothesis_text,
+            "rationale": rationale,
+            "falsification": falsification,
+        }],
+        Hypothesis.id,
+        Hypothesis.hypothesis,
+        Hypothesis.rationale,
+        Hypothesis.falsification,
+        Hypothesis.created_at
+    )[0]
+
+
+def _save_children(db, hypothesis_id: int, assumptions_list, failure_list):
+    """
+    One batched INSERT ... RETURNING per table; the caller commits
+    once for both
+    """
+    assumptions_saved = insert_returning(
+        db,
+        Assumption,
+        [
+            {"hypothesis_id": hypothesis_id, "assumption": text}
+            for text in assumptions_list
+        ],
+        Assumption.id,
+        Assumption.assumption,
+        Assumption.created_at
+    )
+    failures_saved = insert_returning(
+        db,
+        FailureMode,
+        [
+            {"hypothesis_id": hypothesis_id, "failure": text}
+            for text in failure_list
+        ],
+        FailureMode.id,
+        FailureMode.failure,
+        FailureMode.created_at
+    )
+    return assumptions_saved, failures_saved
+
+
+def _children_out(assumptions_saved, failures_saved):
+    return (
+        [
+            {
+                "id": a.id,
+                "assumption": a.assumption,
+                "created_at": a.created_at,
+            }
+            for a in assumptions_saved
+        ],
+        [
+            {
+                "id": f.id,
+                "failure": f.failure,
+                "created_at": f.created_at,
+            }
+            for f in failures_saved
+        ],
+    )
+
+
+# =========================
+# CONTEXT
+# =========================
+async def load_context(db, ingest_id: int, objective: Optional[str] = None) -> str:
+    """
+    Retrieval-selected chunks within CONTEXT_TOKEN_BUDGET
+    """
+    return await build_context(db, ingest_id, objective)
+
+
+# =========================
+# PIPELINE
+# =========================
+async def run_pipeline(
+    db,
+    ingest_id: int,
+    use_cache: bool = True,
+    on_stage=None,
+    mode: str = "parallel",
+    objective: Optional[str] = None
+):
+    """
+    Run every stage for one ingest and return the unified response.
+
+    Modes:
+    - sequential: hypothesis, then assumptions, then failure modes
+    - parallel:   assumption + failure calls run concurrently (both
+                  only need the hypothesis) and commit together
+    - fused:      one structured call returns all three
+
+    `on_stage(name, result)` is called with each stage's JSON-ready
+    result as soon as it is committed, in a worker thread (like every
+    use of `db` here, so it may write through the session). Wall-clock
+    time per stage is returned under `timings_ms`.
+    """
+    if mode not in PIPELINE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown pipeline mode '{mode}', expected one of {PIPELINE_MODES}"
+        )
+
+    started = time.perf_counter()
+    timings = {}
+
+    async def done(name, result):
+        if on_stage is not None:
+            await run_db(db, on_stage, name, jsonable_encoder(result))
+        return result
+
+    def save_hypothesis(hypothesis_text, rationale, falsification):
+        # fused: committed together with its children
+        row = _save_hypothesis(db, ingest_id, hypothesis_text, rationale, falsification)
+        if mode != "fused":
+            db.commit()
+        return row
+
+    def save_children(hypothesis_id, assumptions_list, failure_list):
+        saved = _save_children(db, hypothesis_id, assumptions_list, failure_list)
+        db.commit()
+        return saved
+
+    def lap(name, since):
+        timings[name] = round((time.perf_counter() - since) * 1000, 1)
+
+    # -------------------------
+    # 1. Select context chunks
+    # -------------------------
+    t0 = time.perf_counter()
+    context_text = await load_context(db, ingest_id, objective)
+    lap("context", t0)
+
+    # -------------------------
+    # 2. Generate hypothesis (fused: everything at once)
+    # -------------------------
+    t0 = time.perf_counter()
+    prompt = FUSED_PROMPT if mode == "fused" else HYPOTHESIS_PROMPT
+    result = await areason(prompt, context_text, use_cache=use_cache)
+    lap("fused" if mode == "fused" else "hypothesis", t0)
+
+    hypothesis_text, rationale, falsification = _parse_hypothesis(result)
+
+    hypothesis = await run_db(db, save_hypothesis, hypothesis_text, rationale, falsification)
+
+    if mode == "fused":
+        assumptions_list = _parse_assumptions(result)
+        failure_list = _parse_failures(result)
+    else:
+        hypothesis_out = await done("hypothesis", _hypothesis_out(hypothesis))
+
+    # -------------------------
+    # 3. Generate assumptions + failure modes
+    # -------------------------
+    if mode == "sequential":
+        t0 = time.perf_counter()
+        result = await areason(ASSUMPTION_PROMPT, hypothesis.hypothesis, use_cache=use_cache)
+        lap("assumptions", t0)
+
+        assumptions_saved, _ = await run_db(
+            db, save_children, hypothesis.id, _parse_assumptions(result), []
+        )
+
+        assumptions_out, _ = _children_out(assumptions_saved, [])
+        await done("assumptions", assumptions_out)
+
+        t0 = time.perf_counter()
+        result = await areason(FAILURE_PROMPT, hypothesis.hypothesis, use_cache=use_cache)
+        lap("failure_modes", t0)
+
+        _, failures_saved = await run_db(
+            db, save_children, hypothesis.id, [], _parse_failures(result)
+        )
+
+        _, failures_out = _children_out([], failures_saved)
+        await done("failure_modes", failures_out)
+
+    else:
+        if mode == "parallel":
+            async def timed(name, stage_prompt):
+                t = time.perf_counter()
+                out = await areason(stage_prompt, hypothesis.hypothesis, use_cache=use_cache)
+                lap(name, t)
+                return out
+
+            t0 = time.perf_counter()
+            assumption_result, failure_result = await asyncio.gather(
+                timed("assumptions", ASSUMPTION_PROMPT),
+                timed("failure_modes", FAILURE_PROMPT),
+            )
+            lap("assumptions_and_failure_modes", t0)
+            assumptions_list = _parse_assumptions(assumption_result)
+            failure_list = _parse_failures(failure_result)
+
+        # -------------------------
+        # 4. Persist in one transaction
+        # -------------------------
+        t0 = time.perf_counter()
+        assumptions_saved, failures_saved = await run_db(
+            db, save_children, hypothesis.id, assumptions_list, failure_list
+        )
+        lap("persist", t0)
+
+        if mode == "fused":
+            hypothesis_out = await done("hypothesis", _hypothesis_out(hypothesis))
+
+        assumptions_out, failures_out = _children_out(assumptions_saved, failures_saved)
+        await done("assumptions", assumptions_out)
+        await done("failure_modes", failures_out)
+
+    schedule_dedupe()
+    schedule_contradictions()
+    lap("total", started)
+
+    # -------------------------
+    # 5. Unified response
+    # -------------------------
+    return {
+        "ingest_id": ingest_id,
+        "mode": mode,
+        "hypothesis": hypothesis_out,
+        "assumptions": assumptions_out,
+        "failure_modes": failures_out,
+        "timings_ms": timings,
+    }
+
+
+# =========================
+# BATCH PIPELINE
+# =========================
+async def generate(context_text: str, use_cache: bool = True, mode: str = "parallel"):
+    """
+    LLM stages only (no DB writes): context -> parsed results
+    """
+    if mode == "fused":
+        result = await areason(FUSED_PROMPT, context_text, use_cache=use_cache)
+        hypothesis_text, rationale, falsification = _parse_hypothesis(result)
+        return {
+            "hypothesis": hypothesis_text,
+            "rationale": rationale,
+            "falsification": falsification,
+            "assumptions": _parse_assumptions(result),
+            "failure_modes": _parse_failures(result),
+        }
+
+    result = await areason(HYPOTHESIS_PROMPT, context_text, use_cache=use_cache)
+    hypothesis_text, rationale, falsification = _parse_hypothesis(result)
+
+    if mode == "parallel":
+        assumption_result, failure_result = await asyncio.gather(
+            areason(ASSUMPTION_PROMPT, hypothesis_text, use_cache=use_cache),
+            areason(FAILURE_PROMPT, hypothesis_text, use_cache=use_cache),
+        )
+    else:
+        assumption_result = await areason(ASSUMPTION_PROMPT, hypothesis_text, use_cache=use_cache)
+        failure_result = await areason(FAILURE_PROMPT, hypothesis_text, use_cache=use_cache)
+
+    return {
+        "hypothesis": hypothesis_text,
+        "rationale": rationale,
+        "falsification": falsification,
+        "assumptions": _parse_assumptions(assumption_result),
+        "failure_modes": _parse_failures(failure_result),
+    }
+
+
+def bulk_write(db, generated):
+    """
+    Persist [(ingest_id, generate() output)] with one INSERT per table.
+    Returns {ingest_id: (hypothesis_id, n_assumptions, n_failures)}.
+    """
+    if not generated:
+        return {}
+
+    hypothesis_ids = [
+        row.id
+        for row in insert_returning(
+            db,
+            Hypothesis,
+            [
+                {
+                    "context": f"Ingest #{ingest_id}",
+                    "ingest_id": ingest_id,
+                    "hypothesis": out["hypothesis"],
+                    "rationale": out["rationale"],
+                    "falsification": out["falsification"],
+                }
+                for ingest_id, out in generated
+            ],
+            Hypothesis.id
+        )
+    ]
+
+    assumption_rows = [
+        {"hypothesis_id": hid, "assumption": text}
+        for hid, (_, out) in zip(hypothesis_ids, generated)
+        for text in out["assumptions"]
+    ]
+    failure_rows = [
+        {"hypothesis_id": hid, "failure": text}
+        for hid, (_, out) in zip(hypothesis_ids, generated)
+        for text in out["failure_modes"]
+    ]
+
+    if assumption_rows:
+        db.execute(insert(Assumption), assumption_rows)
+    if failure_rows:
+        db.execute(insert(FailureMode), failure_rows)
+
+    db.commit()
+
+    return {
+        ingest_id: (hid, len(out["assumptions"]), len(out["failure_modes"]))
+        for hid, (ingest_id, out) in zip(hypothesis_ids, generated)
+    }
+
+
+async def run_batch(
+    db,
+    ingest_ids: List[int],
+    use_cache: bool = True,
+    mode: str = "parallel",
+    inflight: int = PIPELINE_BATCH_INFLIGHT,
+    objective: Optional[str] = None
+):
+    """
+    Run the pipeline over many ingests at once.
+
+    Every ingest runs as its own coroutine, so stages pipeline across
+    ingests: one ingest's failure-mode call overlaps the next one's
+    hypothesis call. Total LLM concurrency is bounded by areason's
+    process-wide semaphore; `inflight` bounds how many ingests are
+    open at a time. Results are written in bulk every
+    PIPELINE_BATCH_FLUSH finished ingests; the ingests share `db`,
+    whose calls run_db serializes.
+    """
+    if mode not in PIPELINE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown pipeline mode '{mode}', expected one of {PIPELINE_MODES}"
+        )
+
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(inflight)
+
+    pending = []    # generated, not yet written
+    written = {}
+    failed = []
+
+    async def flush():
+        batch = pending[:]
+        pending.clear()
+        try:
+            written.update(await run_db(db, bulk_write, db, batch))
+        except Exception as exc:
+            await run_db(db, db.rollback)
+            failed.extend(
+                {"ingest_id": ingest_id, "error": f"Write failed: {exc}"}
+                for ingest_id, _ in batch
+            )
+
+    async def one(ingest_id: int):
+        async with slots:
+            try:
+                context_text = await load_context(db, ingest_id, objective)
+                out = await generate(context_text, use_cache, mode)
+            except Exception as exc:
+                detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+                failed.append({"ingest_id": ingest_id, "error": detail})
+                return
+
+        pending.append((ingest_id, out))
+        if len(pending) >= PIPELINE_BATCH_FLUSH:
+            await flush()
+
+    await asyncio.gather(*(one(ingest_id) for ingest_id in ingest_ids))
+    await flush()
+    schedule_dedupe()
+    schedule_contradictions()
+
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "requested": len(ingest_ids),
+        "succeeded": len(written),
+        "failed": sorted(failed, key=lambda f: f["ingest_id"]),
+        "results": [
+            {
+                "ingest_id": ingest_id,
+                "hypothesis_id": hid,
+                "assumptions": n_assumptions,
+                "failure_modes": n_failures,
+            }
+            for ingest_id, (hid, n_assumptions, n_failures) in sorted(written.items())
+        ],
+        "seconds": round(elapsed, 2),
+        "ingests_per_min": round(len(written) / elapsed * 60, 1) if elapsed else None,
+    }
+
+
+# =========================
+# BACKGROUND JOBS
+# =========================
+class PipelineJobQueue:
+    """
+    Bounded pool of asyncio workers running queued PipelineJob rows.
+
+    Stage status and results are persisted on the job row after every
+    stage, so any API worker can report progress. A job is claimed
+    with a conditional UPDATE, so it runs once even if several
+    processes enqueue it. A job interrupted by shutdown or a crash is
+    marked failed (its finished stages are already committed, so it is
+    not re-run).
+    """
+
+    def __init__(self, workers: int = PIPELINE_JOB_WORKERS):
+        self.workers = workers
+        self._queue = None
+        self._loop = None
+        self._tasks = []
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker())
+            for _ in range(self.workers)
+        ]
+
+        for job_id in await asyncio.to_thread(self._recover):
+            self._queue.put_nowait(job_id)
+
+    @staticmethod
+    def _recover():
+        """
+        Fail stale "running" jobs; ids of the queued ones
+        """
+        db = SessionLocal()
+        try:
+            # Jobs left "running" by a process that died without
+            # reaching run_job's cancellation handler
+            stale = datetime.utcnow() - timedelta(seconds=PIPELINE_JOB_STALE_SECONDS)
+            db.query(PipelineJob).filter(
+                PipelineJob.status == "running",
+                PipelineJob.updated_at < stale
+            ).update(
+                {"status": "failed", "error": "Interrupted: the worker running it stopped"},
+                synchronize_session=False
+            )
+            db.commit()
+
+            # Pick up jobs queued before a restart
+            return [
+                job_id
+                for (job_id,) in (
+                    db.query(PipelineJob.id)
+                    .filter(PipelineJob.status == "queued")
+                    .order_by(PipelineJob.id)
+                )
+            ]
+        finally:
+            db.close()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, job_id: int):
+        """
+        Safe from any thread (e.g. a sync route in the threadpool):
+        asyncio.Queue itself is only safe on its loop
+        """
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await run_job(job_id)
+            finally:
+                self._queue.task_done()
+
+
+def _mark_running(stages, mode: str):
+    """
+    Sequential jobs run one stage at a time; otherwise assumptions and
+    failure modes run together (parallel) or with the hypothesis (fused)
+    """
+    pending = [name for name in STAGES if stages[name]["status"] == "pending"]
+    if not pending:
+        return
+
+    if mode == "sequential" or (mode == "parallel" and pending[0] == "hypothesis"):
+        pending = pending[:1]
+    for name in pending:
+        stages[name]["status"] = "running"
+
+
+def _claim(db, job_id: int):
+    """
+    The job row if this worker moved it from queued to running
+    """
+    claimed = (
+        db.query(PipelineJob)
+        .filter(PipelineJob.id == job_id, PipelineJob.status == "queued")
+        .update({"status": "running"})
+    )
+    db.commit()
+
+    return db.get(PipelineJob, job_id) if claimed else None
+
+
+async def run_job(job_id: int):
+    """
+    Every DB call (including save() from on_stage) runs in a worker
+    thread via run_db; `job` is only touched there, since each commit
+    expires it
+    """
+    db = SessionLocal()
+
+    try:
+        job = await run_db(db, _claim, db, job_id)
+        if job is None:
+            return
+
+        ingest_id, use_cache, mode = job.ingest_id, job.use_cache, job.mode
+        objective = job.objective
+        stages = {name: {"status": "pending"} for name in STAGES}
+        _mark_running(stages, mode)
+
+        def save(**fields):
+            for key, value in fields.items():
+                setattr(job, key, value)
+            job.stages = json.dumps(stages)
+            db.commit()
+
+        def on_stage(name, result):
+            stages[name] = {"status": "done", "result": result}
+            _mark_running(stages, mode)
+            if name == "hypothesis":
+                job.hypothesis_id = result["id"]
+            save()
+
+        await run_db(db, save)
+
+        def fail(detail):
+            db.rollback()
+            for stage in stages.values():
+                if stage["status"] == "running":
+                    stage["status"] = "failed"
+            save(status="failed", error=detail)
+
+        try:
+            await run_pipeline(db, ingest_id, use_cache, on_stage, mode, objective=objective)
+        except asyncio.CancelledError:
+            # Shutdown: don't leave the job "running" forever
+            await run_db(db, fail, "Interrupted: the server stopped while the job was running")
+            raise
+        except Exception as exc:
+            await run_db(db, fail, exc.detail if isinstance(exc, HTTPException) else str(exc))
+        else:
+            await run_db(db, save, status="succeeded")
+    finally:
+        db.close()
+
+
+job_queue = PipelineJobQueue()
@@ -0,0 +1,120 @@
+"""
+In-memory cosine-similarity index over embedded table rows.
+
+Used by dedup (canonical assumptions / failure modes) and contradiction
+detection (checked hypotheses). The index lives in each process, but
+the rows it covers are decided by the database, which every API worker
+writes to. Each `sync()` compares the row count + max id of the covered
+set with what was indexed, so rows written by other workers (or
+deleted) are picked up before the next pass. When the rows above the
+indexed max id account for all of the growth, only they are embedded
+and added; any other difference reloads the whole set.
+"""
+import faiss
+import numpy as np
+from sqlalchemy import func
+
+from app.db.database import run_db
+from app.services.embedding_service import aembed_chunks
+from app.services.vector_store import DIMENSION
+
+
+def unit_vectors(vectors):
+    """
+    float32 rows scaled to unit length (inner product = cosine)
+    """
+    vectors = np.asarray(vectors, dtype="float32").reshape(-1, DIMENSION)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class SimilarityIndex:
+    def __init__(self, id_column, text_columns, criteria, to_text=None, batch: int = 1024):
+        self.id_column = id_column
+        self.text_columns = text_columns
+        self.criteria = criteria                      # filter clauses of the covered rows
+        self.to_text = to_text or (lambda *parts: parts[0])
+        self.batch = batch
+        self.index = None
+        self._fingerprint = None                      # (rows, max id) indexed
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def _current(self, db):
+        count, max_id = (
+            db.query(func.count(self.id_column), func.max(self.id_column))
+            .filter(*self.criteria)
+            .one()
+        )
+        return (count, max_id or 0)
+
+    def _count_above(self, db, max_id: int) -> int:
+        return (
+            db.query(func.count(self.id_column))
+            .filter(*self.criteria, self.id_column > max_id)
+            .scalar()
+        )
+
+    def _rows_after(self, db, last_id: int, upto: int):
+        return (
+            db.query(self.id_column, *self.text_columns)
+            .filter(*self.criteria, self.id_column > last_id, self.id_column <= upto)
+            .order_by(self.id_column)
+            .limit(self.batch)
+            .all()
+        )
+
+    async def sync(self, db):
+        """
+        Bring the index up to the covered rows: add just the new rows
+        when they all sit above the indexed max id, else reload
+        """
+        current = await run_db(db, self._current, db)
+        if current == self._fingerprint:
+            return
+
+        if self._fingerprint is not None:
+            count, max_id = self._fingerprint
+            grown = current[0] - count
+            if grown > 0 and await run_db(db, self._count_above, db, max_id) == grown:
+                await self._load(db, upto=current[1], after=max_id)
+                self._fingerprint = current
+                return
+
+        await self._load(db, upto=current[1])
+        self._fingerprint = current
+
+    async def _load(self, db, upto: int, after: int = None):
+        """
+        Embed + index the covered rows with `after` < id <= `upto` (rows
+        written since the fingerprint wait for the next sync), or all of
+        them up to `upto` into a fresh index
+        """
+        if after is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(DIMENSION))
+        last_id = after or 0
+
+        while True:
+            rows = await run_db(db, self._rows_after, db, last_id, upto)
+            if not rows:
+                return
+
+            vectors = unit_vectors(await aembed_chunks([self.to_text(*row[1:]) for row in rows]))
+            self.index.add_with_ids(vectors, np.array([row[0] for row in rows], dtype="int64"))
+            last_id = rows[-1][0]
+
+    def add(self, ids, vectors):
+        """
+        Index rows this process just added to the covered set
+        """
+        ids = np.asarray(ids, dtype="int64")
+        if len(ids) == 0:
+            return
+
+        self.index.add_with_ids(vectors, ids)
+        count, max_id = self._fingerprint
+        self._fingerprint = (count + len(ids), max(max_id, int(ids.max())))
+
+    def search(self, vectors, k: int):
+        return self.index.search(vectors, k)
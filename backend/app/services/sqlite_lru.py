@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+
+# Evict down to this fraction of the bound so eviction runs rarely
+EVICT_TO = 0.9
+
+
+class SQLiteLRUCache:
+    """
+    Base for persistent caches in one SQLite table keyed by a BLOB hash.
+
+    Subclasses set TABLE and COLUMNS (the value columns, besides `key`
+    and `last_used`). `last_used` drives LRU eviction once the table
+    grows past `max_entries`; with `ttl_seconds`, rows whose
+    `created_at` is older than that are dropped first.
+    """
+
+    TABLE = None
+    COLUMNS = None
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = 0  # upper bound; replaced rows are counted twice
+
+        self._conn = None
+        self._lock = threading.Lock()
+
+    # =========================
+    # Connection
+    # =========================
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    key BLOB PRIMARY KEY,
+                    {self.COLUMNS},
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.TABLE}_last_used "
+                f"ON {self.TABLE} (last_used)"
+            )
+            self._conn = conn
+            self._entries = self._count(conn)
+
+        return self._conn
+
+    def _count(self, conn) -> int:
+        return conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    # =========================
+    # Eviction
+    # =========================
+    def _added(self, conn, n: int, now: float):
+        """
+        Account for `n` written rows (caller holds the lock); evict
+        once the bound may have been passed
+        """
+        self._entries += n
+        if self._entries > self.max_entries:
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        if self.ttl_seconds is not None:
+            conn.execute(
+                f"DELETE FROM {self.TABLE} WHERE created_at < ?",
+                (now - self.ttl_seconds,)
+            )
+
+        count = self._count(conn)
+        if count > self.max_entries:
+            conn.execute(
+                f"""
+                DELETE FROM {self.TABLE} WHERE key IN (
+                    SELECT key FROM {self.TABLE} ORDER BY last_used LIMIT ?
+                )
+                """,
+                (count - int(self.max_entries * EVICT_TO),)
+            )
+
+        conn.commit()
+        self._entries = self._count(conn)
+
+    # =========================
+    # Metrics
+    # =========================
+    def stats(self):
+        with self._lock:
+            entries = self._count(self._connect())
+
+        lookups = self.hits + self.misses
+        stats = {"entries": entries, "max_entries": self.max_entries}
+        if self.ttl_seconds is not None:
+            stats["ttl_seconds"] = self.ttl_seconds
+
+        return {
+            **stats,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,375 @@
+"""
+Vector store sharded across local processes.
+
+With VECTOR_SHARDS = N, the vectors live in N `VectorStore`s
+(VECTOR_STORE_DIR/shard-<i>). Each one is served by its own process,
+and a chunk goes to shard `ingest_id % N`, so one paper never spans
+shards. API workers, pipeline jobs and bulk ingestion are all clients
+of the same shard processes, so they all see the same data.
+
+A search is scattered to every shard in parallel (or to just the
+shards owning the requested ingests). The per-shard top-k lists are
+then merged by distance. Requests travel over
+`multiprocessing.connection` sockets; numpy arrays go in one pickled
+message.
+
+Run the shards (from backend/):
+    python -m app.services.vector_shards               # all N shards
+    python -m app.services.vector_shards --shard 2     # just one
+    python -m app.services.vector_shards --split-from ./vector_store
+        # one-off: distribute an unsharded store's vectors
+"""
+import argparse
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener, wait
+
+import faiss
+import numpy as np
+
+from app.config import (
+    VECTOR_STORE_DIR,
+    VECTOR_SHARDS,
+    VECTOR_SHARD_HOST,
+    VECTOR_SHARD_BASE_PORT,
+    VECTOR_SHARD_AUTHKEY,
+)
+
+# Store methods a client may call on a shard
+METHODS = ("add", "remove", "search_batch", "reconstruct", "rebuild", "checkpoint", "stats")
+
+# Scatter threads per shard, so concurrent requests don't queue behind
+# each other in the client
+SCATTER_THREADS_PER_SHARD = 4
+
+# Pending connections per shard (many API workers connect at once)
+LISTEN_BACKLOG = 128
+
+# Live vectors moved per step by --split-from
+SPLIT_BATCH = 8192
+
+
+def shard_directory(shard: int) -> str:
+    return os.path.join(VECTOR_STORE_DIR, f"shard-{shard}")
+
+
+def shard_address(shard: int):
+    return (VECTOR_SHARD_HOST, VECTOR_SHARD_BASE_PORT + shard)
+
+
+def shard_of(ingest_id: int, n_shards: int) -> int:
+    return int(ingest_id) % n_shards
+
+
+def shard_authkey(authkey: bytes = None) -> bytes:
+    """
+    The shared secret shard connections authenticate with; refuses to
+    run without one, since whoever holds it can run code in the shards
+    """
+    authkey = authkey or VECTOR_SHARD_AUTHKEY.encode()
+    if not authkey:
+        raise RuntimeError("VECTOR_SHARD_AUTHKEY must be set to run or reach vector shards")
+    return authkey
+
+
+# =========================
+# Shard Server
+# =========================
+def _stats(store):
+    store.load()
+    return {
+        "vectors": int((store.rows.rows >= 0).sum()),
+        "index_type": store.index_type,
+        "encoding": store.encoding,
+        "log_records": store.log_records,
+    }
+
+
+def _handle(store, conn):
+    """
+    Answer one client connection's requests until it closes
+    """
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if method not in METHODS:
+                    raise ValueError(f"Unknown vector shard method '{method}'")
+                if method == "stats":
+                    reply = ("ok", _stats(store))
+                else:
+                    reply = ("ok", getattr(store, method)(*args))
+            except Exception as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+
+            conn.send(reply)
+
+
+def serve(shard: int, n_shards: int = VECTOR_SHARDS, authkey: bytes = None):
+    """
+    Serve one shard's store forever (one thread per client connection)
+    """
+    authkey = shard_authkey(authkey)
+
+    # vector_store imports this module when sharded, so the server and
+    # split sides import it late
+    from app.services.vector_store import VectorStore
+
+    # Shards share the machine's cores; don't let each OpenMP pool claim all of them
+    faiss.omp_set_num_threads(max(1, (os.cpu_count() or 1) // max(n_shards, 1)))
+
+    store = VectorStore(shard_directory(shard))
+    store.load()
+
+    with Listener(
+        shard_address(shard), backlog=LISTEN_BACKLOG, authkey=authkey
+    ) as listener:
+        print(f"vector shard {shard}/{n_shards} serving {store.directory} on {listener.address}")
+
+        while True:
+            try:
+                conn = listener.accept()
+            except (multiprocessing.AuthenticationError, EOFError, OSError):
+                # Failed handshake (wrong key, port probe): keep serving
+                continue
+            threading.Thread(target=_handle, args=(store, conn), daemon=True).start()
+
+
+def serve_all(n_shards: int = VECTOR_SHARDS):
+    """
+    Start every shard in its own process; stop all of them if one exits
+    """
+    shard_authkey()  # fail here rather than once per child
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve, args=(shard, n_shards), name=f"vector-shard-{shard}")
+        for shard in range(n_shards)
+    ]
+    for process in processes:
+        process.start()
+
+    # Stopping the supervisor (e.g. SIGTERM from systemd) stops the shards too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    try:
+        wait([process.sentinel for process in processes])
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+# =========================
+# Client
+# =========================
+class ShardedVectorStore:
+    """
+    Client for the shard processes, with the VectorStore interface.
+    Writes take the ingest id that picks their shard; reads without
+    one go to every shard.
+    """
+
+    def __init__(self, n_shards: int = VECTOR_SHARDS, authkey: bytes = None):
+        self.n_shards = n_shards
+        self.authkey = shard_authkey(authkey)
+        self.addresses = [shard_address(shard) for shard in range(n_shards)]
+        self._idle = [queue.SimpleQueue() for _ in range(n_shards)]  # pooled connections
+        self._pool = ThreadPoolExecutor(
+            max_workers=n_shards * SCATTER_THREADS_PER_SHARD,
+            thread_name_prefix="vector-scatter"
+        )
+
+    def _call(self, shard: int, method: str, *args):
+        try:
+            conn = self._idle[shard].get_nowait()
+        except queue.Empty:
+            conn = Client(self.addresses[shard], authkey=self.authkey)
+
+        try:
+            conn.send((method, args))
+            status, result = conn.recv()
+        except Exception:
+            # Unknown connection state (e.g. the shard restarted): drop it
+            conn.close()
+            raise
+
+        self._idle[shard].put(conn)
+
+        if status != "ok":
+            raise RuntimeError(f"vector shard {shard}: {result}")
+        return result
+
+    def _scatter(self, shards, method: str, *args):
+        """
+        Call `method` on each shard in parallel; results in shard order
+        """
+        if len(shards) == 1:
+            return [self._call(shards[0], method, *args)]
+
+        futures = [self._pool.submit(self._call, shard, method, *args) for shard in shards]
+        return [future.result() for future in futures]
+
+    def _shards(self, ingest_ids=None):
+        if ingest_ids is None:
+            return list(range(self.n_shards))
+        return sorted({shard_of(ingest_id, self.n_shards) for ingest_id in ingest_ids})
+
+    # =========================
+    # VectorStore Interface
+    # =========================
+    def load(self):
+        """
+        Check that every shard answers
+        """
+        return self.stats()
+
+    def stats(self):
+        return self._scatter(self._shards(), "stats")
+
+    def checkpoint(self):
+        self._scatter(self._shards(), "checkpoint")
+
+    def rebuild(self, index_type: str = None, encoding: str = None):
+        self._scatter(self._shards(), "rebuild", index_type, encoding)
+
+    def add(self, ids, vectors, ingest_id: int = None):
+        if ingest_id is None:
+            raise ValueError("A sharded vector store needs the ingest id of added chunks")
+
+        self._call(
+            shard_of(ingest_id, self.n_shards),
+            "add",
+            np.asarray(ids, dtype="int64"),
+            np.ascontiguousarray(vectors, dtype="float32")
+        )
+
+    def remove(self, ids, ingest_id: int = None) -> int:
+        ids = np.asarray(ids, dtype="int64")
+        if len(ids) == 0:
+            return 0
+
+        shards = self._shards(None if ingest_id is None else [ingest_id])
+        return sum(self._scatter(shards, "remove", ids))
+
+    def search(self, query_vector, top_k: int = 5):
+        return self.search_batch([query_vector], top_k)[0]
+
+    def search_batch(
+        self,
+        query_vectors,
+        top_k: int = 5,
+        allowed_ids=None,
+        ingest_ids=None,
+        allowed_ranges=None
+    ):
+        """
+        Scatter the queries to the shards (only those holding
+        `ingest_ids`, if given) and merge each query's hits by distance
+        """
+        queries = np.ascontiguousarray(query_vectors, dtype="float32")
+        if allowed_ids is not None:
+            allowed_ids = np.asarray(allowed_ids, dtype="int64")
+        if allowed_ranges is not None:
+            allowed_ranges = np.asarray(allowed_ranges, dtype="int64")
+
+        shards = self._shards(ingest_ids)
+        if not shards:
+            return [[] for _ in queries]
+
+        per_shard = self._scatter(shards, "search_batch", queries, top_k, allowed_ids, allowed_ranges)
+
+        return [
+            heapq.nsmallest(top_k, itertools.chain(*rows), key=lambda hit: hit[1])
+            for rows in zip(*per_shard)
+        ]
+
+    def reconstruct(self, ids, ingest_id: int = None):
+        ids = np.asarray(ids, dtype="int64")
+        shards = self._shards(None if ingest_id is None else [ingest_id])
+
+        found, vectors = [], []
+        for shard_found, shard_vectors in self._scatter(shards, "reconstruct", ids):
+            found.extend(shard_found)
+            vectors.append(shard_vectors)
+
+        return found, np.concatenate(vectors)
+
+
+# =========================
+# Split an Unsharded Store
+# =========================
+def split_store(source_directory: str, n_shards: int = VECTOR_SHARDS):
+    """
+    Copy the live vectors of an unsharded store into the shard
+    directories, placed by their chunk's ingest id (shards must not be
+    running). Vectors whose chunk row is gone are dropped.
+    Returns vectors copied per shard.
+    """
+    from app.db.database import SessionLocal
+    from app.db.models import IngestChunk
+    from app.services.vector_store import VectorStore
+
+    source = VectorStore(source_directory)
+    source.load()
+    shards = [VectorStore(shard_directory(shard)) for shard in range(n_shards)]
+    copied = [0] * n_shards
+
+    live = np.flatnonzero(source.rows.rows >= 0)
+
+    db = SessionLocal()
+    try:
+        for start in range(0, len(live), SPLIT_BATCH):
+            batch = live[start:start + SPLIT_BATCH]
+            owners = dict(
+                db.query(IngestChunk.id, IngestChunk.ingest_id)
+                .filter(IngestChunk.id.between(int(batch[0]), int(batch[-1])))
+                .all()
+            )
+
+            found, vectors = source.reconstruct(batch)
+            found = np.asarray(found, dtype="int64")
+            keys = np.array([owners.get(chunk_id, -1) for chunk_id in found.tolist()], dtype="int64")
+
+            for shard in range(n_shards):
+                mine = (keys >= 0) & (keys % n_shards == shard)
+                shards[shard].add(found[mine], vectors[mine])
+                copied[shard] += int(mine.sum())
+    finally:
+        db.close()
+
+    for store in shards:
+        store.checkpoint()
+
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the vector store shard processes")
+    parser.add_argument("--shards", type=int, default=VECTOR_SHARDS, help="number of shards")
+    parser.add_argument("--shard", type=int, default=None, help="serve only this shard")
+    parser.add_argument("--split-from", default=None, help="unsharded store directory to distribute")
+    args = parser.parse_args()
+
+    if args.shards < 1:
+        parser.error("set VECTOR_SHARDS (or --shards) to at least 1")
+
+    if args.split_from:
+        copied = split_store(args.split_from, args.shards)
+        print(f"copied {sum(copied)} vectors: {copied} per shard")
+    elif args.shard is not None:
+        serve(args.shard, args.shards)
+    else:
+        serve_all(args.shards)
@@ -1,25 +1,1026 @@
+import json
+import os
+import threading
+
 import faiss
 import numpy as np
 
+from app.config import (
+    VECTOR_STORE_DIR,
+    VECTOR_CHECKPOINT_EVERY,
+    VECTOR_INDEX_TYPE,
+    VECTOR_ENCODING,
+    VECTOR_RERANK_FACTOR,
+    VECTOR_ANN_THRESHOLD,
+    VECTOR_RETRAIN_GROWTH,
+    VECTOR_IVF_NPROBE,
+    VECTOR_PQ_M,
+    VECTOR_HNSW_M,
+    VECTOR_HNSW_EF_SEARCH,
+    VECTOR_EXACT_FILTER_MAX,
+    VECTOR_COMPACT_RATIO,
+    VECTOR_SHARDS,
+)
+
 DIMENSION = 384  # matches MiniLM
-index = faiss.IndexFlatL2(DIMENSION)
-stored_chunks = []
 
-def store_vectors(chunks, vectors):
+# One fixed-size log record per vector: IngestChunk.id + embedding.
+# A removal is logged as a tombstone record with id -1 - IngestChunk.id
+LOG_RECORD = np.dtype([("id", "<i8"), ("vector", "<f4", (DIMENSION,))])
+
+REPLAY_BATCH = 65536
+
+# Never compact for fewer dead log records than this
+COMPACT_MIN_RECORDS = 1024
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# How the index stores each vector (ivf_pq always uses PQ)
+ENCODINGS = ("fp32", "fp16", "sq8", "pq")
+
+# faiss caps k-means at 256 points per centroid anyway
+TRAIN_POINTS_PER_LIST = 256
+
+# PQ sub-quantizers have 256 centroids each
+PQ_CENTROIDS = 256
+
+
+# =========================
+# Index Factory
+# =========================
+def ivf_nlist(n_vectors: int) -> int:
+    """
+    ~4*sqrt(n) inverted lists, keeping >= 39 training points per list
+    """
+    return int(max(1, min(4 * np.sqrt(n_vectors), n_vectors // 39)))
+
+
+def codec_string(encoding: str) -> str:
+    if encoding == "fp32":
+        return "Flat"
+    if encoding == "fp16":
+        return "SQfp16"
+    if encoding == "sq8":
+        return "SQ8"
+    if encoding == "pq":
+        return f"PQ{VECTOR_PQ_M}"
+
+    raise ValueError(
+        f"Unknown vector encoding '{encoding}', expected one of {ENCODINGS}"
+    )
+
+
+def index_factory_string(index_type: str, n_vectors: int, encoding: str = "fp32") -> str:
+    codec = codec_string(encoding)
+
+    if index_type == "flat":
+        return codec
+    if index_type == "hnsw":
+        return f"HNSW{VECTOR_HNSW_M},{codec}"
+    if index_type == "ivf_flat":
+        return f"IVF{ivf_nlist(n_vectors)},{codec}"
+    if index_type == "ivf_pq":
+        return f"IVF{ivf_nlist(n_vectors)},PQ{VECTOR_PQ_M}"
+
+    raise ValueError(
+        f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}"
+    )
+
+
+def lossy_codes(index_type: str, encoding: str = "fp32") -> bool:
+    """
+    Whether the index stores approximate vectors (re-ranked from the log)
+    """
+    return index_type == "ivf_pq" or encoding != "fp32"
+
+
+def needs_training(index_type: str, encoding: str = "fp32") -> bool:
+    return index_type.startswith("ivf") or encoding in ("sq8", "pq")
+
+
+def training_size(index_type: str, n_vectors: int) -> int:
+    lists = ivf_nlist(n_vectors) if index_type.startswith("ivf") else 0
+    return min(n_vectors, max(lists, PQ_CENTROIDS) * TRAIN_POINTS_PER_LIST)
+
+
+def build_index(index_type: str, training_vectors=None, n_vectors: int = 0, encoding: str = "fp32"):
+    """
+    Create an empty, trained, id-mapped index of the given type
+    """
+    base = faiss.index_factory(
+        DIMENSION,
+        index_factory_string(index_type, n_vectors, encoding),
+        faiss.METRIC_L2
+    )
+    index = faiss.IndexIDMap2(base)
+
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(training_vectors, dtype="float32"))
+
+    set_search_params(index)
+    return index
+
+
+def set_search_params(
+    index,
+    nprobe: int = VECTOR_IVF_NPROBE,
+    ef_search: int = VECTOR_HNSW_EF_SEARCH
+):
+    """
+    Apply query-time knobs (not persisted by faiss.write_index)
+    """
+    base = faiss.downcast_index(index.index)
+
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+
+
+def search_parameters(index, selector):
+    """
+    Per-query parameters restricting a search to `selector`, carrying
+    the index's own nprobe / efSearch (faiss would otherwise use the
+    SearchParameters defaults)
+    """
+    base = faiss.downcast_index(index.index)
+
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _hits(distances, ids):
+    return [
+        [(int(i), float(d)) for i, d in zip(row_ids, row_distances) if i != -1]
+        for row_ids, row_distances in zip(ids, distances)
+    ]
+
+
+class _LogRows:
+    """
+    IngestChunk.id -> row of its live record in the log (-1 = none),
+    as a dense int64 array grown on demand
+    """
+
+    def __init__(self, rows=None):
+        self.rows = np.full(0, -1, dtype=np.int64) if rows is None else rows
+
+    def set(self, ids, rows):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+
+        top = int(ids.max()) + 1
+        if top > len(self.rows):
+            grown = np.full(max(top, 2 * len(self.rows)), -1, dtype=np.int64)
+            grown[:len(self.rows)] = self.rows
+            self.rows = grown
+
+        self.rows[ids] = rows
+
+    def get(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = (ids >= 0) & (ids < len(self.rows))
+        out = np.full(len(ids), -1, dtype=np.int64)
+        out[inside] = self.rows[ids[inside]]
+        return out
+
+
+class VectorStore:
     """
-    Store vectors in FAISS index
+    FAISS index keyed by IngestChunk.id and persisted as
+    snapshot + append-log.
+
+    Every added vector is appended to `vectors.log` before it enters
+    the index. `index.faiss` is a periodic snapshot that is opened
+    memory-mapped and read-only (IO_FLAG_MMAP_IFC: its codes live in
+    the page cache, not the heap), so a cold start only replays the
+    log records written after the last snapshot. Vectors added since
+    the snapshot go to a small in-RAM flat `delta` index, which every
+    checkpoint folds into the next snapshot.
+
+    The log also holds the exact float32 vectors, so ANN backends are
+    trained and rebuilt from it without re-embedding anything, and
+    indexes with compressed codes (fp16 / sq8 / pq) re-rank their
+    candidates against it.
+
+    Removals append tombstones. Vectors in the delta (or in an index
+    held in RAM, if flat) are dropped at once; removed ids inside the
+    mapped snapshot are filtered out of searches instead. A flat
+    snapshot sheds them at the next checkpoint; IVF / HNSW ones can't
+    delete through the id map and keep them until the next compaction,
+    which rewrites the log without dead records and rebuilds the index.
     """
-    global stored_chunks
 
-    vectors_np = np.array(vectors).astype("float32")
-    index.add(vectors_np)
-    stored_chunks.extend(chunks)
+    def __init__(
+        self,
+        directory: str,
+        index_type: str = VECTOR_INDEX_TYPE,
+        encoding: str = VECTOR_ENCODING,
+        rerank_factor: int = VECTOR_RERANK_FACTOR
+    ):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}"
+            )
+        if encoding not in ENCODINGS:
+            raise ValueError(
+                f"Unknown vector encoding '{encoding}', expected one of {ENCODINGS}"
+            )
+
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "index.meta.json")
+        self.snapshot = 0           # bumped by every checkpoint
+        self.index_path, self.rows_path = self._snapshot_files(0)
+        self.log_generation = 0     # bumped by every compaction
+        self.log_path = self._log_file(0)
+
+        self.target_type = index_type
+        self.target_encoding = encoding
+        self.rerank_factor = rerank_factor
+        self.index = None
+        self.delta = None           # in-RAM writes over a mapped snapshot (None: index is writable)
+        self.index_type = "flat"    # type of the live index
+        self.encoding = "fp32"      # codes of the live index
+        self.trained_on = 0         # corpus size the live index was built for
+        self.log_records = 0        # records in the current log
+        self.snapshot_records = 0   # records covered by index.faiss
+        self.dead_records = 0       # removed vectors + tombstones in the log
+        self.hidden = set()         # removed ids still inside an IVF / HNSW index
+        self.readded = 0            # hidden ids added back, indexed by the next rebuild
+        self.rows = _LogRows()      # id -> log row of its exact vector
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_thread = None
+
+    # =========================
+    # Load / Persist
+    # =========================
+    def load(self):
+        """
+        Open the snapshot (memory-mapped) and replay the log tail into
+        the delta
+        """
+        with self._lock:
+            if self.index is not None:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+
+            if os.path.exists(self.meta_path):
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+                self.snapshot = meta.get("snapshot", 0)
+                self.index_path, self.rows_path = self._snapshot_files(self.snapshot)
+                self.snapshot_records = meta["log_records"]
+                self.index_type = meta.get("index_type", "flat")
+                self.encoding = meta.get("encoding", "fp32")
+                self.trained_on = meta.get("trained_on", 0)
+                self.log_generation = meta.get("log_generation", 0)
+                self.dead_records = meta.get("dead_records", 0)
+                self.hidden = set(meta.get("hidden", []))
+                self._map_snapshot()
+            else:
+                self.snapshot_records = 0
+                self.index = build_index("flat")
+                self.delta = None
+
+            self.log_path = self._log_file(self.log_generation)
+            self._remove_stale_snapshots()
+            self._remove_stale_logs()
+            self.log_records = self._repair_log()
+            self.rows = self._read_rows()
+            self._restore_readded()
+            self.dead_records += self._replay(
+                self.index, self.snapshot_records, self.log_records, self.hidden, self.rows,
+                delta=self.delta
+            )
+            if self.hidden and self.delta is None:
+                hidden = np.fromiter(self.hidden, dtype="int64", count=len(self.hidden))
+                self.readded = int((self.rows.get(hidden) >= 0).sum())
+
+        self._maybe_rebuild()
+
+    def checkpoint(self):
+        """
+        Atomically write a new snapshot covering the whole log.
+
+        The index and rows files are new files named after the snapshot
+        number; the meta file that names them is replaced last, so a
+        crash at any point leaves the previous snapshot in use. The
+        delta is folded in (which briefly reads the snapshot into RAM),
+        and the new snapshot is mapped in place of the old one.
+        """
+        with self._lock:
+            self.load()
+
+            snapshot = self.snapshot + 1
+            index_path, rows_path = self._snapshot_files(snapshot)
+            index, hidden, kept = self._merged()
+            np.save(rows_path, self.rows.rows)
+            faiss.write_index(index, index_path)
+
+            tmp_meta = self.meta_path + ".tmp"
+            with open(tmp_meta, "w") as f:
+                json.dump({
+                    "snapshot": snapshot,
+                    "log_records": self.log_records,
+                    "ntotal": int(index.ntotal),
+                    "index_type": self.index_type,
+                    "encoding": self.encoding,
+                    "trained_on": self.trained_on,
+                    "log_generation": self.log_generation,
+                    "dead_records": self.dead_records,
+                    "hidden": sorted(hidden),
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_meta, self.meta_path)
+
+            self.snapshot = snapshot
+            self.index_path, self.rows_path = index_path, rows_path
+            self.snapshot_records = self.log_records
+            self.hidden = hidden
+            self._map_snapshot(index)
+            if self.delta is not None and len(kept[0]):
+                self.delta.add_with_ids(kept[1], kept[0])
+            self._remove_stale_snapshots()
+
+    def _map_snapshot(self, index=None):
+        """
+        Open the snapshot memory-mapped (read-only: faiss aborts on
+        writes to it) with an empty delta for later writes; an index
+        that can't be mapped keeps `index` (or reads the file) in RAM
+        and is written to directly. So does flat PQ: IndexPQ takes no
+        selector to hide removed ids, and its codes are only PQ_M bytes
+        a vector.
+        """
+        self.index = self.delta = None
+        if (self.index_type, self.encoding) != ("flat", "pq"):
+            try:
+                self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP_IFC)
+                self.delta = build_index("flat")
+            except RuntimeError:
+                pass
+
+        if self.index is None:
+            self.index = index if index is not None else faiss.read_index(self.index_path)
+        set_search_params(self.index)
+
+    def _merged(self):
+        """
+        (index, hidden, (ids, vectors) to keep in the delta) for the
+        next snapshot: the snapshot read into RAM with the delta added
+        (the live index itself when there is no delta). A flat one
+        drops its hidden ids; IVF / HNSW ones can't, so hidden ids
+        re-added in the delta stay there until the next rebuild.
+        """
+        kept = (np.empty(0, dtype="int64"), np.empty((0, DIMENSION), dtype="float32"))
+        if self.delta is None:
+            return self.index, set(self.hidden), kept
+
+        index = faiss.read_index(self.index_path)
+        hidden = set(self.hidden)
+
+        if hidden and isinstance(faiss.downcast_index(index.index), faiss.IndexFlatCodes):
+            index.remove_ids(faiss.IDSelectorBatch(np.fromiter(hidden, dtype="int64", count=len(hidden))))
+            hidden = set()
+
+        if self.delta.ntotal:
+            ids = faiss.vector_to_array(self.delta.id_map)
+            vectors = self.delta.index.reconstruct_n(0, self.delta.ntotal)
+            if hidden:
+                fresh = np.fromiter(
+                    (i not in hidden for i in ids.tolist()), dtype=bool, count=len(ids)
+                )
+                kept = (ids[~fresh], vectors[~fresh])
+                ids, vectors = ids[fresh], vectors[fresh]
+            index.add_with_ids(vectors, ids)
+
+        return index, hidden, kept
+
+    def _restore_readded(self):
+        """
+        Put hidden ids that were re-added before the snapshot back in
+        the delta (they live only in the log and the old delta)
+        """
+        if self.delta is None or not self.hidden:
+            return
+
+        hidden = np.fromiter(self.hidden, dtype="int64", count=len(self.hidden))
+        rows = self.rows.get(hidden)
+        live = (rows >= 0) & (rows < self.snapshot_records)
+        if live.any():
+            vectors = self._read_log(0, self.snapshot_records)["vector"][rows[live]]
+            self.delta.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), hidden[live])
+
+    @property
+    def ntotal(self) -> int:
+        """
+        Vectors in the index and delta, hidden ones included
+        """
+        return int(self.index.ntotal) + (int(self.delta.ntotal) if self.delta is not None else 0)
+
+    def _read_rows(self) -> _LogRows:
+        """
+        Log rows as of the snapshot (copy-on-write mapped), rebuilt
+        from the log for snapshots written before they were saved
+        """
+        if self.snapshot_records == 0:
+            return _LogRows()
+        if os.path.exists(self.rows_path):
+            return _LogRows(np.load(self.rows_path, mmap_mode="c"))
+
+        rows = _LogRows()
+        self._replay(None, 0, self.snapshot_records, set(), rows)
+        return rows
+
+    def _snapshot_files(self, snapshot: int):
+        """
+        (index, rows) paths of a snapshot; 0 is the unnumbered layout
+        of stores written before snapshots were numbered
+        """
+        suffix = "" if snapshot == 0 else f".{snapshot}"
+        return (
+            os.path.join(self.directory, f"index{suffix}.faiss"),
+            os.path.join(self.directory, f"index{suffix}.rows.npy"),
+        )
+
+    def _remove_stale_snapshots(self):
+        """
+        Delete snapshot files the meta file doesn't name (older ones,
+        or a newer one whose checkpoint crashed before the meta write)
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if (
+                name.startswith("index.")
+                and name.endswith((".faiss", ".rows.npy"))
+                and path not in (self.index_path, self.rows_path)
+            ):
+                os.remove(path)
+
+    def _log_file(self, generation: int) -> str:
+        name = "vectors.log" if generation == 0 else f"vectors.{generation}.log"
+        return os.path.join(self.directory, name)
+
+    def _remove_stale_logs(self):
+        """
+        Delete logs of other generations (left by a compaction that
+        crashed before or after switching over)
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("vectors.") and name.endswith(".log") and path != self.log_path:
+                os.remove(path)
+
+    def _repair_log(self) -> int:
+        """
+        Drop a torn trailing record left by a crash mid-append
+        """
+        if not os.path.exists(self.log_path):
+            return 0
+
+        size = os.path.getsize(self.log_path)
+        count = size // LOG_RECORD.itemsize
+
+        if size != count * LOG_RECORD.itemsize:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(count * LOG_RECORD.itemsize)
+
+        return count
+
+    def _read_log(self, start: int, end: int, path: str = None):
+        if end <= start:
+            return np.empty(0, dtype=LOG_RECORD)
+        return np.memmap(
+            path or self.log_path,
+            dtype=LOG_RECORD,
+            mode="r",
+            offset=start * LOG_RECORD.itemsize,
+            shape=(end - start,)
+        )
+
+    def _append(self, records, path: str = None):
+        with open(path or self.log_path, "ab") as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self, index, start: int, end: int, hidden, rows, path: str = None, delta=None) -> int:
+        """
+        Apply log records [start, end) to `index` (None = only track
+        rows); returns the number of dead records among them
+        """
+        dead = 0
+        for batch_start in range(start, end, REPLAY_BATCH):
+            batch_end = min(batch_start + REPLAY_BATCH, end)
+            dead += self._apply(
+                index, self._read_log(batch_start, batch_end, path), hidden, rows, batch_start, delta
+            )
+        return dead
+
+    def _apply(self, index, records, hidden, rows, offset: int, delta=None) -> int:
+        """
+        Add / remove in log order (`records` start at log row
+        `offset`); with a `delta`, `index` is a read-only mapped
+        snapshot and adds go to the delta. Returns tombstones +
+        vectors removed.
+        """
+        ids = np.ascontiguousarray(records["id"])
+        tombstone = ids < 0
+        bounds = np.flatnonzero(tombstone[1:] != tombstone[:-1]) + 1
+        dead = 0
+
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(ids)]):
+            if start == end:
+                continue
+            if tombstone[start]:
+                dead += int(end - start) + self._remove_from(
+                    index, -1 - ids[start:end], hidden, rows, delta
+                )
+            elif delta is not None:
+                # Re-added hidden ids are searchable here; only the
+                # snapshot's stale copies are hidden
+                delta.add_with_ids(np.ascontiguousarray(records["vector"][start:end]), ids[start:end])
+                rows.set(ids[start:end], offset + np.arange(start, end))
+            else:
+                if index is not None:
+                    added = ids[start:end]
+                    vectors = np.ascontiguousarray(records["vector"][start:end])
+
+                    if hidden:
+                        # A removed id is coming back (SQLite reuses the
+                        # highest ids) while the index still holds its old
+                        # vector: it stays hidden, and the next rebuild
+                        # indexes the new one from the log
+                        fresh = np.fromiter(
+                            (i not in hidden for i in added.tolist()), dtype=bool, count=len(added)
+                        )
+                        added, vectors = added[fresh], vectors[fresh]
+
+                    index.add_with_ids(vectors, added)
+                rows.set(ids[start:end], offset + np.arange(start, end))
+
+        return dead
+
+    def _remove_from(self, index, ids, hidden, rows, delta=None) -> int:
+        current = rows.get(ids)
+        removed = ids[current >= 0]
+        rows.set(removed, -1)
+
+        if delta is not None and len(removed):
+            # Logged since the snapshot, or a re-added hidden id: in the delta
+            in_delta = (current[current >= 0] >= self.snapshot_records) | np.isin(
+                removed, np.fromiter(hidden, dtype="int64", count=len(hidden))
+            )
+            delta.remove_ids(faiss.IDSelectorBatch(removed[in_delta]))
+            hidden.update(int(i) for i in removed[~in_delta])
+        elif index is not None and len(removed):
+            if isinstance(faiss.downcast_index(index.index), faiss.IndexFlatCodes):
+                index.remove_ids(faiss.IDSelectorBatch(removed))
+            else:
+                # IndexIDMap2 over IVF / HNSW can't remove (IVF would silently
+                # corrupt the id mapping): hide the ids until the next compaction
+                hidden.update(int(i) for i in removed)
+
+        return len(removed)
+
+    # =========================
+    # ANN (Re)build
+    # =========================
+    def _rebuild_target(self):
+        """
+        (index type, encoding) the store should switch to now, or None
+        """
+        n = self.ntotal
+        target = (self.target_type, self.target_encoding)
+        live = (self.index_type, self.encoding)
+
+        if target == ("flat", "fp32"):
+            return target if live != target else None
+
+        if n < VECTOR_ANN_THRESHOLD:
+            return None
+
+        if live != target:
+            return target
+
+        if (
+            needs_training(*live)
+            and n >= self.trained_on * VECTOR_RETRAIN_GROWTH
+        ):
+            return target
+
+        return None
+
+    def _compaction_due(self) -> bool:
+        return self.dead_records >= max(
+            COMPACT_MIN_RECORDS,
+            VECTOR_COMPACT_RATIO * self.log_records
+        )
+
+    def _maybe_rebuild(self):
+        with self._lock:
+            if self._rebuild_thread is not None:
+                return
+
+            target = self._rebuild_target()
+            if target is None and (self._compaction_due() or self.readded):
+                target = (self.index_type, self.encoding)
+            if target is None:
+                return
+
+            self._rebuild_thread = threading.Thread(
+                target=self.rebuild,
+                args=target,
+                name="vector-store-rebuild",
+                daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def _write_live(self, source: str, upto: int, target: str) -> int:
+        """
+        Copy the records of vectors still live after the first `upto`
+        records of `source` (last record per id is an add) to
+        `target`, in log order; returns how many
+        """
+        records = self._read_log(0, upto, source)
+        ids = np.array(records["id"])
+        keys = np.where(ids < 0, -1 - ids, ids)
+
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = np.sort(len(ids) - 1 - last)
+        live = last[ids[last] >= 0]
+
+        with open(target, "wb") as f:
+            for start in range(0, len(live), REPLAY_BATCH):
+                f.write(records[live[start:start + REPLAY_BATCH]].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        return len(live)
+
+    def rebuild(self, index_type: str = None, encoding: str = None):
+        """
+        Compact the log into a new generation (dropping removed
+        vectors and tombstones), train a fresh index from it and swap
+        both in.
+
+        Compaction, training and bulk insertion run without holding the
+        lock; only the records appended meanwhile are replayed under it.
+        """
+        index_type = index_type or self.target_type
+        encoding = encoding or self.target_encoding
+
+        try:
+            with self._rebuild_lock:
+                with self._lock:
+                    self.load()
+                    upto = self.log_records
+                    old_log = self.log_path
+                    generation = self.log_generation + 1
+
+                new_log = self._log_file(generation)
+                live = self._write_live(old_log, upto, new_log)
+
+                # Too few vectors to train on: stay exact until there are more
+                if needs_training(index_type, encoding) and live < PQ_CENTROIDS:
+                    index_type, encoding = "flat", "fp32"
+
+                training = None
+                if needs_training(index_type, encoding):
+                    sample = np.sort(
+                        np.random.default_rng(0).choice(
+                            live, training_size(index_type, live), replace=False
+                        )
+                    )
+                    training = self._read_log(0, live, new_log)["vector"][sample]
+
+                index = build_index(index_type, training, live, encoding)
+                rows = _LogRows()
+                self._replay(index, 0, live, set(), rows, new_log)
+
+                with self._lock:
+                    tail = np.array(self._read_log(upto, self.log_records, old_log))
+                    hidden = set()
+                    self._append(tail, new_log)
+                    dead = self._apply(index, tail, hidden, rows, live)
+
+                    self.index = index
+                    self.delta = None
+                    self.index_type = index_type
+                    self.encoding = encoding
+                    self.trained_on = live
+                    self.log_path = new_log
+                    self.log_generation = generation
+                    self.log_records = live + len(tail)
+                    self.dead_records = dead
+                    self.hidden = hidden
+                    self.readded = 0
+                    self.rows = rows
+                    self.checkpoint()
+
+                # Never written if nothing was ever added
+                if os.path.exists(old_log):
+                    os.remove(old_log)
+        finally:
+            if self._rebuild_thread is threading.current_thread():
+                self._rebuild_thread = None
+
+    # =========================
+    # Write / Read
+    # =========================
+    def add(self, ids, vectors):
+        ids_np = np.asarray(ids, dtype="int64")
+        vectors_np = np.ascontiguousarray(vectors, dtype="float32")
+
+        if len(ids_np) == 0:
+            return
+
+        records = np.empty(len(ids_np), dtype=LOG_RECORD)
+        records["id"] = ids_np
+        records["vector"] = vectors_np
+
+        with self._lock:
+            self.load()
+
+            if self.hidden and self.delta is None:
+                self.readded += sum(i in self.hidden for i in ids_np.tolist())
+
+            self._append(records)
+            self._apply(self.index, records, self.hidden, self.rows, self.log_records, self.delta)
+            self.log_records += len(records)
+
+            if self.log_records - self.snapshot_records >= VECTOR_CHECKPOINT_EVERY:
+                self.checkpoint()
+
+        self._maybe_rebuild()
+
+    def remove(self, ids) -> int:
+        """
+        Log tombstones for `ids` and drop their vectors from search;
+        returns how many vectors were removed
+        """
+        ids_np = np.unique(np.asarray(ids, dtype="int64"))
+
+        if len(ids_np) == 0:
+            return 0
+
+        records = np.zeros(len(ids_np), dtype=LOG_RECORD)
+        records["id"] = -1 - ids_np
+
+        with self._lock:
+            self.load()
+
+            self._append(records)
+            dead = self._apply(
+                self.index, records, self.hidden, self.rows, self.log_records, self.delta
+            )
+            self.log_records += len(records)
+            self.dead_records += dead
+
+            if self.log_records - self.snapshot_records >= VECTOR_CHECKPOINT_EVERY:
+                self.checkpoint()
+
+        self._maybe_rebuild()
+        return dead - len(records)
+
+    def search(self, query_vector, top_k: int = 5):
+        return self.search_batch([query_vector], top_k)[0]
+
+    def search_batch(self, query_vectors, top_k: int = 5, allowed_ids=None, allowed_ranges=None):
+        """
+        One FAISS call for many queries. `allowed_ids` restricts the
+        results to those ids (an IDSelector inside the index search;
+        small sets are scored exactly instead); `allowed_ranges` does
+        the same for [start, end) id ranges without listing their ids.
+        Returns one list of (id, squared L2 distance) per query,
+        without -1 padding.
+        """
+        self.load()
+
+        queries = np.ascontiguousarray(query_vectors, dtype="float32").reshape(-1, DIMENSION)
+        allowed = None
+        ranges = None
+
+        if allowed_ranges is not None:
+            ranges = np.asarray(allowed_ranges, dtype="int64").reshape(-1, 2)
+
+            if (ranges[:, 1] - ranges[:, 0]).sum() <= VECTOR_EXACT_FILTER_MAX:
+                allowed_ids = np.concatenate(
+                    [np.arange(start, end) for start, end in ranges] + [np.empty(0, dtype="int64")]
+                )
+                ranges = None
+
+        if allowed_ids is not None:
+            allowed = np.unique(np.asarray(allowed_ids, dtype="int64"))
+
+            if len(allowed) == 0:
+                return [[] for _ in queries]
+            if len(allowed) <= VECTOR_EXACT_FILTER_MAX:
+                return self._search_exact(queries, top_k, allowed)
+
+        # faiss indexes are not safe to search while being appended to
+        with self._lock:
+            # Compressed codes: over-fetch, then re-rank exactly
+            k = top_k
+            if lossy_codes(self.index_type, self.encoding) and self.rerank_factor > 1:
+                k = top_k * self.rerank_factor
+
+            distances, ids = self._search(self.index, queries, k, allowed, ranges, self.hidden)
+
+            if self.delta is not None and self.delta.ntotal:
+                delta_distances, delta_ids = self._search(self.delta, queries, k, allowed, ranges)
+                distances = np.hstack([distances, delta_distances])
+                ids = np.hstack([ids, delta_ids])
+
+                if k == top_k:
+                    top = np.argsort(distances, axis=1)[:, :top_k]
+                    distances = np.take_along_axis(distances, top, axis=1)
+                    ids = np.take_along_axis(ids, top, axis=1)
+
+            if k > top_k:
+                distances, ids = self._rerank(queries, ids, top_k)
+
+        return _hits(distances, ids)
+
+    def _search(self, index, queries, k: int, allowed, ranges, hidden=()):
+        if ranges is None:
+            selector = self._selector(allowed, hidden)
+        else:
+            selector = self._range_selector(ranges, hidden)
+        params = None if selector is None else search_parameters(index, selector)
+        return index.search(queries, k, params=params)
+
+    def _selector(self, allowed, hidden=()):
+        """
+        IDSelector for `allowed` ids minus `hidden` ones (None = no filter)
+        """
+        if hidden:
+            hidden = np.fromiter(hidden, dtype="int64", count=len(hidden))
+
+            if allowed is not None:
+                allowed = np.setdiff1d(allowed, hidden)
+            else:
+                excluded = faiss.IDSelectorBatch(hidden)
+                selector = faiss.IDSelectorNot(excluded)
+                selector.referenced_objects = [excluded]
+                return selector
+
+        return None if allowed is None else faiss.IDSelectorBatch(allowed)
+
+    def _range_selector(self, ranges, hidden=()):
+        """
+        IDSelector for ids in the disjoint [start, end) `ranges` minus
+        `hidden` ones: IDSelectorRange for one range, else a bitmap
+        """
+        if len(ranges) == 1 and not hidden:
+            return faiss.IDSelectorRange(int(ranges[0, 0]), int(ranges[0, 1]))
+
+        inside = np.zeros(int(ranges[:, 1].max()), dtype=bool)
+        for start, end in ranges.tolist():
+            inside[start:end] = True
+
+        if hidden:
+            hidden = np.fromiter(hidden, dtype="int64", count=len(hidden))
+            inside[hidden[hidden < len(inside)]] = False
+
+        return faiss.IDSelectorBitmap(np.packbits(inside, bitorder="little"))
+
+    def _rerank(self, queries, ids, top_k: int):
+        """
+        Exact squared L2 of each query's candidates, from the float32
+        vectors in the log; returns the best `top_k` (-1 padded)
+        """
+        rows = self.rows.get(ids.ravel()).reshape(ids.shape)
+        valid = (ids >= 0) & (rows >= 0)
+
+        unique_rows, inverse = np.unique(rows[valid], return_inverse=True)
+        vectors = self._read_log(0, self.log_records)["vector"][unique_rows]
+
+        distances = np.full(ids.shape, np.inf, dtype="float32")
+        owners = np.repeat(np.arange(len(queries)), valid.sum(axis=1))
+        distances[valid] = ((vectors[inverse] - queries[owners]) ** 2).sum(axis=1)
+
+        top = np.argsort(distances, axis=1)[:, :top_k]
+        distances = np.take_along_axis(distances, top, axis=1)
+        ids = np.take_along_axis(ids, top, axis=1)
+        ids[np.isinf(distances)] = -1
+
+        return distances, ids
+
+    def _search_exact(self, queries, top_k: int, allowed):
+        found, vectors = self.reconstruct(allowed)
+        if not found:
+            return [[] for _ in queries]
+
+        # |q - v|^2 = |q|^2 + |v|^2 - 2 q.v
+        distances = np.maximum(
+            (queries ** 2).sum(axis=1)[:, None]
+            + (vectors ** 2).sum(axis=1)[None, :]
+            - 2 * queries @ vectors.T,
+            0
+        )
+        k = min(top_k, len(found))
+        top = np.argsort(distances, axis=1)[:, :k]
+
+        return _hits(
+            np.take_along_axis(distances, top, axis=1),
+            np.asarray(found, dtype="int64")[top]
+        )
+
+    def reconstruct(self, ids):
+        """
+        Exact stored vectors for `ids` (read from the log; ids not in
+        the store are skipped). Returns (found_ids, float32 array of
+        shape [len(found_ids), DIMENSION])
+        """
+        self.load()
+        ids = np.asarray(ids, dtype="int64").ravel()
+
+        with self._lock:
+            rows = self.rows.get(ids)
+            present = rows >= 0
+            vectors = self._read_log(0, self.log_records)["vector"][rows[present]]
+
+        return ids[present].tolist(), np.asarray(vectors, dtype="float32").reshape(-1, DIMENSION)
+
+
+if VECTOR_SHARDS:
+    from app.services.vector_shards import ShardedVectorStore
+    store = ShardedVectorStore(VECTOR_SHARDS)
+else:
+    store = VectorStore(VECTOR_STORE_DIR)
+
+
+def load_index():
+    """
+    Reopen the persisted index, or check the shards answer (called at
+    API startup)
+    """
+    store.load()
+
+
+def rebuild_index(index_type: str = None, encoding: str = None):
+    """
+    Force a synchronous rebuild, e.g. after changing VECTOR_INDEX_TYPE
+    or VECTOR_ENCODING
+    """
+    store.rebuild(index_type, encoding)
+
+
+def store_vectors(chunk_ids, vectors, ingest_id: int = None):
+    """
+    Store vectors in FAISS index, keyed by IngestChunk.id
+    (`ingest_id` picks the shard)
+    """
+    if VECTOR_SHARDS:
+        store.add(chunk_ids, vectors, ingest_id)
+    else:
+        store.add(chunk_ids, vectors)
+
+
+def remove_vectors(chunk_ids, ingest_id: int = None):
+    """
+    Remove the vectors of deleted IngestChunk rows
+    """
+    if VECTOR_SHARDS:
+        return store.remove(chunk_ids, ingest_id)
+    return store.remove(chunk_ids)
+
 
 def search_vectors(query_vector, top_k=5):
     """
-    Retrieve relevant chunks
+    Retrieve ids of the most relevant IngestChunk rows
+    """
+    return [chunk_id for chunk_id, _ in store.search(query_vector, top_k)]
+
+
+def fetch_vectors(chunk_ids, ingest_id: int = None):
+    """
+    (found_ids, vectors) for chunks already in the index
     """
-    query_np = np.array([query_vector]).astype("float32")
-    distances, indices = index.search(query_np, top_k)
+    if VECTOR_SHARDS:
+        return store.reconstruct(chunk_ids, ingest_id)
+    return store.reconstruct(chunk_ids)
 
-    return [stored_chunks[i] for i in indices[0]]
+
+def search_vectors_batch(
+    query_vectors,
+    top_k=5,
+    allowed_ids=None,
+    ingest_ids=None,
+    allowed_ranges=None
+):
+    """
+    [(chunk_id, distance)] per query, optionally restricted to chunk
+    ids or [start, end) chunk id ranges (`ingest_ids` narrows which
+    shards are searched)
+    """
+    if VECTOR_SHARDS:
+        return store.search_batch(query_vectors, top_k, allowed_ids, ingest_ids, allowed_ranges)
+    return store.search_batch(query_vectors, top_k, allowed_ids, allowed_ranges)
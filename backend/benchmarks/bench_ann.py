@@ -0,0 +1,86 @@
+"""
+Recall / latency benchmark for the vector store index backends.
+
+Builds every backend from `app.services.vector_store.build_index` over
+synthetic 384-d vectors and reports recall@k against the exact flat
+index plus p50/p99 single-query latency.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ann                 # 10k, 100k, 1M
+    python -m benchmarks.bench_ann 10000 100000    # custom sizes
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.services.vector_store import DIMENSION, INDEX_TYPES, build_index, ivf_nlist
+
+SIZES = [10_000, 100_000, 1_000_000]
+N_QUERIES = 500
+TOP_K = 10
+N_CLUSTERS = 256
+
+
+def synthetic_vectors(n: int, rng):
+    """
+    Gaussian mixture, L2-normalised like MiniLM sentence embeddings
+    """
+    centers = rng.standard_normal((N_CLUSTERS, DIMENSION)).astype("float32")
+    labels = rng.integers(0, N_CLUSTERS, n)
+    x = centers[labels] + 0.5 * rng.standard_normal((n, DIMENSION)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x
+
+
+def recall_at_k(found, truth) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(n: int):
+    rng = np.random.default_rng(42)
+    data = synthetic_vectors(n + N_QUERIES, rng)
+    corpus, queries = data[:n], data[n:]
+    ids = np.arange(n, dtype="int64")
+
+    print(f"\n=== {n:,} vectors x {DIMENSION}d, {N_QUERIES} queries, k={TOP_K} ===")
+    print(f"{'backend':<10}{'build s':>10}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+
+    truth = None
+
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+
+        training = None
+        if index_type.startswith("ivf"):
+            sample = rng.choice(n, min(n, ivf_nlist(n) * 256), replace=False)
+            training = corpus[np.sort(sample)]
+
+        index = build_index(index_type, training, n)
+        index.add_with_ids(corpus, ids)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((N_QUERIES, TOP_K), dtype="int64")
+
+        for qi in range(N_QUERIES):
+            t0 = time.perf_counter()
+            _, result = index.search(queries[qi:qi + 1], TOP_K)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found[qi] = result[0]
+
+        if truth is None:
+            truth = found  # flat runs first and is exact
+
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(
+            f"{index_type:<10}{build_s:>10.1f}"
+            f"{recall_at_k(found, truth):>10.3f}{p50:>10.2f}{p99:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        run(size)
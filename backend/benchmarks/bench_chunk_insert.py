@@ -0,0 +1,94 @@
+"""
+Chunk-insert throughput benchmark.
+
+Writes the same chunk rows into a scratch SQLite database twice:
+  - per-row: add() + commit() + refresh() for each chunk (the old path)
+  - batched: one INSERT ... RETURNING per batch (app.db.bulk)
+
+Usage (from backend/):
+    python -m benchmarks.bench_chunk_insert
+    python -m benchmarks.bench_chunk_insert --rows 20000 --batch 256
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.bulk import insert_returning
+from app.db.database import Base
+from app.db.models import Ingest, IngestChunk
+
+
+def session_factory(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def per_row(db, ingest_id: int, rows: int):
+    for idx in range(rows):
+        chunk = IngestChunk(
+            ingest_id=ingest_id,
+            start_offset=idx * 100,
+            end_offset=idx * 100 + 100,
+            chunk_index=idx
+        )
+        db.add(chunk)
+        db.commit()
+        db.refresh(chunk)
+
+
+def batched(db, ingest_id: int, rows: int, batch: int):
+    for start in range(0, rows, batch):
+        insert_returning(
+            db,
+            IngestChunk,
+            [
+                {
+                    "ingest_id": ingest_id,
+                    "start_offset": idx * 100,
+                    "end_offset": idx * 100 + 100,
+                    "chunk_index": idx,
+                }
+                for idx in range(start, min(start + batch, rows))
+            ],
+            IngestChunk.id
+        )
+        db.commit()
+
+
+def measure(name: str, write, rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = session_factory(os.path.join(tmp, "bench.db"))
+        db = Session()
+        try:
+            ingest = Ingest(title=name, body="x" * rows * 100)
+            db.add(ingest)
+            db.commit()
+
+            started = time.perf_counter()
+            write(db, ingest.id, rows)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+
+    print(f"{name:<8} {rows:>7} rows  {elapsed:7.2f} s  {rows / elapsed:>10.0f} rows/s")
+    return rows / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+
+    before = measure("per-row", per_row, args.rows)
+    after = measure(
+        "batched",
+        lambda db, ingest_id, rows: batched(db, ingest_id, rows, args.batch),
+        args.rows
+    )
+    print(f"speed-up: {after / before:.1f}x")
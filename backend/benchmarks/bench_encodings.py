@@ -0,0 +1,97 @@
+"""
+Memory / recall / latency benchmark for the vector encodings.
+
+Builds a flat `VectorStore` per encoding (fp32, fp16, sq8, pq) over
+synthetic 384-d vectors in a temporary directory and reports the
+snapshot size per vector, recall@k against exact fp32 search and
+p50/p99 single-query latency, with and without re-ranking the
+candidates against the float32 log.
+
+Usage (from backend/):
+    python -m benchmarks.bench_encodings                # 10k, 100k
+    python -m benchmarks.bench_encodings 20000 500000   # custom sizes
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.config import VECTOR_RERANK_FACTOR
+from app.services.vector_store import DIMENSION, ENCODINGS, VectorStore
+from benchmarks.bench_ann import N_QUERIES, TOP_K, recall_at_k, synthetic_vectors
+
+SIZES = [10_000, 100_000]
+
+
+def build_store(directory: str, encoding: str, corpus, ids) -> VectorStore:
+    store = VectorStore(directory, "flat", encoding)
+    store.load()
+    store.add(ids, corpus)
+
+    # A large corpus already starts a background rebuild from add()
+    thread = store._rebuild_thread
+    if thread is not None:
+        thread.join()
+    if store.encoding != encoding:
+        store.rebuild("flat", encoding)
+
+    return store
+
+
+def measure(store: VectorStore, queries):
+    latencies = []
+    found = np.full((len(queries), TOP_K), -1, dtype="int64")
+
+    for qi in range(len(queries)):
+        t0 = time.perf_counter()
+        hits = store.search_batch(queries[qi:qi + 1], TOP_K)[0]
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found[qi, :len(hits)] = [chunk_id for chunk_id, _ in hits]
+
+    return found, np.percentile(latencies, [50, 99])
+
+
+def run(n: int):
+    rng = np.random.default_rng(42)
+    data = synthetic_vectors(n + N_QUERIES, rng)
+    corpus, queries = data[:n], data[n:]
+    ids = np.arange(n, dtype="int64")
+
+    print(f"\n=== {n:,} vectors x {DIMENSION}d, {N_QUERIES} queries, k={TOP_K} ===")
+    print(
+        f"{'encoding':<10}{'rerank':>8}{'build s':>10}{'B/vector':>10}"
+        f"{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}"
+    )
+
+    truth = None
+
+    for encoding in ENCODINGS:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            store = build_store(directory, encoding, corpus, ids)
+            build_s = time.perf_counter() - start
+
+            store.checkpoint()
+            bytes_per_vector = os.path.getsize(store.index_path) / n
+
+            factors = [1] if encoding == "fp32" else [1, VECTOR_RERANK_FACTOR]
+            for factor in factors:
+                store.rerank_factor = factor
+                found, (p50, p99) = measure(store, queries)
+
+                if truth is None:
+                    truth = found  # fp32 runs first and is exact
+
+                rerank = f"x{factor}" if factor > 1 else "-"
+                print(
+                    f"{encoding:<10}{rerank:>8}{build_s:>10.1f}{bytes_per_vector:>10.0f}"
+                    f"{recall_at_k(found, truth):>10.3f}{p50:>10.2f}{p99:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for size in sizes:
+        run(size)
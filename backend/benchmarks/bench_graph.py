@@ -0,0 +1,94 @@
+"""
+Knowledge-graph scale benchmark.
+
+Builds a synthetic graph incrementally (batches of rows, as sync()
+would feed them): papers -> hypotheses -> assumptions / failure modes
+whose texts repeat across hypotheses. It reports build time, edge
+count and adjacency memory, plus p50/p99 latency of the
+"hypotheses sharing an assumption" and "papers two hops from a
+failure mode" queries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_graph
+    python -m benchmarks.bench_graph --papers 500000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.knowledge_graph import ASSUMPTION, FAILURE_MODE, KnowledgeGraph
+
+BATCH = 10000
+
+
+def build(papers: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    g = KnowledgeGraph()
+
+    hypotheses = 2 * papers
+    assumption_texts = max(1, hypotheses // 2)
+    failure_texts = max(1, hypotheses // 4)
+
+    g.add_papers(np.arange(1, papers + 1))
+
+    assumption_id = failure_id = 1
+    for start in range(1, hypotheses + 1, BATCH):
+        ids = np.arange(start, min(start + BATCH, hypotheses + 1))
+        g.add_hypotheses(ids, rng.integers(1, papers + 1, len(ids)))
+
+        for node_type, per, texts in (
+            (ASSUMPTION, 4, assumption_texts),
+            (FAILURE_MODE, 3, failure_texts),
+        ):
+            parents = np.repeat(ids, per)
+            rows = np.arange(len(parents)) + (assumption_id if node_type == ASSUMPTION else failure_id)
+            labels = [f"text {i}" for i in rng.integers(0, texts, len(parents))]
+            g.add_items(node_type, rows, parents, labels)
+
+            if node_type == ASSUMPTION:
+                assumption_id += len(parents)
+            else:
+                failure_id += len(parents)
+
+    g.compact()
+    return g, hypotheses, failure_id - 1
+
+
+def timed(fn, args_list):
+    times = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - started) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 99)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    g, hypotheses, failures = build(args.papers)
+    build_s = time.perf_counter() - started
+
+    stats = g.stats()
+    print(f"nodes {sum(stats['nodes'].values()):,}  edges {stats['edges']:,}  "
+          f"adjacency {stats['adjacency_bytes'] / 2**20:.0f} MiB  build {build_s:.1f} s")
+
+    rng = np.random.default_rng(1)
+    shared = [
+        (g.node("hypothesis", int(i)), "assumption")
+        for i in rng.integers(1, hypotheses + 1, args.queries)
+    ]
+    two_hop = [
+        (g.node("failure_mode", int(i)), 2, "paper")
+        for i in rng.integers(1, failures + 1, args.queries)
+    ]
+
+    p50, p99 = timed(g.sharing, shared)
+    print(f"hypotheses sharing an assumption: p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+    p50, p99 = timed(g.reachable, two_hop)
+    print(f"papers 2 hops from failure mode:  p50 {p50:.2f} ms  p99 {p99:.2f} ms")
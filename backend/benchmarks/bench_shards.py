@@ -0,0 +1,140 @@
+"""
+Query throughput of the sharded vector store vs shard count.
+
+For each shard count, splits synthetic 384-d vectors over that many
+shard stores by (synthetic) ingest id, starts one shard process each
+on this machine and drives them with concurrent client threads
+through `ShardedVectorStore`. Reports single-query throughput and p50
+latency, plus throughput for batched queries. Every run's results
+are checked against the exact 1-shard run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_shards                        # 100k vectors, 1/2/4 shards
+    python -m benchmarks.bench_shards 500000 --shards 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.services.vector_shards import ShardedVectorStore, serve, shard_of
+from app.services.vector_store import DIMENSION, VectorStore
+from benchmarks.bench_ann import TOP_K, recall_at_k, synthetic_vectors
+
+N_VECTORS = 100_000
+SHARD_COUNTS = [1, 2, 4]
+N_QUERIES = 2000
+CLIENTS = 8
+BATCH = 64
+CHUNKS_PER_INGEST = 50
+
+
+def fill_shards(directory: str, n_shards: int, corpus):
+    ids = np.arange(len(corpus), dtype="int64")
+    ingest_ids = ids // CHUNKS_PER_INGEST
+    shard = np.array([shard_of(i, n_shards) for i in range(ingest_ids[-1] + 1)])[ingest_ids]
+
+    for i in range(n_shards):
+        store = VectorStore(os.path.join(directory, f"shard-{i}"))
+        store.load()
+        store.add(ids[shard == i], corpus[shard == i])
+        store.checkpoint()
+
+
+def wait_until_serving(client: ShardedVectorStore, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return client.load()
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def drive(client: ShardedVectorStore, queries, batch: int):
+    """
+    Run all queries from CLIENTS threads, `batch` per call; returns
+    (found ids, queries per second, per-call latencies in ms)
+    """
+    found = np.full((len(queries), TOP_K), -1, dtype="int64")
+    latencies = []
+
+    def run_call(start: int):
+        t0 = time.perf_counter()
+        hits = client.search_batch(queries[start:start + batch], TOP_K)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        for offset, row in enumerate(hits):
+            found[start + offset, :len(row)] = [chunk_id for chunk_id, _ in row]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        list(pool.map(run_call, range(0, len(queries), batch)))
+    elapsed = time.perf_counter() - started
+
+    return found, len(queries) / elapsed, latencies
+
+
+def run(n: int, shard_counts):
+    rng = np.random.default_rng(42)
+    data = synthetic_vectors(n + N_QUERIES, rng)
+    corpus, queries = data[:n], data[n:]
+
+    print(
+        f"\n=== {n:,} vectors x {DIMENSION}d, {N_QUERIES} queries, k={TOP_K}, "
+        f"{CLIENTS} client threads, {os.cpu_count()} cores ==="
+    )
+    print(f"{'shards':>8}{'QPS (1)':>12}{'p50 ms':>10}{f'QPS ({BATCH})':>12}{'recall@k':>10}")
+
+    context = multiprocessing.get_context("spawn")
+    authkey = secrets.token_bytes(32)
+    truth = None
+
+    for n_shards in shard_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            fill_shards(directory, n_shards, corpus)
+
+            # Shard processes read VECTOR_STORE_DIR when they start
+            os.environ["VECTOR_STORE_DIR"] = directory
+            processes = [
+                context.Process(target=serve, args=(shard, n_shards, authkey), daemon=True)
+                for shard in range(n_shards)
+            ]
+            for process in processes:
+                process.start()
+
+            try:
+                client = ShardedVectorStore(n_shards, authkey)
+                wait_until_serving(client)
+
+                drive(client, queries[:100], 1)  # warm up connections
+                found, qps, latencies = drive(client, queries, 1)
+                _, batch_qps, _ = drive(client, queries, BATCH)
+            finally:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    process.join()
+
+        if truth is None:
+            truth = found
+
+        print(
+            f"{n_shards:>8}{qps:>12.0f}{np.percentile(latencies, 50):>10.2f}"
+            f"{batch_qps:>12.0f}{recall_at_k(found, truth):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sizes", type=int, nargs="*", default=[N_VECTORS])
+    parser.add_argument("--shards", type=int, nargs="+", default=SHARD_COUNTS)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.shards)
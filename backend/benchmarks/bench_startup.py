@@ -0,0 +1,52 @@
+"""
+Import-latency benchmark for the API.
+
+Imports `app.main` in fresh interpreters and reports the median and
+worst wall time, plus the app's own IMPORT_MS. Pass --max-ms to fail
+(exit 1) when the median regresses past a budget, e.g. in CI.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --max-ms 1500
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+PROBE = "import app.main as m; print(m.IMPORT_MS)"
+
+
+def measure(runs: int):
+    wall, reported = [], []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            check=True,
+            capture_output=True,
+            text=True
+        ).stdout
+        wall.append((time.perf_counter() - started) * 1000)
+        reported.append(float(output.strip().splitlines()[-1]))
+
+    return wall, reported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    wall, reported = measure(args.runs)
+    median = statistics.median(wall)
+
+    print(f"interpreter + import app.main: median {median:.0f} ms, max {max(wall):.0f} ms")
+    print(f"app.main IMPORT_MS:            median {statistics.median(reported):.0f} ms")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.0f} ms exceeds budget {args.max_ms:.0f} ms")
+        sys.exit(1)
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from app.services import chunker
+
+
+def _text(seed: int) -> str:
+    rng = random.Random(seed)
+    words = ["cells", "divide", "protein", "folding", "is", "a", "thermodynamically", "x"]
+    sentences = []
+    for _ in range(300):
+        n = rng.choice([1, 3, 9, 25, 120])  # the 120-word ones exceed the budget
+        sentences.append(" ".join(rng.choice(words) for _ in range(n)) + rng.choice([". ", "? ", ".\n\n"]))
+    return "".join(sentences)
+
+
+def _pages(text: str, seed: int):
+    rng = random.Random(seed)
+    pages, start = [], 0
+    while start < len(text):
+        end = start + rng.randint(1, 2000)
+        pages.append(text[start:end])
+        start = end
+    return pages
+
+
+@pytest.mark.parametrize("overlap_sentences", [0, 1, 2, 3])
+@pytest.mark.parametrize("max_tokens", [20, 60, 200])
+@pytest.mark.parametrize("window", [64, 1024, 16384])
+def test_chunk_stream_matches_chunk_text(monkeypatch, overlap_sentences, max_tokens, window):
+    monkeypatch.setattr(chunker, "STREAM_WINDOW", window)
+
+    for seed in range(5):
+        text = _text(seed)
+        streamed = list(chunker.chunk_stream(_pages(text, seed), max_tokens, overlap_sentences))
+
+        assert [t for _, _, t in streamed] == chunker.chunk_text(text, max_tokens, overlap_sentences)
+        assert all(text[s:e] == t for s, e, t in streamed)
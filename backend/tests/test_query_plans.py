@@ -0,0 +1,64 @@
+"""
+Query plans of the foreign-key hot paths.
+
+EXPLAIN QUERY PLAN (SQLite) on the queries behind the pipeline context
+load and the keyset-paginated by-hypothesis and /hypothesis/history
+listings, over a schema built from the models + migrations: none of
+them may scan a table or sort in a temp B-tree instead of using an
+index.
+"""
+import re
+
+import pytest
+from sqlalchemy import select, text
+
+from app.db import models  # noqa: F401  (registers all models)
+from app.db.database import Base, create_db_engine
+from app.db.migrations import migrate
+from app.db.models import Assumption, FailureMode, Hypothesis, IngestChunk
+
+HOT_PATHS = {
+    "pipeline context (chunks of an ingest)": (
+        select(IngestChunk)
+        .where(IngestChunk.ingest_id == 1)
+        .order_by(IngestChunk.chunk_index)
+    ),
+    "assumptions by hypothesis": (
+        select(Assumption)
+        .where(Assumption.hypothesis_id == 1)
+        .order_by(Assumption.created_at, Assumption.id)
+    ),
+    "failure modes by hypothesis": (
+        select(FailureMode)
+        .where(FailureMode.hypothesis_id == 1)
+        .order_by(FailureMode.created_at, FailureMode.id)
+    ),
+    "hypothesis history": (
+        select(Hypothesis)
+        .order_by(Hypothesis.created_at.desc(), Hypothesis.id.desc())
+    ),
+}
+
+# "SCAN t" without "USING ... INDEX" is a full table scan
+FULL_SCAN = re.compile(r"\bSCAN (\w+)(?!.*USING (COVERING )?INDEX)")
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_db_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", list(HOT_PATHS))
+def test_hot_path_uses_an_index(engine, name):
+    sql = str(HOT_PATHS[name].compile(engine, compile_kwargs={"literal_binds": True}))
+
+    with engine.connect() as conn:
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+    bad = [step for step in plan if FULL_SCAN.search(step) or TEMP_SORT in step]
+    assert not bad, f"{name}: {plan}"